@@ -0,0 +1,571 @@
+"""
+Reproducible benchmark suite for the emotion detection pipeline
+Measures detector stages and end-to-end API requests on a fixed set of local frames
+and writes JSON results that can be compared between commits
+
+Usage:
+    python benchmark_emotion.py --output results.json
+    python benchmark_emotion.py --quick --compare results.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from emotion_detection import (
+    REDUCED_DECODE_FLAGS,
+    EmotionDetector,
+    decode_base64_image,
+)
+from emotion_samples import (
+    encode_frame,
+    load_face_images,
+    make_frame,
+    parse_resolution,
+    synthetic_face,
+)
+
+
+DEFAULT_RESOLUTIONS = "320x240,640x480,1280x720"
+DEFAULT_FACE_COUNTS = "0,1,4"
+DEFAULT_HISTORY_SIZES = "1000,100000,1000000"
+
+# Ratio above which a case is flagged as a regression when comparing runs
+REGRESSION_THRESHOLD = 1.15
+
+
+def measure(
+    func: Callable[[], object], repeat: int, warmup: int, min_time: float = 0.0
+) -> Dict[str, float]:
+    """
+    Time a callable and summarize the samples
+
+    Args:
+        func: Zero-argument callable to time
+        repeat: Minimum number of timed calls
+        warmup: Untimed calls made first
+        min_time: Keep sampling until this many seconds have been spent
+
+    Returns:
+        Summary statistics in milliseconds
+    """
+    for _ in range(warmup):
+        func()
+
+    samples = []
+    started = time.perf_counter()
+    while len(samples) < repeat or time.perf_counter() - started < min_time:
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+
+    samples = np.array(samples)
+    return {
+        "samples": int(samples.size),
+        "min_ms": round(float(samples.min()), 4),
+        "mean_ms": round(float(samples.mean()), 4),
+        "p50_ms": round(float(np.percentile(samples, 50)), 4),
+        "p95_ms": round(float(np.percentile(samples, 95)), 4),
+        "max_ms": round(float(samples.max()), 4),
+        "ops_per_sec": round(1000.0 / float(samples.mean()), 2),
+    }
+
+
+def _environment() -> Dict:
+    """Describe the machine and code version a run was taken on"""
+    try:
+        commit = (
+            subprocess.check_output(
+                ["git", "rev-parse", "--short", "HEAD"],
+                cwd=os.path.dirname(os.path.abspath(__file__)),
+                stderr=subprocess.DEVNULL,
+            )
+            .decode()
+            .strip()
+        )
+    except Exception:
+        commit = None
+
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "opencv": cv2.__version__,
+        "numpy": np.__version__,
+        "opencv_threads": cv2.getNumThreads(),
+    }
+
+
+def bench_detector(args, frames: Dict, results: List[Dict]):
+    """Benchmark detect_faces, predict_emotion(s) and analyze_frame per frame shape"""
+    detector = EmotionDetector()
+
+    for (width, height, num_faces), frame in frames.items():
+        params = {"width": width, "height": height, "faces": num_faces}
+        detected = len(detector.detect_faces(frame))
+        params["faces_detected"] = detected
+
+        results.append(
+            {
+                "name": "detect_faces",
+                "params": params,
+                "stats": measure(
+                    lambda: detector.detect_faces(frame), args.repeat, args.warmup
+                ),
+            }
+        )
+
+        detector.reset_statistics()
+        detector.reset_session("bench")
+        results.append(
+            {
+                "name": "analyze_frame",
+                "params": params,
+                "stats": measure(
+                    lambda: detector.analyze_frame(frame, "bench"),
+                    args.repeat,
+                    args.warmup,
+                ),
+            }
+        )
+
+    # predict_emotion is independent of frame size: time it on face crops
+    for size in (48, 96, 200):
+        if args.face_images:
+            face = cv2.resize(args.face_images[0], (size, size))
+        else:
+            face = synthetic_face(size)
+        results.append(
+            {
+                "name": "predict_emotion",
+                "params": {"face_size": size},
+                "stats": measure(
+                    lambda: detector.predict_emotion(face),
+                    args.repeat * 10,
+                    args.warmup,
+                ),
+            }
+        )
+
+    # Batched prediction: all faces of a frame (or batch request) in one call
+    face = synthetic_face(96)
+    for batch in (1, 4, 16):
+        faces = [face] * batch
+        results.append(
+            {
+                "name": "predict_emotions",
+                "params": {"face_size": 96, "batch": batch},
+                "stats": measure(
+                    lambda: detector.predict_emotions(faces),
+                    args.repeat * 10,
+                    args.warmup,
+                ),
+            }
+        )
+
+    # Simultaneous frames of several sessions: one analyze_frame call per stream
+    # against analyze_streams with per-stream or mosaic detection
+    stream_frames = [
+        frame for (_, _, num_faces), frame in frames.items() if num_faces == 1
+    ][:1]
+    for frame in stream_frames:
+        height, width = frame.shape[:2]
+        for streams in (2, 4, 9):
+            session_ids = [f"stream-{index}" for index in range(streams)]
+            batch = [frame] * streams
+            cases = {
+                "analyze_frame": lambda: [
+                    detector.analyze_frame(f, sid) for f, sid in zip(batch, session_ids)
+                ],
+                "per_stream": lambda: detector.analyze_streams(batch, session_ids),
+                "mosaic": lambda: detector.analyze_streams(
+                    batch, session_ids, mosaic=True
+                ),
+            }
+            for mode, run_case in cases.items():
+                results.append(
+                    {
+                        "name": "analyze_streams",
+                        "params": {
+                            "width": width,
+                            "height": height,
+                            "streams": streams,
+                            "mode": mode,
+                        },
+                        "stats": measure(run_case, args.repeat, args.warmup),
+                    }
+                )
+
+
+def bench_decode(args, payloads: Dict, results: List[Dict]):
+    """Benchmark full-size color decode against reduced grayscale decode, decode + analysis"""
+    detector = EmotionDetector()
+
+    for (width, height, num_faces), payload in payloads.items():
+        for reduction in (1, *sorted(REDUCED_DECODE_FLAGS)):
+            params = {
+                "width": width,
+                "height": height,
+                "faces": num_faces,
+                "reduction": reduction,
+            }
+            frame = decode_base64_image(payload, reduction)
+            params["faces_detected"] = len(detector.detect_faces(frame, reduction))
+
+            results.append(
+                {
+                    "name": "decode_base64_image",
+                    "params": params,
+                    "stats": measure(
+                        lambda: decode_base64_image(payload, reduction),
+                        args.repeat,
+                        args.warmup,
+                    ),
+                }
+            )
+
+            def decode_and_analyze():
+                detector.analyze_frame(
+                    decode_base64_image(payload, reduction), "bench", reduction
+                )
+
+            detector.reset_statistics()
+            detector.reset_session("bench")
+            results.append(
+                {
+                    "name": "decode_and_analyze",
+                    "params": params,
+                    "stats": measure(decode_and_analyze, args.repeat, args.warmup),
+                }
+            )
+
+
+def bench_statistics(args, results: List[Dict]):
+    """Benchmark get_emotion_statistics over large histories"""
+    detector = EmotionDetector()
+    rng = np.random.default_rng(args.seed)
+
+    for size in args.history_sizes:
+        emotions = rng.choice(EmotionDetector.EMOTIONS, size)
+        scores = rng.uniform(0, 100, size)
+        detector.load_history(
+            [
+                {
+                    "timestamp": "2025-01-01T00:00:00",
+                    "emotion": str(emotion),
+                    "score": float(score),
+                    "confidence": 0.5,
+                }
+                for emotion, score in zip(emotions, scores)
+            ]
+        )
+
+        repeat = max(3, args.repeat // 10) if size >= 100000 else args.repeat
+        results.append(
+            {
+                "name": "get_emotion_statistics",
+                "params": {"history_size": size},
+                "stats": measure(detector.get_emotion_statistics, repeat, 1),
+            }
+        )
+
+
+def bench_flask_client(args, payloads: Dict, results: List[Dict]):
+    """Benchmark end-to-end requests through the Flask test client"""
+    import emotion_api
+
+    client = emotion_api.app.test_client()
+    # Measure the service, not the per-session rate limit
+    emotion_api.admission.session_rate = 0
+
+    for (width, height, num_faces), payload in payloads.items():
+        params = {"width": width, "height": height, "faces": num_faces}
+        body = {"image": payload, "session_id": "bench"}
+
+        def post():
+            response = client.post("/api/emotion/analyze", json=body)
+            assert response.status_code == 200, response.data
+
+        results.append(
+            {
+                "name": "flask_client.analyze",
+                "params": params,
+                "stats": measure(post, args.repeat, args.warmup),
+            }
+        )
+
+    results.append(
+        {
+            "name": "flask_client.report",
+            "params": {"history_size": len(emotion_api.detector.emotion_history)},
+            "stats": measure(
+                lambda: client.get("/api/emotion/report/bench"),
+                args.repeat,
+                args.warmup,
+            ),
+        }
+    )
+    client.delete("/api/emotion/session/bench")
+
+
+def _start_local_server():
+    """Run the API in a background thread on an ephemeral port"""
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    import emotion_api
+
+    # Measure the service, not the per-session rate limit
+    emotion_api.admission.session_rate = 0
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server(
+        "127.0.0.1", 0, emotion_api.app, threaded=True, request_handler=QuietHandler
+    )
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def _post_json(url: str, body: Dict, attempts: int = 5) -> bytes:
+    """POST a JSON body, waiting out 429/503 responses as told by Retry-After"""
+    data = json.dumps(body).encode("utf-8")
+    for attempt in range(attempts):
+        request = urllib.request.Request(
+            url,
+            data=data,
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=30) as response:
+                return response.read()
+        except urllib.error.HTTPError as e:
+            if e.code not in (429, 503) or attempt == attempts - 1:
+                raise
+            retry_after = float(e.headers.get("Retry-After") or 1)
+            print(f"  server answered {e.code}, retrying in {retry_after:g}s")
+            time.sleep(retry_after)
+
+
+def bench_http_server(args, payloads: Dict, results: List[Dict]):
+    """Benchmark end-to-end requests against a real HTTP server"""
+    server = None
+    base_url = args.server_url
+    if base_url == "local":
+        server, base_url = _start_local_server()
+
+    try:
+        for (width, height, num_faces), payload in payloads.items():
+            body = {"image": payload, "session_id": "bench-http"}
+            results.append(
+                {
+                    "name": "http.analyze",
+                    "params": {
+                        "width": width,
+                        "height": height,
+                        "faces": num_faces,
+                        "payload_bytes": len(payload),
+                    },
+                    "stats": measure(
+                        lambda: _post_json(f"{base_url}/api/emotion/analyze", body),
+                        args.repeat,
+                        args.warmup,
+                    ),
+                }
+            )
+    finally:
+        if server is not None:
+            server.shutdown()
+
+
+def compare(current: Dict, baseline: Dict) -> List[Dict]:
+    """
+    Compare two result files case by case on p50 latency
+
+    Args:
+        current: Results of this run
+        baseline: Results loaded from a previous run
+
+    Returns:
+        One entry per case present in both runs
+    """
+
+    def key(entry):
+        return entry["name"], json.dumps(
+            {k: v for k, v in entry["params"].items() if k != "faces_detected"},
+            sort_keys=True,
+        )
+
+    previous = {key(entry): entry for entry in baseline.get("results", [])}
+    rows = []
+    for entry in current["results"]:
+        old = previous.get(key(entry))
+        if old is None:
+            continue
+        ratio = entry["stats"]["p50_ms"] / max(old["stats"]["p50_ms"], 1e-9)
+        rows.append(
+            {
+                "name": entry["name"],
+                "params": entry["params"],
+                "baseline_p50_ms": old["stats"]["p50_ms"],
+                "current_p50_ms": entry["stats"]["p50_ms"],
+                "ratio": round(ratio, 3),
+                "regression": ratio > REGRESSION_THRESHOLD,
+            }
+        )
+    return rows
+
+
+def run(args) -> Dict:
+    """Run all selected benchmark groups"""
+    if args.threads is not None:
+        cv2.setNumThreads(args.threads)
+
+    args.face_images = load_face_images(args.faces_dir)
+
+    frames = {}
+    for resolution in args.resolutions:
+        width, height = parse_resolution(resolution)
+        for num_faces in args.face_counts:
+            try:
+                frames[(width, height, num_faces)] = make_frame(
+                    width, height, num_faces, args.seed, args.face_images
+                )
+            except ValueError as e:
+                print(f"Skipping {resolution} with {num_faces} faces: {e}")
+
+    payloads = {shape: encode_frame(frame) for shape, frame in frames.items()}
+
+    results: List[Dict] = []
+    groups = set(args.groups)
+
+    if "detector" in groups:
+        print("Benchmarking detector...")
+        bench_detector(args, frames, results)
+    if "decode" in groups:
+        print("Benchmarking decode...")
+        bench_decode(args, payloads, results)
+    if "statistics" in groups:
+        print("Benchmarking statistics...")
+        bench_statistics(args, results)
+    if "flask" in groups:
+        print("Benchmarking Flask test client...")
+        bench_flask_client(args, payloads, results)
+    if "http" in groups and args.server_url:
+        print(f"Benchmarking HTTP server ({args.server_url})...")
+        bench_http_server(args, payloads, results)
+
+    return {
+        "environment": _environment(),
+        "config": {
+            "repeat": args.repeat,
+            "warmup": args.warmup,
+            "seed": args.seed,
+            "resolutions": args.resolutions,
+            "face_counts": args.face_counts,
+            "history_sizes": args.history_sizes,
+            "real_faces": len(args.face_images),
+        },
+        "results": results,
+    }
+
+
+def _print_results(report: Dict):
+    for entry in report["results"]:
+        params = ", ".join(f"{k}={v}" for k, v in entry["params"].items())
+        stats = entry["stats"]
+        print(
+            f"{entry['name']:<28} {params:<52} "
+            f"p50 {stats['p50_ms']:>9.3f} ms  p95 {stats['p95_ms']:>9.3f} ms"
+        )
+
+
+def parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--output", help="Write JSON results to this file")
+    parser.add_argument("--compare", help="Compare against a previous JSON result")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--threads", type=int, help="cv2.setNumThreads value")
+    parser.add_argument(
+        "--faces-dir", help="Directory of real face crops to use instead of synthetic faces"
+    )
+    parser.add_argument("--resolutions", default=DEFAULT_RESOLUTIONS)
+    parser.add_argument("--face-counts", default=DEFAULT_FACE_COUNTS)
+    parser.add_argument("--history-sizes", default=DEFAULT_HISTORY_SIZES)
+    parser.add_argument(
+        "--groups",
+        default="detector,decode,statistics,flask,http",
+        help="Comma-separated subset of detector,decode,statistics,flask,http",
+    )
+    parser.add_argument(
+        "--server-url",
+        default="local",
+        help="Base URL for the http group, or 'local' to start an in-process server "
+        "(a remote server's rate limit is waited out and counted in the latency)",
+    )
+    parser.add_argument(
+        "--quick", action="store_true", help="Small run for smoke testing"
+    )
+    args = parser.parse_args(argv)
+
+    if args.quick:
+        args.repeat = 3
+        args.warmup = 1
+        args.resolutions = "320x240,640x480"
+        args.face_counts = "0,1"
+        args.history_sizes = "1000,100000"
+
+    args.resolutions = [r for r in args.resolutions.split(",") if r]
+    args.face_counts = [int(n) for n in args.face_counts.split(",") if n]
+    args.history_sizes = [int(n) for n in args.history_sizes.split(",") if n]
+    args.groups = [g for g in args.groups.split(",") if g]
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    report = run(args)
+    _print_results(report)
+
+    regressions = []
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        report["comparison"] = compare(report, baseline)
+        for row in report["comparison"]:
+            flag = "REGRESSION" if row["regression"] else ""
+            print(
+                f"{row['name']:<28} {row['baseline_p50_ms']:>9.3f} -> "
+                f"{row['current_p50_ms']:>9.3f} ms  x{row['ratio']:.2f} {flag}"
+            )
+        regressions = [row for row in report["comparison"] if row["regression"]]
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
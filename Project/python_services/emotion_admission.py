@@ -0,0 +1,307 @@
+"""
+Admission control for the analysis endpoints
+Rejects oversized requests, rate-limits each session with a token bucket and caps the
+frames in flight across the process, all before any image is decoded, so one client
+cannot starve the other interviews served by the same process
+"""
+
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional, Sequence, Union
+
+from emotion_metrics import metrics
+
+
+class Rejection(Exception):
+    """A request refused by admission control"""
+
+    def __init__(
+        self,
+        status: int,
+        reason: str,
+        message: str,
+        retry_after: Optional[float] = None,
+    ):
+        """
+        Args:
+            status: HTTP status (413, 429 or 503)
+            reason: Short label used in metrics
+            message: Error message returned to the client
+            retry_after: Seconds the client should wait before retrying
+        """
+        super().__init__(message)
+        self.status = status
+        self.reason = reason
+        self.message = message
+        self.retry_after = retry_after
+
+    def headers(self) -> Dict[str, str]:
+        if self.retry_after is None:
+            return {}
+        return {"Retry-After": str(max(1, math.ceil(self.retry_after)))}
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at a fixed rate"""
+
+    def __init__(self, rate: float, burst: float, now: float):
+        """
+        Args:
+            rate: Tokens added per second
+            burst: Bucket capacity
+            now: Current monotonic time
+        """
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def take(self, cost: float, now: float) -> float:
+        """
+        Take tokens if available
+
+        Args:
+            cost: Tokens needed
+            now: Current monotonic time
+
+        Returns:
+            0 if the tokens were taken, otherwise seconds until they will be available
+        """
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        return (cost - self.tokens) / self.rate
+
+    def full(self, now: float) -> bool:
+        return self.tokens + (now - self.updated) * self.rate >= self.burst
+
+
+class AdmissionController:
+    """
+    Per-request admission decisions for the analysis endpoints
+
+    Checks run cheapest first: request size and the global in-flight cap before
+    the body is parsed, then batch size and encoded image size, then the
+    session's token bucket (one token per frame), and finally frames in flight.
+    Decoded pixel limits are enforced by the decoder from the image header.
+
+    Configuration (environment, 0 disables a limit):
+        EMOTION_MAX_REQUEST_BYTES: Largest request body (default 32 MiB)
+        EMOTION_MAX_BATCH_IMAGES: Images per batch request (default 32)
+        EMOTION_MAX_IMAGE_BYTES: Largest base64 image string (default 8 MiB)
+        EMOTION_MAX_FRAME_PIXELS: Largest decoded frame (default 3840x2160)
+        EMOTION_SESSION_RATE: Sustained frames per second per session (default 10)
+        EMOTION_SESSION_BURST: Frames a session may send at once (default 40)
+        EMOTION_MAX_IN_FLIGHT: Frames being analyzed across the process
+            (default 4 per CPU)
+    """
+
+    def __init__(
+        self,
+        max_request_bytes: int = 32 * 1024 * 1024,
+        max_batch_images: int = 32,
+        max_image_bytes: int = 8 * 1024 * 1024,
+        max_frame_pixels: int = 3840 * 2160,
+        session_rate: float = 10.0,
+        session_burst: float = 40.0,
+        max_in_flight: Optional[int] = None,
+        overload_retry_after: float = 1.0,
+    ):
+        self.max_request_bytes = max_request_bytes
+        self.max_batch_images = max_batch_images
+        self.max_image_bytes = max_image_bytes
+        self.max_frame_pixels = max_frame_pixels
+        self.session_rate = session_rate
+        # A full batch must always fit in an idle session's bucket
+        self.session_burst = max(session_burst, max_batch_images)
+        self.max_in_flight = (
+            max_in_flight if max_in_flight is not None else 4 * (os.cpu_count() or 1)
+        )
+        self.overload_retry_after = overload_retry_after
+
+        self.in_flight = 0
+        self.buckets: Dict[str, TokenBucket] = {}
+        self.next_prune = 0.0
+        self.lock = threading.Lock()
+
+        metrics.register_gauge(
+            "emotion_admission_in_flight_frames",
+            "Admitted frames currently being decoded or analyzed",
+            lambda: self.in_flight,
+        )
+        metrics.register_gauge(
+            "emotion_admission_tracked_clients",
+            "Sessions and addresses with a rate-limit bucket",
+            lambda: len(self.buckets),
+        )
+
+    @classmethod
+    def from_env(cls) -> "AdmissionController":
+        """Build a controller from the EMOTION_MAX_* / EMOTION_SESSION_* variables"""
+        in_flight = os.environ.get("EMOTION_MAX_IN_FLIGHT")
+        return cls(
+            max_request_bytes=int(
+                os.environ.get("EMOTION_MAX_REQUEST_BYTES", 32 * 1024 * 1024)
+            ),
+            max_batch_images=int(os.environ.get("EMOTION_MAX_BATCH_IMAGES", 32)),
+            max_image_bytes=int(
+                os.environ.get("EMOTION_MAX_IMAGE_BYTES", 8 * 1024 * 1024)
+            ),
+            max_frame_pixels=int(
+                os.environ.get("EMOTION_MAX_FRAME_PIXELS", 3840 * 2160)
+            ),
+            session_rate=float(os.environ.get("EMOTION_SESSION_RATE", 10)),
+            session_burst=float(os.environ.get("EMOTION_SESSION_BURST", 40)),
+            max_in_flight=int(in_flight) if in_flight else None,
+        )
+
+    def reject(self, route: str, rejection: Rejection) -> Rejection:
+        """Count a rejection and return it for raising"""
+        metrics.record_rejection(route, rejection.reason)
+        return rejection
+
+    def check_request(self, route: str, content_length: Optional[int]):
+        """
+        Checks that need nothing but the request headers
+
+        Raises:
+            Rejection: 413 for an oversized body, 503 when the process is saturated
+        """
+        if (
+            self.max_request_bytes
+            and content_length is not None
+            and content_length > self.max_request_bytes
+        ):
+            raise self.reject(
+                route,
+                Rejection(
+                    413,
+                    "request_bytes",
+                    f"Request body exceeds {self.max_request_bytes} bytes",
+                ),
+            )
+        if self.max_in_flight and self.in_flight >= self.max_in_flight:
+            raise self.reject(route, self._overloaded())
+
+    def _overloaded(self) -> Rejection:
+        return Rejection(
+            503,
+            "overloaded",
+            "Server is at capacity, retry shortly",
+            self.overload_retry_after,
+        )
+
+    @contextmanager
+    def admit(
+        self, route: str, client: Union[str, Sequence[str]], images: Sequence[str]
+    ):
+        """
+        Admit the frames of a parsed request and hold their in-flight slots
+
+        Args:
+            route: Route label used in metrics
+            client: Rate-limit key charged for every image (session id, or client
+                address without one), or one key per image for multi-session requests
+            images: Base64 image strings of the request
+
+        Raises:
+            Rejection: 413 for too many or too large images, 429 when the session is
+                over its rate, 503 when the frames do not fit in the in-flight cap
+        """
+        frames = len(images)
+        if self.max_batch_images and frames > self.max_batch_images:
+            raise self.reject(
+                route,
+                Rejection(
+                    413,
+                    "batch_size",
+                    f"Batch of {frames} images exceeds {self.max_batch_images}",
+                ),
+            )
+        if self.max_image_bytes and any(
+            len(image) > self.max_image_bytes for image in images
+        ):
+            raise self.reject(
+                route,
+                Rejection(
+                    413,
+                    "image_bytes",
+                    f"Image exceeds {self.max_image_bytes} encoded bytes",
+                ),
+            )
+
+        costs: Dict[str, int] = {}
+        for key in [client] * frames if isinstance(client, str) else client:
+            costs[key] = costs.get(key, 0) + 1
+
+        now = time.monotonic()
+        with self.lock:
+            rejection = None
+            taken = []
+            if self.session_rate > 0:
+                for key, cost in costs.items():
+                    bucket = self.buckets.get(key)
+                    if bucket is None:
+                        bucket = TokenBucket(self.session_rate, self.session_burst, now)
+                        self.buckets[key] = bucket
+                    wait = bucket.take(cost, now)
+                    if wait:
+                        rejection = Rejection(
+                            429,
+                            "rate_limited",
+                            f"Session exceeds {self.session_rate:g} frames per second",
+                            wait,
+                        )
+                        break
+                    taken.append((bucket, cost))
+                self._prune(now)
+
+            if (
+                rejection is None
+                and self.max_in_flight
+                and self.in_flight
+                and self.in_flight + frames > self.max_in_flight
+            ):
+                rejection = self._overloaded()
+
+            if rejection is None:
+                self.in_flight += frames
+            else:
+                # The frames were not analyzed, so give the tokens back
+                for bucket, cost in taken:
+                    bucket.tokens = min(bucket.burst, bucket.tokens + cost)
+
+        if rejection is not None:
+            raise self.reject(route, rejection)
+
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.in_flight -= frames
+
+    def _prune(self, now: float):
+        """Drop buckets that have refilled completely (caller holds the lock)"""
+        if now < self.next_prune:
+            return
+        self.next_prune = now + 60.0
+        for client in [c for c, b in self.buckets.items() if b.full(now)]:
+            del self.buckets[client]
+
+    def status(self) -> Dict:
+        """Current limits and load, for the JSON metrics endpoint"""
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "max_batch_images": self.max_batch_images,
+            "max_image_bytes": self.max_image_bytes,
+            "max_frame_pixels": self.max_frame_pixels,
+            "session_rate": self.session_rate,
+            "session_burst": self.session_burst,
+            "tracked_clients": len(self.buckets),
+        }
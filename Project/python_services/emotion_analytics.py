@@ -0,0 +1,583 @@
+"""
+Cross-session analytics over finished interviews
+Finished session timelines are rolled up at ingest into one SQLite row per session:
+scalar aggregates plus fixed-layout NumPy vectors (emotion_score histogram and
+per-minute emotion mix) stored as BLOB columns. Grouped aggregate queries fetch
+those columns with one indexed scan and reduce them with vectorized NumPy operations.
+
+Usage:
+    python emotion_analytics.py analytics.db summary --group-by job
+    python emotion_analytics.py analytics.db score-distribution --group-by week --since 2024-01-01
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from emotion_detection import EmotionDetector
+
+
+EMOTIONS = EmotionDetector.EMOTIONS
+
+# Width of the interview-time buckets used for the emotion mix
+BUCKET_SECONDS = 60
+
+# emotion_score histogram bins (scores are 0-100)
+SCORE_BIN_WIDTH = 10
+SCORE_BINS = 100 // SCORE_BIN_WIDTH
+
+PERCENTILES = (25, 50, 75, 90)
+
+# Column expression for each supported group_by value
+GROUP_COLUMNS = {
+    "none": "'all'",
+    "job": "s.job_id",
+    "week": "s.week",
+    "month": "s.month",
+    "dominant_emotion": "s.dominant_emotion",
+}
+
+# Per-bucket timeline columns: observations, emotion_score sum, positive faces, then
+# the count of faces per dominant emotion
+TIMELINE_COLUMNS = 3 + len(EMOTIONS)
+TIMELINE_DTYPE = np.dtype("<f8")
+HISTOGRAM_DTYPE = np.dtype("<i8")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    session_id TEXT NOT NULL UNIQUE,
+    job_id TEXT,
+    started_at REAL NOT NULL,
+    week TEXT NOT NULL,
+    month TEXT NOT NULL,
+    duration_s REAL NOT NULL,
+    frames INTEGER NOT NULL,
+    observations INTEGER NOT NULL,
+    average_score REAL,
+    positive_ratio REAL,
+    dominant_emotion TEXT,
+    score_histogram BLOB NOT NULL,
+    timeline BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_job ON sessions (job_id, started_at);
+CREATE INDEX IF NOT EXISTS sessions_started ON sessions (started_at);
+"""
+
+
+def _parse_time(value) -> Optional[float]:
+    """Unix seconds from an ISO string, a number, or None"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    parsed = datetime.fromisoformat(str(value))
+    if parsed.tzinfo is None:
+        return parsed.timestamp()
+    return parsed.astimezone(timezone.utc).timestamp()
+
+
+def grouped_percentiles(
+    codes: np.ndarray, values: np.ndarray, groups: int, percentiles: Sequence[float]
+) -> np.ndarray:
+    """
+    Linear-interpolated percentiles per group in one vectorized pass
+
+    Args:
+        codes: Group index (0..groups-1) of every value
+        values: Values
+        groups: Number of groups
+        percentiles: Percentiles in 0-100
+
+    Returns:
+        Array of shape (groups, len(percentiles)); NaN for empty groups
+    """
+    order = np.lexsort((values, codes))
+    codes = codes[order]
+    values = values[order]
+
+    starts = np.searchsorted(codes, np.arange(groups))
+    counts = np.bincount(codes, minlength=groups)
+    result = np.full((groups, len(percentiles)), np.nan)
+    present = counts > 0
+    if not present.any():
+        return result
+
+    q = np.asarray(percentiles, dtype=float) / 100
+    position = starts[present, None] + (counts[present, None] - 1) * q
+    lower = np.floor(position).astype(np.int64)
+    upper = np.ceil(position).astype(np.int64)
+    result[present] = values[lower] + (values[upper] - values[lower]) * (
+        position - lower
+    )
+    return result
+
+
+def grouped_sums(codes: np.ndarray, rows: np.ndarray, groups: int) -> np.ndarray:
+    """
+    Column sums of rows per group
+
+    Args:
+        codes: Group index of every row
+        rows: 2-D array of values
+        groups: Number of groups
+
+    Returns:
+        Array of shape (groups, rows.shape[1])
+    """
+    return np.stack(
+        [
+            np.bincount(codes, weights=rows[:, column], minlength=groups)
+            for column in range(rows.shape[1])
+        ],
+        axis=1,
+    ).reshape(groups, rows.shape[1])
+
+
+def _group_codes(keys: Sequence) -> Tuple[List, np.ndarray]:
+    """Sorted distinct group keys (None kept) and the group index of every key"""
+    labels, codes = np.unique(
+        np.array(["" if key is None else str(key) for key in keys]),
+        return_inverse=True,
+    )
+    return [label or None for label in labels.tolist()], codes.reshape(-1)
+
+
+class AnalyticsStore:
+    """
+    Local store of finished interview sessions for cross-session queries
+
+    Each session is reduced at ingest to a single row, so queries never touch raw
+    frames: a query is one scan of the sessions table (narrowed by the job_id and
+    started_at indexes) followed by NumPy reductions over the fetched columns.
+    Connections are per thread; WAL mode lets dashboard reads run while sessions
+    are ingested.
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: SQLite database file (created if missing)
+        """
+        self.path = path
+        self.local = threading.local()
+        self._connect().executescript(SCHEMA)
+
+    @classmethod
+    def from_env(cls) -> Optional["AnalyticsStore"]:
+        """
+        Build a store from EMOTION_ANALYTICS_DB
+
+        Returns:
+            AnalyticsStore, or None when the variable is unset
+        """
+        path = os.environ.get("EMOTION_ANALYTICS_DB")
+        return cls(path) if path else None
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self.local.connection = connection
+        return connection
+
+    def ingest_session(
+        self,
+        session_id: str,
+        frames: Iterable[Tuple[float, List[Dict]]],
+        started_at=None,
+        job_id: Optional[str] = None,
+    ) -> Dict:
+        """
+        Roll up a finished session and store it, replacing an earlier ingest of it
+
+        Args:
+            session_id: Session identifier
+            frames: (offset in seconds from the interview start, faces) per analyzed
+                frame, faces as returned by EmotionDetector.analyze_frame
+            started_at: Interview start (ISO string or unix seconds; default now)
+            job_id: Job the interview was for
+
+        Returns:
+            The stored session summary (without the vector columns)
+        """
+        frames = list(frames)
+        offsets, scores, positive, dominant = [], [], [], []
+        for offset, faces in frames:
+            for face in faces:
+                offsets.append(offset)
+                scores.append(face["emotion_score"])
+                positive.append(face["is_positive"])
+                dominant.append(EMOTIONS.index(face["dominant_emotion"]))
+
+        offsets = np.asarray(offsets, dtype=float)
+        scores = np.asarray(scores, dtype=float)
+        positive = np.asarray(positive, dtype=float)
+        dominant = np.asarray(dominant, dtype=np.int64)
+
+        started = _parse_time(started_at)
+        if started is None:
+            started = datetime.now().timestamp()
+        start_date = datetime.fromtimestamp(started)
+        iso_year, iso_week, _ = start_date.isocalendar()
+
+        observations = len(scores)
+        emotion_counts = np.bincount(dominant, minlength=len(EMOTIONS))
+
+        # Dense (bucket, column) timeline built with bincounts over the faces
+        buckets = (np.maximum(offsets, 0) // BUCKET_SECONDS).astype(np.int64)
+        bucket_count = int(buckets.max()) + 1 if observations else 0
+        timeline = np.zeros((bucket_count, TIMELINE_COLUMNS), dtype=TIMELINE_DTYPE)
+        timeline[:, 0] = np.bincount(buckets, minlength=bucket_count)
+        timeline[:, 1] = np.bincount(buckets, weights=scores, minlength=bucket_count)
+        timeline[:, 2] = np.bincount(buckets, weights=positive, minlength=bucket_count)
+        timeline[:, 3:] = np.bincount(
+            buckets * len(EMOTIONS) + dominant,
+            minlength=bucket_count * len(EMOTIONS),
+        ).reshape(bucket_count, len(EMOTIONS))
+
+        bins = np.clip(scores // SCORE_BIN_WIDTH, 0, SCORE_BINS - 1).astype(np.int64)
+        histogram = np.bincount(bins, minlength=SCORE_BINS).astype(HISTOGRAM_DTYPE)
+
+        summary = {
+            "session_id": session_id,
+            "job_id": job_id,
+            "started_at": started,
+            "week": f"{iso_year}-W{iso_week:02d}",
+            "month": start_date.strftime("%Y-%m"),
+            "duration_s": max((offset for offset, _ in frames), default=0.0),
+            "frames": len(frames),
+            "observations": observations,
+            "average_score": float(scores.mean()) if observations else None,
+            "positive_ratio": float(positive.mean()) if observations else None,
+            "dominant_emotion": (
+                EMOTIONS[int(emotion_counts.argmax())] if observations else None
+            ),
+        }
+        row = dict(
+            summary, score_histogram=histogram.tobytes(), timeline=timeline.tobytes()
+        )
+
+        connection = self._connect()
+        with connection:
+            connection.execute(
+                f"INSERT OR REPLACE INTO sessions ({', '.join(row)}) "
+                f"VALUES ({', '.join(f':{key}' for key in row)})",
+                row,
+            )
+        return summary
+
+    def ingest_history(
+        self,
+        session_id: str,
+        history: List[Dict],
+        created_at=None,
+        job_id: Optional[str] = None,
+    ) -> Dict:
+        """
+        Ingest an API session's emotion_history ({"timestamp", "faces"} per frame)
+
+        Args:
+            session_id: Session identifier
+            history: Frames in analysis order with ISO timestamps
+            created_at: Session creation time (ISO string)
+            job_id: Job the interview was for
+
+        Returns:
+            The stored session summary
+        """
+        times = [_parse_time(entry["timestamp"]) for entry in history]
+        started = _parse_time(created_at)
+        if started is None and times:
+            started = times[0]
+        frames = [
+            (max(0.0, time - started), entry["faces"])
+            for time, entry in zip(times, history)
+        ]
+        return self.ingest_session(session_id, frames, started, job_id)
+
+    def delete_session(self, session_id: str) -> bool:
+        """Remove an ingested session; returns whether it existed"""
+        connection = self._connect()
+        with connection:
+            cursor = connection.execute(
+                "DELETE FROM sessions WHERE session_id = ?", (session_id,)
+            )
+        return cursor.rowcount > 0
+
+    def _scan(
+        self,
+        columns: str,
+        group_by: str,
+        job_id: Optional[str],
+        since,
+        until,
+    ) -> List[Tuple]:
+        """Fetch (group key, *columns) for every session matching the filters"""
+        if group_by not in GROUP_COLUMNS:
+            raise ValueError(
+                f"group_by must be one of {', '.join(GROUP_COLUMNS)}, got {group_by!r}"
+            )
+
+        clauses, params = [], []
+        if job_id is not None:
+            clauses.append("s.job_id = ?")
+            params.append(job_id)
+        if since is not None:
+            clauses.append("s.started_at >= ?")
+            params.append(_parse_time(since))
+        if until is not None:
+            clauses.append("s.started_at < ?")
+            params.append(_parse_time(until))
+        where = (" WHERE " + " AND ".join(clauses)) if clauses else ""
+
+        return (
+            self._connect()
+            .execute(
+                f"SELECT {GROUP_COLUMNS[group_by]}, {columns} FROM sessions s{where}",
+                params,
+            )
+            .fetchall()
+        )
+
+    def summary(
+        self,
+        group_by: str = "none",
+        job_id: Optional[str] = None,
+        since=None,
+        until=None,
+    ) -> List[Dict]:
+        """
+        Session counts, average emotion_score and positive_ratio percentiles per group
+
+        Args:
+            group_by: 'none', 'job', 'week', 'month' or 'dominant_emotion'
+            job_id: Only sessions for this job
+            since: Only sessions started at or after this time (ISO or unix seconds)
+            until: Only sessions started before this time
+
+        Returns:
+            One dictionary per group, ordered by group
+        """
+        rows = self._scan(
+            "s.observations, s.average_score, s.positive_ratio",
+            group_by,
+            job_id,
+            since,
+            until,
+        )
+        if not rows:
+            return []
+
+        keys, observations, average_score, positive_ratio = zip(*rows)
+        labels, codes = _group_codes(keys)
+        groups = len(labels)
+
+        observations = np.array(observations, dtype=float)
+        average_score = np.array(average_score, dtype=float)
+        positive_ratio = np.array(positive_ratio, dtype=float)
+        scored = ~np.isnan(positive_ratio)
+
+        sessions = np.bincount(codes, minlength=groups)
+        totals = grouped_sums(
+            codes[scored],
+            np.column_stack(
+                [observations[scored], average_score[scored] * observations[scored]]
+            ),
+            groups,
+        )
+        percentiles = grouped_percentiles(
+            codes[scored], positive_ratio[scored], groups, PERCENTILES
+        )
+
+        return [
+            {
+                "group": label,
+                "sessions": int(sessions[index]),
+                "observations": int(totals[index, 0]),
+                "average_score": (
+                    round(float(totals[index, 1] / totals[index, 0]), 2)
+                    if totals[index, 0]
+                    else None
+                ),
+                "positive_ratio": {
+                    f"p{p}": (
+                        None
+                        if np.isnan(percentiles[index, column])
+                        else round(float(percentiles[index, column]), 4)
+                    )
+                    for column, p in enumerate(PERCENTILES)
+                },
+            }
+            for index, label in enumerate(labels)
+        ]
+
+    def score_distribution(
+        self,
+        group_by: str = "none",
+        job_id: Optional[str] = None,
+        since=None,
+        until=None,
+    ) -> List[Dict]:
+        """
+        Histogram of per-face emotion_score (SCORE_BIN_WIDTH-wide bins) per group
+
+        Args:
+            group_by, job_id, since, until: As in summary()
+
+        Returns:
+            One dictionary per group with bin edges and counts
+        """
+        rows = self._scan("s.score_histogram", group_by, job_id, since, until)
+        if not rows:
+            return []
+
+        keys, histograms = zip(*rows)
+        labels, codes = _group_codes(keys)
+        histograms = np.frombuffer(
+            b"".join(histograms), dtype=HISTOGRAM_DTYPE
+        ).reshape(-1, SCORE_BINS)
+        counts = grouped_sums(codes, histograms, len(labels)).astype(np.int64)
+
+        return [
+            {
+                "group": label,
+                "bin_edges": list(range(0, 101, SCORE_BIN_WIDTH)),
+                "counts": counts[index].tolist(),
+                "observations": int(counts[index].sum()),
+            }
+            for index, label in enumerate(labels)
+        ]
+
+    def emotion_timeline(
+        self,
+        group_by: str = "none",
+        job_id: Optional[str] = None,
+        since=None,
+        until=None,
+    ) -> List[Dict]:
+        """
+        Emotion mix and average score per BUCKET_SECONDS of interview time per group
+
+        Args:
+            group_by, job_id, since, until: As in summary()
+
+        Returns:
+            One dictionary per group with its non-empty buckets
+        """
+        rows = self._scan("s.timeline", group_by, job_id, since, until)
+        if not rows:
+            return []
+
+        keys, timelines = zip(*rows)
+        labels, codes = _group_codes(keys)
+        groups = len(labels)
+
+        row_size = TIMELINE_COLUMNS * TIMELINE_DTYPE.itemsize
+        lengths = np.array([len(blob) // row_size for blob in timelines])
+        buckets_per_group = int(lengths.max()) if len(lengths) else 0
+        if buckets_per_group == 0:
+            return []
+        values = np.frombuffer(b"".join(timelines), dtype=TIMELINE_DTYPE).reshape(
+            -1, TIMELINE_COLUMNS
+        )
+
+        # Index of every stored bucket within its session, then a flat (group, bucket) key
+        first_row = np.repeat(np.cumsum(lengths) - lengths, lengths)
+        bucket = np.arange(len(values)) - first_row
+        key = np.repeat(codes, lengths) * buckets_per_group + bucket
+        cells = groups * buckets_per_group
+
+        totals = grouped_sums(key, values, cells).reshape(
+            groups, buckets_per_group, TIMELINE_COLUMNS
+        )
+        sessions = np.bincount(
+            key, weights=values[:, 0] > 0, minlength=cells
+        ).reshape(groups, buckets_per_group)
+
+        result = []
+        for index, label in enumerate(labels):
+            buckets = []
+            for bucket_index in np.flatnonzero(totals[index, :, 0]):
+                observations, score_sum, positive, *counts = totals[index, bucket_index]
+                buckets.append(
+                    {
+                        "start_s": int(bucket_index) * BUCKET_SECONDS,
+                        "sessions": int(sessions[index, bucket_index]),
+                        "observations": int(observations),
+                        "average_score": round(score_sum / observations, 2),
+                        "positive_ratio": round(positive / observations, 4),
+                        "emotion_mix": {
+                            emotion: round(count / observations, 4)
+                            for emotion, count in zip(EMOTIONS, counts)
+                        },
+                    }
+                )
+            if buckets:
+                result.append(
+                    {"group": label, "bucket_seconds": BUCKET_SECONDS, "buckets": buckets}
+                )
+        return result
+
+    def query(self, name: str, **params) -> List[Dict]:
+        """
+        Run a named query ('summary', 'score-distribution' or 'emotion-timeline')
+
+        Raises:
+            ValueError: Unknown query name or group_by
+        """
+        queries = {
+            "summary": self.summary,
+            "score-distribution": self.score_distribution,
+            "emotion-timeline": self.emotion_timeline,
+        }
+        if name not in queries:
+            raise ValueError(f"Unknown analytics query: {name}")
+        return queries[name](**params)
+
+    def close(self):
+        """Close this thread's connection"""
+        connection = getattr(self.local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self.local.connection = None
+
+
+def parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("database", help="Analytics SQLite database")
+    parser.add_argument(
+        "query", choices=["summary", "score-distribution", "emotion-timeline"]
+    )
+    parser.add_argument("--group-by", default="none", choices=list(GROUP_COLUMNS))
+    parser.add_argument("--job-id", help="Only sessions for this job")
+    parser.add_argument("--since", help="Only sessions started at or after (ISO date)")
+    parser.add_argument("--until", help="Only sessions started before (ISO date)")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    store = AnalyticsStore(args.database)
+    result = store.query(
+        args.query,
+        group_by=args.group_by,
+        job_id=args.job_id,
+        since=args.since,
+        until=args.until,
+    )
+    print(json.dumps(result, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
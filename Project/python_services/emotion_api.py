@@ -3,17 +3,37 @@ Flask API for Emotion Detection Service
 Provides REST API endpoints for real-time emotion analysis
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
 import cv2
 import numpy as np
 import base64
 from emotion_detection import (
+    REDUCED_DECODE_FLAGS,
     EmotionDetector,
+    ImageTooLargeError,
     decode_base64_image,
     encode_image_to_base64,
 )
+from emotion_admission import AdmissionController, Rejection
+from emotion_analytics import AnalyticsStore
+from emotion_capture import CaptureAdvisor
+from emotion_inference_pool import InferencePool
+from emotion_metrics import collect_timings, current_timings, metrics, stage
+from emotion_profiler import RequestProfiler, format_collapsed
+from emotion_report import (
+    ReportCache,
+    calculate_performance_score,
+    generate_recommendations,
+)
+from emotion_snapshot import SessionSnapshotter
+import atexit
+import hmac
 import os
+import threading
+import time
+from functools import wraps
+from typing import Optional
 from datetime import datetime
 import json
 
@@ -26,8 +46,314 @@ detector = EmotionDetector()
 # Store session data (in production, use Redis or database)
 session_data = {}
 
+metrics.register_gauge(
+    "emotion_active_sessions", "Sessions with stored data", lambda: len(session_data)
+)
+
+# Opt-in request profiler (EMOTION_PROFILE_SAMPLE_RATE > 0 enables sampling)
+profiler = RequestProfiler.from_env()
+
+# Token required by /admin endpoints; admin endpoints are disabled when unset
+ADMIN_TOKEN = os.environ.get("EMOTION_ADMIN_TOKEN")
+
+# Downscale factor for frames that are analyzed but not annotated (1 disables)
+DECODE_REDUCTION = int(os.environ.get("EMOTION_DECODE_REDUCTION", 2))
+
+# Reductions a request may ask for: those that still detect MIN_FACE_SIZE faces
+REQUEST_REDUCTIONS = tuple(
+    reduction
+    for reduction in (1, *sorted(REDUCED_DECODE_FLAGS))
+    if EmotionDetector.CASCADE_WINDOW * reduction <= EmotionDetector.MIN_FACE_SIZE
+)
+REDUCTION_ERROR = "decode_reduction must be one of " + ", ".join(
+    map(str, REQUEST_REDUCTIONS)
+)
+
+# Capture fps / resolution / JPEG quality recommended to clients (EMOTION_HINT_*)
+capture_advisor = CaptureAdvisor.from_env(DECODE_REDUCTION)
+
+# Sessions classify only the candidate's face unless a request asks for "faces": "all"
+PRIMARY_SUBJECT = os.environ.get("EMOTION_PRIMARY_SUBJECT", "1") != "0"
+
+# Size limits, per-session rate limits and the in-flight cap (EMOTION_MAX_* / EMOTION_SESSION_*)
+admission = AdmissionController.from_env()
+
+# Multi-stream requests detect faces in one mosaic of all frames when enabled
+STREAM_MOSAIC = os.environ.get("EMOTION_STREAM_MOSAIC", "0") == "1"
+MOSAIC_TILE = tuple(
+    int(value) for value in os.environ.get("EMOTION_MOSAIC_TILE", "480x360").split("x")
+)
+
+# Inference process pool (EMOTION_INFERENCE_PROCESSES > 0), started on first use
+inference_pool = None
+_inference_pool_started = False
+_inference_pool_lock = threading.Lock()
+
+
+def _get_inference_pool():
+    """Start the inference pool lazily so importing this module never spawns processes"""
+    global inference_pool, _inference_pool_started
+
+    if not _inference_pool_started:
+        with _inference_pool_lock:
+            if not _inference_pool_started:
+                inference_pool = InferencePool.from_env()
+                _inference_pool_started = True
+    return inference_pool
+
+
+# Built reports per session; a stale report is served for at most this many seconds,
+# and reports of idle sessions expire with their tracking state
+report_cache = ReportCache(
+    float(os.environ.get("EMOTION_REPORT_MIN_INTERVAL", 1.0)),
+    session_ttl=detector.session_ttl,
+)
+
+# Finished sessions are rolled up here on DELETE (EMOTION_ANALYTICS_DB)
+analytics_store = AnalyticsStore.from_env()
+
+# Session snapshots (EMOTION_SNAPSHOT_DIR), restored before the first request is served
+snapshotter = None
+_snapshots_started = False
+_snapshot_lock = threading.Lock()
+
+
+@app.before_request
+def _ensure_snapshots():
+    """
+    Restore snapshotted sessions and start periodic snapshots, once per process
+
+    Runs on the first request rather than at import so that reloader parents and
+    inference pool processes never restore or write snapshots; a file lock keeps a
+    single writer when several server processes share the directory.
+    """
+    global snapshotter, _snapshots_started
+
+    if _snapshots_started:
+        return
+    with _snapshot_lock:
+        if _snapshots_started:
+            return
+        try:
+            candidate = SessionSnapshotter.from_env()
+            if candidate is None:
+                return
+            if not candidate.acquire_writer_lock():
+                print("Session snapshots are written by another process; disabled here")
+                return
+
+            start = time.perf_counter()
+            session_data.update(candidate.restore(detector))
+            print(
+                f"Restored {len(session_data)} sessions from {candidate.directory} "
+                f"in {(time.perf_counter() - start) * 1000:.1f}ms"
+            )
+            candidate.start(session_data)
+            atexit.register(candidate.stop, session_data)
+            snapshotter = candidate
+        finally:
+            _snapshots_started = True
+
+
+def _analyze_frame(
+    frame, session_id=None, scale: int = 1, primary_only: bool = False
+) -> dict:
+    """Analyze a single frame (see _analyze_frames)"""
+    return _analyze_frames([frame], session_id, scale, primary_only)[0]
+
+
+def _analyze_frames(
+    frames, session_id=None, scale: int = 1, primary_only: bool = False
+) -> list:
+    """
+    Analyze consecutive frames of a session, in the inference pool when one is configured
+
+    Detection and classification run in the pool frame by frame, or locally with
+    all faces of all frames classified in one batch (also while no inference
+    process is alive); tracking, smoothing, the
+    primary-subject lock and history stay in this process with the session
+    state. Each result carries capture hints for the client.
+    """
+    pool = _get_inference_pool()
+    with capture_advisor.track(len(frames)):
+        if (
+            pool is None
+            or not pool.available()
+            or not all(pool.fits(frame) for frame in frames)
+        ):
+            results = detector.analyze_frames(frames, session_id, scale, primary_only)
+        else:
+            results = []
+            for frame in frames:
+                primary_bbox = detector.get_session_smoother(session_id).primary_bbox
+                detections = pool.detect_and_classify(
+                    frame, scale, primary_only, primary_bbox
+                )
+                results.append(
+                    detector.build_results(detections, session_id, primary_only)
+                )
+
+    for frame, result in zip(frames, results):
+        frame_size = (frame.shape[1] * scale, frame.shape[0] * scale)
+        result["capture_hints"] = capture_advisor.hints(
+            session_id, result, frame_size, scale
+        )
+    return results
+
+
+def _analyze_streams(
+    frames, session_ids, scale: int = 1, primary_only: bool = False, mosaic=False
+) -> list:
+    """
+    Analyze simultaneous frames of several sessions (see EmotionDetector.analyze_streams)
+
+    Runs in this process even with an inference pool: the point is a single
+    detection and classification pass for the whole group.
+    """
+    with capture_advisor.track(len(frames)):
+        results = detector.analyze_streams(
+            frames, session_ids, scale, primary_only, mosaic, MOSAIC_TILE
+        )
+
+    for frame, session_id, result in zip(frames, session_ids, results):
+        frame_size = (frame.shape[1] * scale, frame.shape[0] * scale)
+        result["capture_hints"] = capture_advisor.hints(
+            session_id, result, frame_size, scale
+        )
+    return results
+
+
+def _is_admin() -> bool:
+    """Whether the request carries the admin token"""
+    token = request.headers.get("X-Admin-Token", "")
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(token, ADMIN_TOKEN)
+
+
+def instrument_route(name: str):
+    """
+    Record request count, status and latency for a route, collect per-stage timings
+    and profile the request when it is sampled
+
+    Args:
+        name: Route label used in metrics
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            force_profile = request.headers.get("X-Profile") == "1" and _is_admin()
+            with collect_timings(), profiler.maybe_profile(name, force_profile):
+                response = app.make_response(view(*args, **kwargs))
+            metrics.record_request(
+                name, response.status_code, time.perf_counter() - start
+            )
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def _decode_reduction(data: dict):
+    """
+    Decode reduction for a request: the "decode_reduction" field or the service default
+
+    Requests may only pick reductions that keep the minimum face size; larger
+    factors are available as the service default (EMOTION_DECODE_REDUCTION).
+
+    Returns:
+        Reduction factor, or None if the requested value is not supported
+    """
+    if "decode_reduction" not in data:
+        return DECODE_REDUCTION
+    reduction = data["decode_reduction"]
+    if isinstance(reduction, int) and not isinstance(reduction, bool):
+        if reduction in REQUEST_REDUCTIONS:
+            return reduction
+    return None
+
+
+def _primary_only(data: dict, has_session: Optional[bool] = None):
+    """
+    Face mode for a request: the "faces" field ("primary" or "all") or the default
+
+    The default is primary-subject mode for requests with a session_id.
+
+    Args:
+        data: Request body
+        has_session: Whether the request belongs to sessions (default: it has a session_id)
+
+    Returns:
+        Whether to classify only the primary subject, or None if "faces" is invalid
+    """
+    mode = data.get("faces")
+    if mode is None:
+        if has_session is None:
+            has_session = bool(data.get("session_id"))
+        return PRIMARY_SUBJECT and has_session
+    if mode in ("primary", "all"):
+        return mode == "primary"
+    return None
+
+
+def _rate_limit_key(session_id: Optional[str]) -> str:
+    """Rate-limit bucket of a request: its session, or the client address without one"""
+    return session_id or f"addr:{request.remote_addr}"
+
+
+def _decode_admitted(route: str, image_base64: str, reduction: int = 1):
+    """
+    Decode an admitted image, refusing it from its header if it has too many pixels
+
+    Raises:
+        Rejection: 413 if the image exceeds EMOTION_MAX_FRAME_PIXELS
+    """
+    try:
+        return decode_base64_image(image_base64, reduction, admission.max_frame_pixels)
+    except ImageTooLargeError as e:
+        raise admission.reject(route, Rejection(413, "frame_pixels", str(e)))
+
+
+def _rejection_response(rejection: Rejection):
+    """Error response for a request refused by admission control"""
+    return (
+        jsonify({"success": False, "error": rejection.message}),
+        rejection.status,
+        rejection.headers(),
+    )
+
+
+def _debug_timings_requested() -> bool:
+    """Whether the client asked for per-stage timings in the response"""
+    if request.args.get("debug_timings", "").lower() in ("1", "true", "yes"):
+        return True
+    data = request.get_json(silent=True)
+    return isinstance(data, dict) and bool(data.get("debug_timings"))
+
+
+def _success_response(payload: dict):
+    """
+    Serialize a response payload, attaching per-stage timings when requested
+
+    Args:
+        payload: Response body
+
+    Returns:
+        Flask JSON response
+    """
+    timings = current_timings()
+    if timings is not None and _debug_timings_requested():
+        payload["debug_timings"] = {
+            name: round(ms, 3) for name, ms in timings.items()
+        }
+
+    with stage("jsonify"):
+        return jsonify(payload)
+
 
 @app.route("/health", methods=["GET"])
+@instrument_route("health")
 def health_check():
     """Health check endpoint"""
     return jsonify(
@@ -39,7 +365,79 @@ def health_check():
     )
 
 
+@app.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    """Prometheus scrape endpoint"""
+    return Response(
+        metrics.render_prometheus(), mimetype="text/plain; version=0.0.4"
+    )
+
+
+@app.route("/api/emotion/metrics", methods=["GET"])
+def metrics_summary():
+    """Per-stage and per-route latency percentiles as JSON"""
+    data = metrics.summary()
+    data["active_sessions"] = len(session_data)
+    data["admission"] = admission.status()
+    return jsonify({"success": True, "data": data})
+
+
+@app.route("/admin/profiling", methods=["GET", "POST", "DELETE"])
+def profiling_admin():
+    """
+    Inspect or configure the request profiler (requires X-Admin-Token)
+
+    GET returns the configuration and retained profiles, POST accepts
+    {"sample_rate": 0.05} and DELETE drops all retained profiles.
+    """
+    if not _is_admin():
+        return jsonify({"success": False, "error": "Forbidden"}), 403
+
+    if request.method == "POST":
+        data = request.get_json(silent=True) or {}
+        try:
+            profiler.configure(sample_rate=data.get("sample_rate"))
+        except (TypeError, ValueError):
+            return jsonify({"success": False, "error": "Invalid sample_rate"}), 400
+    elif request.method == "DELETE":
+        profiler.clear()
+
+    return jsonify(
+        {
+            "success": True,
+            "data": {"status": profiler.status(), "profiles": profiler.list_profiles()},
+        }
+    )
+
+
+@app.route("/admin/profiling/routes/<route>", methods=["GET"])
+def profiling_route_stacks(route):
+    """Collapsed stacks aggregated over all profiled requests of a route"""
+    if not _is_admin():
+        return jsonify({"success": False, "error": "Forbidden"}), 403
+
+    collapsed = profiler.collapsed_for_route(route)
+    if collapsed is None:
+        return jsonify({"success": False, "error": "No profiles for route"}), 404
+
+    return Response(collapsed, mimetype="text/plain")
+
+
+@app.route("/admin/profiling/profiles/<int:profile_id>", methods=["GET"])
+def profiling_profile_stacks(profile_id):
+    """Collapsed stacks of a single profiled request"""
+    if not _is_admin():
+        return jsonify({"success": False, "error": "Forbidden"}), 403
+
+    profile = profiler.get_profile(profile_id)
+    if profile is None:
+        return jsonify({"success": False, "error": "Profile not found"}), 404
+
+    return Response(format_collapsed(profile["stacks"]), mimetype="text/plain")
+
+
 @app.route("/api/emotion/analyze", methods=["POST"])
+@instrument_route("analyze")
 def analyze_emotion():
     """
     Analyze emotion from a single frame
@@ -47,7 +445,10 @@ def analyze_emotion():
     Expected JSON body:
     {
         "image": "base64_encoded_image",
-        "session_id": "optional_session_id"
+        "session_id": "optional_session_id",
+        "decode_reduction": 2,
+        "faces": "primary" | "all",
+        "debug_timings": false
     }
 
     Returns:
@@ -61,23 +462,37 @@ def analyze_emotion():
     }
     """
     try:
+        admission.check_request("analyze", request.content_length)
         data = request.get_json()
 
         if not data or "image" not in data:
             return jsonify({"success": False, "error": "Missing image data"}), 400
 
-        # Decode image
+        reduction = _decode_reduction(data)
+        if reduction is None:
+            return jsonify({"success": False, "error": REDUCTION_ERROR}), 400
+
+        primary_only = _primary_only(data)
+        if primary_only is None:
+            return jsonify({"success": False, "error": "Invalid faces mode"}), 400
+
         image_base64 = data["image"]
-        frame = decode_base64_image(image_base64)
+        session_id = data.get("session_id")
 
-        if frame is None:
-            return jsonify({"success": False, "error": "Failed to decode image"}), 400
+        with admission.admit("analyze", _rate_limit_key(session_id), [image_base64]):
+            # Decode image (grayscale at reduced resolution: no annotation is drawn)
+            frame = _decode_admitted("analyze", image_base64, reduction)
 
-        # Analyze frame
-        results = detector.analyze_frame(frame)
+            if frame is None:
+                return (
+                    jsonify({"success": False, "error": "Failed to decode image"}),
+                    400,
+                )
+
+            # Analyze frame
+            results = _analyze_frame(frame, session_id, reduction, primary_only)
 
         # Store in session if session_id provided
-        session_id = data.get("session_id")
         if session_id:
             if session_id not in session_data:
                 session_data[session_id] = {
@@ -91,13 +506,16 @@ def analyze_emotion():
                 {"timestamp": results["timestamp"], "faces": results["faces"]}
             )
 
-        return jsonify({"success": True, "data": results})
+        return _success_response({"success": True, "data": results})
 
+    except Rejection as rejection:
+        return _rejection_response(rejection)
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
 
 @app.route("/api/emotion/analyze-annotated", methods=["POST"])
+@instrument_route("analyze_annotated")
 def analyze_emotion_annotated():
     """
     Analyze emotion and return annotated image
@@ -105,7 +523,8 @@ def analyze_emotion_annotated():
     Expected JSON body:
     {
         "image": "base64_encoded_image",
-        "session_id": "optional_session_id"
+        "session_id": "optional_session_id",
+        "faces": "primary" | "all"
     }
 
     Returns:
@@ -118,29 +537,41 @@ def analyze_emotion_annotated():
     }
     """
     try:
+        admission.check_request("analyze_annotated", request.content_length)
         data = request.get_json()
 
         if not data or "image" not in data:
             return jsonify({"success": False, "error": "Missing image data"}), 400
 
-        # Decode image
+        primary_only = _primary_only(data)
+        if primary_only is None:
+            return jsonify({"success": False, "error": "Invalid faces mode"}), 400
+
         image_base64 = data["image"]
-        frame = decode_base64_image(image_base64)
+        session_id = data.get("session_id")
 
-        if frame is None:
-            return jsonify({"success": False, "error": "Failed to decode image"}), 400
+        with admission.admit(
+            "analyze_annotated", _rate_limit_key(session_id), [image_base64]
+        ):
+            # Decode image
+            frame = _decode_admitted("analyze_annotated", image_base64)
 
-        # Analyze frame
-        results = detector.analyze_frame(frame)
+            if frame is None:
+                return (
+                    jsonify({"success": False, "error": "Failed to decode image"}),
+                    400,
+                )
+
+            # Analyze frame
+            results = _analyze_frame(frame, session_id, primary_only=primary_only)
 
-        # Draw annotations
-        annotated_frame = detector.draw_annotations(frame, results)
+            # Draw annotations
+            annotated_frame = detector.draw_annotations(frame, results)
 
-        # Encode annotated image
-        annotated_base64 = encode_image_to_base64(annotated_frame)
+            # Encode annotated image
+            annotated_base64 = encode_image_to_base64(annotated_frame)
 
         # Store in session if session_id provided
-        session_id = data.get("session_id")
         if session_id:
             if session_id not in session_data:
                 session_data[session_id] = {
@@ -154,18 +585,21 @@ def analyze_emotion_annotated():
                 {"timestamp": results["timestamp"], "faces": results["faces"]}
             )
 
-        return jsonify(
+        return _success_response(
             {
                 "success": True,
                 "data": {"analysis": results, "annotated_image": annotated_base64},
             }
         )
 
+    except Rejection as rejection:
+        return _rejection_response(rejection)
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
 
 @app.route("/api/emotion/statistics/<session_id>", methods=["GET"])
+@instrument_route("statistics")
 def get_session_statistics(session_id):
     """
     Get emotion statistics for a session
@@ -197,17 +631,21 @@ def get_session_statistics(session_id):
             "duration": _calculate_duration(session["created_at"]),
         }
 
-        return jsonify({"success": True, "data": stats})
+        return _success_response({"success": True, "data": stats})
 
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
 
 @app.route("/api/emotion/session/<session_id>", methods=["DELETE"])
+@instrument_route("delete_session")
 def delete_session(session_id):
     """
     Delete session data and reset statistics
 
+    With EMOTION_ANALYTICS_DB set, the finished session is first ingested into
+    the analytics store, tagged with the optional ?job_id= query parameter.
+
     Returns:
     {
         "success": true,
@@ -216,7 +654,23 @@ def delete_session(session_id):
     """
     try:
         if session_id in session_data:
+            session = session_data[session_id]
+            if analytics_store is not None and session["emotion_history"]:
+                with stage("analytics_ingest"):
+                    analytics_store.ingest_history(
+                        session_id,
+                        session["emotion_history"],
+                        session["created_at"],
+                        request.args.get("job_id"),
+                    )
             del session_data[session_id]
+            if snapshotter is not None:
+                snapshotter.mark_deleted(session_id)
+        report_cache.invalidate(session_id)
+        capture_advisor.forget(session_id)
+        # Only this session's tracks and primary-subject lock; other live
+        # candidates keep theirs
+        detector.reset_session(session_id)
 
         # Reset detector statistics
         detector.reset_statistics()
@@ -227,7 +681,52 @@ def delete_session(session_id):
         return jsonify({"success": False, "error": str(e)}), 500
 
 
+@app.route("/api/emotion/analytics/<query>", methods=["GET"])
+@instrument_route("analytics")
+def analytics_query(query):
+    """
+    Aggregate query over finished sessions in the analytics store
+
+    Queries: summary, score-distribution, emotion-timeline
+    Query parameters: group_by (none, job, week, month, dominant_emotion),
+    job_id, since, until (ISO dates)
+
+    Returns:
+    {
+        "success": true,
+        "data": {"query": "summary", "group_by": "job", "groups": [...]}
+    }
+    """
+    try:
+        if analytics_store is None:
+            return jsonify({"success": False, "error": "Analytics disabled"}), 404
+
+        group_by = request.args.get("group_by", "none")
+        try:
+            with stage("analytics_query"):
+                groups = analytics_store.query(
+                    query,
+                    group_by=group_by,
+                    job_id=request.args.get("job_id"),
+                    since=request.args.get("since"),
+                    until=request.args.get("until"),
+                )
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+
+        return _success_response(
+            {
+                "success": True,
+                "data": {"query": query, "group_by": group_by, "groups": groups},
+            }
+        )
+
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
 @app.route("/api/emotion/batch-analyze", methods=["POST"])
+@instrument_route("batch_analyze")
 def batch_analyze():
     """
     Analyze multiple frames in batch
@@ -235,7 +734,9 @@ def batch_analyze():
     Expected JSON body:
     {
         "images": ["base64_1", "base64_2", ...],
-        "session_id": "optional_session_id"
+        "session_id": "optional_session_id",
+        "decode_reduction": 2,
+        "faces": "primary" | "all"
     }
 
     Returns:
@@ -248,22 +749,36 @@ def batch_analyze():
     }
     """
     try:
+        admission.check_request("batch_analyze", request.content_length)
         data = request.get_json()
 
         if not data or "images" not in data:
             return jsonify({"success": False, "error": "Missing images data"}), 400
 
+        reduction = _decode_reduction(data)
+        if reduction is None:
+            return jsonify({"success": False, "error": REDUCTION_ERROR}), 400
+
+        primary_only = _primary_only(data)
+        if primary_only is None:
+            return jsonify({"success": False, "error": "Invalid faces mode"}), 400
+
         images = data["images"]
+        if not isinstance(images, list):
+            return jsonify({"success": False, "error": "images must be a list"}), 400
         session_id = data.get("session_id")
 
-        results = []
+        with admission.admit("batch_analyze", _rate_limit_key(session_id), images):
+            frames = []
+
+            for img_base64 in images:
+                frame = _decode_admitted("batch_analyze", img_base64, reduction)
 
-        for img_base64 in images:
-            frame = decode_base64_image(img_base64)
+                if frame is not None:
+                    frames.append(frame)
 
-            if frame is not None:
-                analysis = detector.analyze_frame(frame)
-                results.append(analysis)
+            # All faces of all frames are classified together
+            results = _analyze_frames(frames, session_id, reduction, primary_only)
 
         # Calculate summary statistics
         summary = _calculate_batch_summary(results)
@@ -283,19 +798,139 @@ def batch_analyze():
                     {"timestamp": result["timestamp"], "faces": result["faces"]}
                 )
 
-        return jsonify(
+        return _success_response(
             {"success": True, "data": {"results": results, "summary": summary}}
         )
 
+    except Rejection as rejection:
+        return _rejection_response(rejection)
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@app.route("/api/emotion/streams-analyze", methods=["POST"])
+@instrument_route("streams_analyze")
+def streams_analyze():
+    """
+    Analyze simultaneous frames of several sessions, e.g. the participants of a
+    panel interview or a proctoring grid
+
+    Expected JSON body:
+    {
+        "streams": [
+            {"session_id": "candidate-1", "image": "base64_1"},
+            {"session_id": "candidate-2", "image": "base64_2"},
+            ...
+        ],
+        "decode_reduction": 2,
+        "faces": "primary" | "all",
+        "mosaic": false
+    }
+
+    Returns:
+    {
+        "success": true,
+        "data": {
+            "results": [{"session_id": "candidate-1", "faces": [...], ...}, ...]
+        }
+    }
+    """
+    try:
+        admission.check_request("streams_analyze", request.content_length)
+        data = request.get_json()
+
+        if not data or not isinstance(data.get("streams"), list):
+            return jsonify({"success": False, "error": "Missing streams data"}), 400
+
+        streams = data["streams"]
+        if not all(
+            isinstance(stream, dict) and stream.get("session_id") and stream.get("image")
+            for stream in streams
+        ):
+            return (
+                jsonify(
+                    {
+                        "success": False,
+                        "error": "Every stream needs a session_id and an image",
+                    }
+                ),
+                400,
+            )
+        session_ids = [stream["session_id"] for stream in streams]
+        if len(set(session_ids)) != len(session_ids):
+            return (
+                jsonify({"success": False, "error": "Duplicate session_id in streams"}),
+                400,
+            )
+
+        reduction = _decode_reduction(data)
+        if reduction is None:
+            return jsonify({"success": False, "error": REDUCTION_ERROR}), 400
+
+        primary_only = _primary_only(data, has_session=True)
+        if primary_only is None:
+            return jsonify({"success": False, "error": "Invalid faces mode"}), 400
+
+        images = [stream["image"] for stream in streams]
+        with admission.admit("streams_analyze", session_ids, images):
+            frames = [
+                _decode_admitted("streams_analyze", image, reduction)
+                for image in images
+            ]
+            failed = [sid for sid, frame in zip(session_ids, frames) if frame is None]
+            if failed:
+                return (
+                    jsonify(
+                        {
+                            "success": False,
+                            "error": f"Failed to decode image for {', '.join(failed)}",
+                        }
+                    ),
+                    400,
+                )
+
+            results = _analyze_streams(
+                frames,
+                session_ids,
+                reduction,
+                primary_only,
+                bool(data.get("mosaic", STREAM_MOSAIC)),
+            )
+
+        # Each stream keeps its own session timeline
+        for session_id, result in zip(session_ids, results):
+            if session_id not in session_data:
+                session_data[session_id] = {
+                    "created_at": datetime.now().isoformat(),
+                    "frames_analyzed": 0,
+                    "emotion_history": [],
+                }
+
+            session_data[session_id]["frames_analyzed"] += 1
+            session_data[session_id]["emotion_history"].append(
+                {"timestamp": result["timestamp"], "faces": result["faces"]}
+            )
+            result["session_id"] = session_id
+
+        return _success_response({"success": True, "data": {"results": results}})
+
+    except Rejection as rejection:
+        return _rejection_response(rejection)
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
 
 @app.route("/api/emotion/report/<session_id>", methods=["GET"])
+@instrument_route("report")
 def generate_report(session_id):
     """
     Generate comprehensive emotion report for interview session
 
+    Reports are cached per session and rebuilt only after new frames arrive
+    (at most once per EMOTION_REPORT_MIN_INTERVAL); duration and timestamp are
+    those of the build. Responses carry the build's ETag; a matching
+    If-None-Match returns 304 without touching the report.
+
     Returns:
     {
         "success": true,
@@ -311,28 +946,42 @@ def generate_report(session_id):
             return jsonify({"success": False, "error": "Session not found"}), 404
 
         session = session_data[session_id]
-        stats = detector.get_emotion_statistics()
+        version = (detector.version, session["frames_analyzed"])
+
+        etag = report_cache.current_etag(session_id, version)
+        if etag is not None and request.if_none_match.contains(etag):
+            response = app.response_class(status=304)
+            response.set_etag(etag)
+            return response
+
+        def build_report():
+            stats = detector.get_emotion_statistics()
+
+            # Generate recommendations
+            recommendations = generate_recommendations(stats)
+
+            # Calculate overall performance score
+            performance_score = calculate_performance_score(stats)
+
+            return {
+                "session_summary": {
+                    "session_id": session_id,
+                    "created_at": session["created_at"],
+                    "frames_analyzed": session["frames_analyzed"],
+                    "duration": _calculate_duration(session["created_at"]),
+                    "performance_score": performance_score,
+                },
+                "emotion_analysis": stats,
+                "recommendations": recommendations,
+                "timestamp": datetime.now().isoformat(),
+            }
 
-        # Generate recommendations
-        recommendations = _generate_recommendations(stats)
-
-        # Calculate overall performance score
-        performance_score = _calculate_performance_score(stats)
-
-        report = {
-            "session_summary": {
-                "session_id": session_id,
-                "created_at": session["created_at"],
-                "frames_analyzed": session["frames_analyzed"],
-                "duration": _calculate_duration(session["created_at"]),
-                "performance_score": performance_score,
-            },
-            "emotion_analysis": stats,
-            "recommendations": recommendations,
-            "timestamp": datetime.now().isoformat(),
-        }
+        report, etag = report_cache.get(session_id, version, build_report)
 
-        return jsonify({"success": True, "data": report})
+        response = _success_response({"success": True, "data": report})
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "no-cache"
+        return response
 
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
@@ -376,143 +1025,6 @@ def _calculate_batch_summary(results: list) -> dict:
     }
 
 
-def _generate_recommendations(stats: dict) -> list:
-    """Generate recommendations based on emotion statistics"""
-    recommendations = []
-
-    avg_score = stats.get("average_score", 0)
-    positive_ratio = stats.get("positive_ratio", 0)
-    trend = stats.get("recent_trend", "stable")
-
-    # Score-based recommendations
-    if avg_score < 50:
-        recommendations.append(
-            {
-                "type": "warning",
-                "category": "Overall Performance",
-                "message": "Your emotional expression could be more positive. Try to maintain a friendly and engaged demeanor.",
-                "priority": "high",
-            }
-        )
-    elif avg_score < 70:
-        recommendations.append(
-            {
-                "type": "info",
-                "category": "Overall Performance",
-                "message": "Good emotional expression overall. Consider being slightly more expressive to show enthusiasm.",
-                "priority": "medium",
-            }
-        )
-    else:
-        recommendations.append(
-            {
-                "type": "success",
-                "category": "Overall Performance",
-                "message": "Excellent emotional expression! You maintained a positive and professional demeanor.",
-                "priority": "low",
-            }
-        )
-
-    # Positive ratio recommendations
-    if positive_ratio < 0.5:
-        recommendations.append(
-            {
-                "type": "warning",
-                "category": "Emotional Balance",
-                "message": "Try to maintain more positive emotions during the interview. Practice relaxation techniques before interviews.",
-                "priority": "high",
-            }
-        )
-    elif positive_ratio < 0.7:
-        recommendations.append(
-            {
-                "type": "info",
-                "category": "Emotional Balance",
-                "message": "Your emotional balance is decent. Focus on staying calm and confident.",
-                "priority": "medium",
-            }
-        )
-
-    # Trend-based recommendations
-    if trend == "declining":
-        recommendations.append(
-            {
-                "type": "warning",
-                "category": "Energy Level",
-                "message": "Your energy seems to be declining. Take short breaks during long interviews and stay hydrated.",
-                "priority": "medium",
-            }
-        )
-    elif trend == "improving":
-        recommendations.append(
-            {
-                "type": "success",
-                "category": "Energy Level",
-                "message": "Great! Your confidence is growing throughout the interview.",
-                "priority": "low",
-            }
-        )
-
-    # Check for specific emotions
-    emotion_dist = stats.get("emotion_distribution", {})
-
-    if emotion_dist.get("Fear", 0) > 0.3:
-        recommendations.append(
-            {
-                "type": "warning",
-                "category": "Confidence",
-                "message": "You show signs of nervousness. Practice mock interviews to build confidence.",
-                "priority": "high",
-            }
-        )
-
-    if emotion_dist.get("Angry", 0) > 0.2:
-        recommendations.append(
-            {
-                "type": "warning",
-                "category": "Composure",
-                "message": "Try to maintain composure even during challenging questions. Take a breath before answering.",
-                "priority": "high",
-            }
-        )
-
-    if emotion_dist.get("Sad", 0) > 0.2:
-        recommendations.append(
-            {
-                "type": "info",
-                "category": "Engagement",
-                "message": "Show more enthusiasm and energy. Sit up straight and make eye contact.",
-                "priority": "medium",
-            }
-        )
-
-    return recommendations
-
-
-def _calculate_performance_score(stats: dict) -> dict:
-    """Calculate overall performance score"""
-    avg_score = stats.get("average_score", 0)
-    positive_ratio = stats.get("positive_ratio", 0)
-
-    # Weighted score
-    overall = avg_score * 0.6 + positive_ratio * 100 * 0.4
-
-    if overall >= 80:
-        rating = "Excellent"
-        color = "green"
-    elif overall >= 70:
-        rating = "Good"
-        color = "lime"
-    elif overall >= 60:
-        rating = "Fair"
-        color = "yellow"
-    else:
-        rating = "Needs Improvement"
-        color = "red"
-
-    return {"score": round(overall, 1), "rating": rating, "color": color}
-
-
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 5000))
     print(f"Starting Emotion Detection API on port {port}")
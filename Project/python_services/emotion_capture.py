@@ -0,0 +1,228 @@
+"""
+Adaptive capture hints for emotion clients
+Recommends per-session capture fps, maximum resolution and JPEG quality from the
+server's current load (frames in flight, recent analysis latency) and from the size
+of the session's faces relative to what face detection and the 48x48 model need
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+from emotion_detection import EmotionDetector
+from emotion_metrics import metrics
+
+
+# Faces are kept this much larger than the smallest size the pipeline can use
+FACE_HEADROOM = 1.5
+
+# Recommended capture width bounds
+MIN_WIDTH = 320
+MAX_WIDTH = 1920
+
+# JPEG quality at no load and the floor under heavy load
+MAX_JPEG_QUALITY = 85
+MIN_JPEG_QUALITY = 50
+
+# EMA weight of the newest latency / face size observation
+EMA_ALPHA = 0.2
+
+
+class SessionCaptureState:
+    """Per-session face size seen by the advisor, as a fraction of the frame width"""
+
+    def __init__(self):
+        self.face_fraction: Optional[float] = None
+        self.last_seen = time.monotonic()
+
+
+class CaptureAdvisor:
+    """
+    Derives capture hints from server load and session face sizes
+
+    Load is the larger of frames in flight over capacity and the recent analysis
+    latency over its target; above 1.0 the recommended fps and JPEG quality drop
+    proportionally. Resolution is chosen per session so that its smallest face
+    still lands comfortably above the detection and model input sizes after the
+    server's decode reduction.
+
+    Configuration (environment):
+        EMOTION_HINT_MAX_FPS: fps recommended when the server is idle (default 10)
+        EMOTION_HINT_MIN_FPS: Lowest fps recommended under load (default 1)
+        EMOTION_HINT_CAPACITY: Frames in flight the server handles without queueing
+            (default: CPU count)
+        EMOTION_HINT_TARGET_LATENCY_MS: Analysis latency considered full load (default 200)
+    """
+
+    def __init__(
+        self,
+        max_fps: float = 10.0,
+        min_fps: float = 1.0,
+        capacity: Optional[int] = None,
+        target_latency: float = 0.2,
+        decode_reduction: int = 1,
+        session_ttl: float = 3600.0,
+    ):
+        """
+        Args:
+            max_fps: fps recommended at no load
+            min_fps: Lowest fps ever recommended
+            capacity: Frames in flight before requests start queueing
+            target_latency: Analysis latency in seconds treated as full load
+            decode_reduction: Server-side decode downscale applied to analyzed frames
+            session_ttl: Seconds after which an idle session's state is dropped
+        """
+        self.max_fps = max_fps
+        self.min_fps = min_fps
+        self.capacity = capacity or os.cpu_count() or 1
+        self.target_latency = target_latency
+        self.decode_reduction = decode_reduction
+        self.session_ttl = session_ttl
+
+        self.in_flight = 0
+        self.latency: Optional[float] = None
+        self.sessions: Dict[str, SessionCaptureState] = {}
+        self.lock = threading.Lock()
+
+        metrics.register_gauge(
+            "emotion_analyze_in_flight",
+            "Frames currently being analyzed",
+            lambda: self.in_flight,
+        )
+        metrics.register_gauge(
+            "emotion_capture_load",
+            "Load factor driving capture hints (1.0 = at capacity)",
+            self.load,
+        )
+
+    @classmethod
+    def from_env(cls, decode_reduction: int = 1) -> "CaptureAdvisor":
+        """Build an advisor from EMOTION_HINT_* environment variables"""
+        capacity = os.environ.get("EMOTION_HINT_CAPACITY")
+        return cls(
+            max_fps=float(os.environ.get("EMOTION_HINT_MAX_FPS", 10)),
+            min_fps=float(os.environ.get("EMOTION_HINT_MIN_FPS", 1)),
+            capacity=int(capacity) if capacity else None,
+            target_latency=float(os.environ.get("EMOTION_HINT_TARGET_LATENCY_MS", 200))
+            / 1000,
+            decode_reduction=decode_reduction,
+        )
+
+    @contextmanager
+    def track(self, frames: int = 1):
+        """
+        Count the enclosed analysis as in flight and fold its duration into the latency EMA
+
+        Args:
+            frames: Frames analyzed together; latency is recorded per frame
+        """
+        with self.lock:
+            self.in_flight += frames
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - start) / max(frames, 1)
+            with self.lock:
+                self.in_flight -= frames
+                if self.latency is None:
+                    self.latency = elapsed
+                else:
+                    self.latency += EMA_ALPHA * (elapsed - self.latency)
+
+    def load(self) -> float:
+        """Current load factor (1.0 = at capacity or at the latency target)"""
+        queue_load = self.in_flight / self.capacity
+        latency_load = (self.latency or 0.0) / self.target_latency
+        return max(queue_load, latency_load)
+
+    def min_face_size(self, decode_reduction: Optional[int] = None) -> float:
+        """Smallest face (in sent pixels) worth sending, with headroom"""
+        reduction = decode_reduction or self.decode_reduction
+        return FACE_HEADROOM * max(
+            EmotionDetector.MIN_FACE_SIZE,
+            EmotionDetector.CASCADE_WINDOW * reduction,
+        )
+
+    def hints(
+        self,
+        session_id: Optional[str],
+        results: Dict,
+        frame_size: Tuple[int, int],
+        decode_reduction: Optional[int] = None,
+    ) -> Dict:
+        """
+        Update a session's state from an analysis result and recommend capture settings
+
+        Args:
+            session_id: Session the frame belongs to (None for anonymous frames)
+            results: Output of EmotionDetector.analyze_frame / build_results
+            frame_size: (width, height) of the frame as sent by the client
+            decode_reduction: Decode downscale used for this frame
+
+        Returns:
+            fps, max_width, max_height, jpeg_quality, plus the load and smoothed face
+            size (in this frame's pixels) they were derived from
+        """
+        width, height = frame_size
+        face_sizes = [min(f["bbox"]["w"], f["bbox"]["h"]) for f in results["faces"]]
+        now = time.monotonic()
+
+        with self.lock:
+            state = self.sessions.get(session_id) if session_id else None
+            if session_id and state is None:
+                self._expire(now)
+                state = self.sessions[session_id] = SessionCaptureState()
+            if state is None:
+                state = SessionCaptureState()
+            state.last_seen = now
+
+            # Tracked relative to the frame so it survives clients changing resolution
+            if face_sizes and width:
+                fraction = min(face_sizes) / width
+                if state.face_fraction is None:
+                    state.face_fraction = fraction
+                else:
+                    state.face_fraction += EMA_ALPHA * (fraction - state.face_fraction)
+            face_fraction = state.face_fraction
+
+        load = self.load()
+        pressure = max(load, 1.0)
+        fps = max(self.min_fps, min(self.max_fps, self.max_fps / pressure))
+        quality = max(MIN_JPEG_QUALITY, int(MAX_JPEG_QUALITY / pressure))
+
+        # Width at which the smallest face is just comfortably detectable; without
+        # a face yet, ask for full resolution so small faces can be found
+        if face_fraction:
+            needed = self.min_face_size(decode_reduction) / face_fraction
+            max_width = int(min(max(needed, MIN_WIDTH), MAX_WIDTH)) // 16 * 16
+        else:
+            max_width = MAX_WIDTH
+        max_height = int(round(height * max_width / width)) if width else None
+
+        return {
+            "fps": round(fps, 1),
+            "max_width": max_width,
+            "max_height": max_height,
+            "jpeg_quality": quality,
+            "load": round(load, 3),
+            "face_size": (
+                round(face_fraction * width, 1) if face_fraction and width else None
+            ),
+        }
+
+    def forget(self, session_id: str):
+        """Drop a session's state"""
+        with self.lock:
+            self.sessions.pop(session_id, None)
+
+    def _expire(self, now: float):
+        expired = [
+            session_id
+            for session_id, state in self.sessions.items()
+            if now - state.last_seen > self.session_ttl
+        ]
+        for session_id in expired:
+            del self.sessions[session_id]
@@ -9,6 +9,17 @@ from typing import Dict, List, Optional, Tuple
 import base64
 from datetime import datetime
 import json
+import threading
+import time
+
+from emotion_metrics import metrics, stage
+from emotion_mosaic import MOSAIC_TILE_SIZE, Mosaic
+from emotion_smoothing import (
+    OnlineTrendEstimator,
+    SessionSmoother,
+    select_primary,
+    trend_label,
+)
 
 
 class EmotionDetector:
@@ -30,17 +41,37 @@ class EmotionDetector:
         "Disgust": 0.1,
     }
 
+    # EMOTION_WEIGHTS in EMOTIONS order, for scoring probability arrays with a dot product
+    EMOTION_WEIGHT_VECTOR = np.array(list(map(EMOTION_WEIGHTS.get, EMOTIONS)))
+
     # Interview appropriate emotions
     POSITIVE_EMOTIONS = ["Happy", "Neutral", "Surprise"]
     NEGATIVE_EMOTIONS = ["Angry", "Disgust", "Fear", "Sad"]
 
-    def __init__(self, face_cascade_path: str = None, emotion_model_path: str = None):
+    # Number of recent scores the trend is fitted over
+    TREND_WINDOW = 10
+
+    # Smallest face (in original-resolution pixels) reported by detect_faces
+    MIN_FACE_SIZE = 48
+
+    # Detection window of the default Haar cascade; faces smaller than this cannot be found
+    CASCADE_WINDOW = 24
+
+    def __init__(
+        self,
+        face_cascade_path: str = None,
+        emotion_model_path: str = None,
+        smoothing_alpha: float = 0.3,
+        session_ttl: float = 3600.0,
+    ):
         """
         Initialize the emotion detector with face detection and emotion classification models
 
         Args:
             face_cascade_path: Path to Haar Cascade XML file for face detection
             emotion_model_path: Path to pre-trained emotion detection model
+            smoothing_alpha: EMA weight of the newest frame for temporal smoothing
+            session_ttl: Seconds after which an idle session's smoothing state is dropped
         """
         # Load Haar Cascade for face detection
         if face_cascade_path is None:
@@ -58,6 +89,18 @@ class EmotionDetector:
         self.emotion_history = []
         self.frame_count = 0
 
+        # Guards session smoothers, history and trend across request threads
+        self.state_lock = threading.RLock()
+
+        # Bumped whenever emotion_history changes; never reset, so it identifies a state
+        self.version = 0
+
+        # Temporal smoothing: one SessionSmoother per session, trend updated per frame
+        self.smoothing_alpha = smoothing_alpha
+        self.session_smoothers: Dict[Optional[str], SessionSmoother] = {}
+        self.session_ttl = session_ttl
+        self.trend_estimator = OnlineTrendEstimator(self.TREND_WINDOW)
+
     def load_emotion_model(self):
         """
         Load the emotion detection model
@@ -73,24 +116,39 @@ class EmotionDetector:
             except Exception as e:
                 print(f"Error loading emotion model: {e}")
 
-    def detect_faces(self, frame: np.ndarray) -> List[Tuple[int, int, int, int]]:
+    def detect_faces(
+        self, frame: np.ndarray, scale: float = 1, max_size: Optional[int] = None
+    ) -> List[Tuple[int, int, int, int]]:
         """
         Detect faces in the frame using Haar Cascade
 
         Args:
-            frame: Input image frame
+            frame: Input image frame (BGR, or grayscale as produced by a reduced decode)
+            scale: Factor the frame was downscaled by; the minimum face size is scaled to
+                match, but never below the cascade window, so from scale 4 on the
+                smallest face found is CASCADE_WINDOW * scale original pixels
+                (96 at 4, 192 at 8) instead of MIN_FACE_SIZE
+            max_size: Largest face to search for, in frame pixels (default: no limit)
 
         Returns:
-            List of face coordinates (x, y, w, h)
-        """
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        faces = self.face_cascade.detectMultiScale(
-            gray,
-            scaleFactor=1.1,
-            minNeighbors=5,
-            minSize=(48, 48),
-            flags=cv2.CASCADE_SCALE_IMAGE,
-        )
+            List of face coordinates (x, y, w, h) in frame pixels
+        """
+        if frame.ndim == 2:
+            gray = frame
+        else:
+            with stage("cvt_color"):
+                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+        min_size = max(self.CASCADE_WINDOW, int(round(self.MIN_FACE_SIZE / scale)))
+        with stage("detect_multiscale"):
+            faces = self.face_cascade.detectMultiScale(
+                gray,
+                scaleFactor=1.1,
+                minNeighbors=5,
+                minSize=(min_size, min_size),
+                maxSize=(max_size, max_size) if max_size else (0, 0),
+                flags=cv2.CASCADE_SCALE_IMAGE,
+            )
         return faces
 
     def preprocess_face(
@@ -134,16 +192,7 @@ class EmotionDetector:
         Returns:
             Dictionary of emotion probabilities
         """
-        # Preprocess face
-        processed_face = self.preprocess_face(face_roi)
-
-        # If model is loaded, use it for prediction
-        if self.emotion_model:
-            predictions = self.emotion_model.predict(processed_face, verbose=0)
-            emotion_probs = predictions[0]
-        else:
-            # Fallback: Use simple heuristics based on image properties
-            emotion_probs = self._heuristic_emotion_detection(face_roi)
+        emotion_probs = self.predict_emotions([face_roi])[0]
 
         # Create emotion dictionary
         emotion_dict = {
@@ -152,6 +201,47 @@ class EmotionDetector:
 
         return emotion_dict
 
+    def predict_emotions(
+        self, face_rois: List[np.ndarray], target_size: Tuple[int, int] = (48, 48)
+    ) -> np.ndarray:
+        """
+        Predict emotions for a batch of face ROIs in one pass
+
+        Args:
+            face_rois: Face regions of interest (any sizes, BGR or grayscale)
+            target_size: Size every face is resized to
+
+        Returns:
+            Array of shape (len(face_rois), 7) with probabilities in EMOTIONS order
+        """
+        if not face_rois:
+            return np.zeros((0, len(self.EMOTIONS)))
+
+        # Preprocess faces into one (n, h, w) grayscale batch
+        with stage("preprocess_face"):
+            faces = np.stack(
+                [
+                    cv2.resize(
+                        (
+                            cv2.cvtColor(face_roi, cv2.COLOR_BGR2GRAY)
+                            if face_roi.ndim == 3
+                            else face_roi
+                        ),
+                        target_size,
+                    )
+                    for face_roi in face_rois
+                ]
+            )
+
+        # If model is loaded, use it for prediction
+        with stage("predict"):
+            if self.emotion_model:
+                batch = (faces / 255.0)[..., np.newaxis]
+                return np.asarray(self.emotion_model.predict(batch, verbose=0))
+
+            # Fallback: Use simple heuristics based on image properties
+            return self._heuristic_emotion_batch(faces)
+
     def _heuristic_emotion_detection(self, face_roi: np.ndarray) -> np.ndarray:
         """
         Fallback heuristic emotion detection when model is not available
@@ -169,97 +259,495 @@ class EmotionDetector:
             if len(face_roi.shape) == 3
             else face_roi
         )
+        return self._heuristic_emotion_batch(gray[np.newaxis])[0]
 
-        # Calculate various features
-        brightness = np.mean(gray)
-        contrast = np.std(gray)
+    def _heuristic_emotion_batch(self, faces: np.ndarray) -> np.ndarray:
+        """
+        Heuristic emotion probabilities for a batch of same-sized grayscale faces
+        Features and probabilities are computed as array operations over the batch
 
-        # Edge detection for facial features
-        edges = cv2.Canny(gray, 50, 150)
-        edge_density = np.sum(edges > 0) / edges.size
+        Args:
+            faces: uint8 array of shape (n, h, w)
+
+        Returns:
+            Array of shape (n, 7) with probabilities in EMOTIONS order
+        """
+        count, height, width = faces.shape
+
+        # Calculate various features
+        pixels = faces.reshape(count, -1)
+        brightness = pixels.mean(axis=1)
+        contrast = pixels.std(axis=1)
+
+        # Edge detection for facial features: one Canny call over the faces stacked
+        # vertically. Gradients are taken with each face's border rows replicated,
+        # as Canny does per image, then those rows are zeroed so they separate the
+        # faces: no edge is traced from one face into the next, and the edges match
+        # per-face Canny exactly
+        padded = np.pad(faces, ((0, 0), (1, 1), (0, 0)), mode="edge").reshape(-1, width)
+        gradients = []
+        for dx, dy in ((1, 0), (0, 1)):
+            gradient = cv2.Sobel(
+                padded, cv2.CV_16S, dx, dy, ksize=3, borderType=cv2.BORDER_REPLICATE
+            ).reshape(count, height + 2, width)
+            gradient[:, [0, -1]] = 0
+            gradients.append(gradient.reshape(-1, width))
+        edges = cv2.Canny(gradients[0], gradients[1], 50, 150)
+        edges = edges.reshape(count, height + 2, width)[:, 1:-1]
+        edge_density = np.count_nonzero(edges.reshape(count, -1), axis=1) / (
+            height * width
+        )
 
         # Simple heuristic mapping
         # This is a simplified approach - actual emotion detection requires trained models
-        probabilities = np.zeros(len(self.EMOTIONS))
+        probabilities = np.zeros((count, len(self.EMOTIONS)))
 
         # Neutral as baseline
-        probabilities[self.EMOTIONS.index("Neutral")] = 0.4
+        probabilities[:, self.EMOTIONS.index("Neutral")] = 0.4
 
         # Adjust based on features
-        if brightness > 140:
-            probabilities[self.EMOTIONS.index("Happy")] += 0.3
-
-        if contrast > 50:
-            probabilities[self.EMOTIONS.index("Surprise")] += 0.2
-
-        if edge_density > 0.15:
-            probabilities[self.EMOTIONS.index("Fear")] += 0.1
+        probabilities[:, self.EMOTIONS.index("Happy")] += 0.3 * (brightness > 140)
+        probabilities[:, self.EMOTIONS.index("Surprise")] += 0.2 * (contrast > 50)
+        probabilities[:, self.EMOTIONS.index("Fear")] += 0.1 * (edge_density > 0.15)
 
         # Normalize probabilities
-        probabilities = probabilities / np.sum(probabilities)
+        probabilities /= probabilities.sum(axis=1, keepdims=True)
 
         return probabilities
 
-    def analyze_frame(self, frame: np.ndarray) -> Dict:
+    def analyze_frame(
+        self,
+        frame: np.ndarray,
+        session_id: str = None,
+        scale: int = 1,
+        primary_only: bool = False,
+    ) -> Dict:
         """
         Analyze a single frame for emotions
 
         Args:
             frame: Input image frame
+            session_id: Session whose smoothing state the faces are tracked in
+            scale: Factor the frame was downscaled by at decode; bounding boxes
+                are reported in original-resolution pixels
+            primary_only: Only classify the session's primary subject (the
+                candidate); other faces are reported but not classified
 
         Returns:
             Analysis results including detected faces and emotions
         """
-        self.frame_count += 1
+        return self.analyze_frames([frame], session_id, scale, primary_only)[0]
+
+    def analyze_frames(
+        self,
+        frames: List[np.ndarray],
+        session_id: str = None,
+        scale: int = 1,
+        primary_only: bool = False,
+    ) -> List[Dict]:
+        """
+        Analyze consecutive frames of a session, classifying all their faces in one batch
 
-        # Detect faces
-        faces = self.detect_faces(frame)
+        Args:
+            frames: Input image frames in capture order
+            session_id: Session whose smoothing state the faces are tracked in
+            scale: Factor the frames were downscaled by at decode
+            primary_only: Only classify the session's primary subject
 
-        results = {
-            "timestamp": datetime.now().isoformat(),
-            "frame_number": self.frame_count,
-            "faces_detected": len(faces),
-            "faces": [],
-        }
+        Returns:
+            Analysis results per frame
+        """
+        primary_bbox = self.get_session_smoother(session_id).primary_bbox
+        return [
+            self.build_results(detections, session_id, primary_only)
+            for detections in self.classify_frames(
+                frames, scale, primary_only, primary_bbox
+            )
+        ]
+
+    def analyze_streams(
+        self,
+        frames: List[np.ndarray],
+        session_ids: List[str],
+        scale: int = 1,
+        primary_only: bool = False,
+        mosaic: bool = False,
+        tile_size: Tuple[int, int] = MOSAIC_TILE_SIZE,
+    ) -> List[Dict]:
+        """
+        Analyze simultaneous frames of several streams (e.g. a panel interview)
 
-        # Analyze each face
-        for x, y, w, h in faces:
-            # Extract face ROI
-            face_roi = frame[y : y + h, x : x + w]
+        All faces are classified together, optionally after detecting them in one
+        mosaic of all frames; tracking, smoothing and history stay per stream session.
 
-            # Predict emotion
-            emotion_probs = self.predict_emotion(face_roi)
+        Args:
+            frames: One frame per stream
+            session_ids: Session of each stream
+            scale: Factor the frames were downscaled by at decode
+            primary_only: Only classify each stream's primary subject
+            mosaic: Detect faces of all streams in one mosaic image
+            tile_size: Largest (width, height) a frame is shrunk to in the mosaic
 
-            # Get dominant emotion
-            dominant_emotion = max(emotion_probs, key=emotion_probs.get)
-            confidence = emotion_probs[dominant_emotion]
+        Returns:
+            Analysis results per stream
+        """
+        primary_bboxes = [
+            self.get_session_smoother(session_id).primary_bbox
+            for session_id in session_ids
+        ]
+        detections = self.classify_streams(
+            frames, scale, primary_only, primary_bboxes, mosaic, tile_size
+        )
+        return [
+            self.build_results(stream_detections, session_id, primary_only)
+            for stream_detections, session_id in zip(detections, session_ids)
+        ]
+
+    def detect_and_classify(
+        self,
+        frame: np.ndarray,
+        scale: int = 1,
+        primary_only: bool = False,
+        primary_bbox: Optional[Tuple[int, int, int, int]] = None,
+    ) -> List[Tuple[Tuple[int, int, int, int], Optional[np.ndarray]]]:
+        """
+        Stateless part of analyze_frame: detect faces and predict their emotions
 
-            # Calculate emotion score
-            emotion_score = self._calculate_emotion_score(emotion_probs)
+        Args:
+            frame: Input image frame
+            scale: Factor the frame was downscaled by at decode
+            primary_only: Classify only the primary subject's face
+            primary_bbox: The session's locked primary face, if any
 
-            face_result = {
-                "bbox": {"x": int(x), "y": int(y), "w": int(w), "h": int(h)},
-                "emotions": emotion_probs,
-                "dominant_emotion": dominant_emotion,
-                "confidence": float(confidence),
-                "emotion_score": float(emotion_score),
-                "is_positive": dominant_emotion in self.POSITIVE_EMOTIONS,
-            }
+        Returns:
+            List of (bbox in original-resolution pixels, emotion probabilities in
+            EMOTIONS order); probabilities are None for faces that were not classified
+        """
+        return self.classify_frames([frame], scale, primary_only, primary_bbox)[0]
+
+    def classify_frames(
+        self,
+        frames: List[np.ndarray],
+        scale: int = 1,
+        primary_only: bool = False,
+        primary_bbox: Optional[Tuple[int, int, int, int]] = None,
+    ) -> List[List[Tuple[Tuple[int, int, int, int], Optional[np.ndarray]]]]:
+        """
+        detect_and_classify for consecutive frames, with one prediction for all faces
+
+        In primary-subject mode each frame's primary face continues the lock for the
+        next frame; releasing a lost lock is left to build_results.
+
+        Args:
+            frames: Input image frames in capture order
+            scale: Factor the frames were downscaled by at decode
+            primary_only: Classify only the primary subject's face
+            primary_bbox: The session's locked primary face before the first frame
+
+        Returns:
+            detect_and_classify output per frame
+        """
+        frame_faces = []
+        face_rois = []
+        for frame in frames:
+            faces = [
+                (int(fx) * scale, int(fy) * scale, int(fw) * scale, int(fh) * scale)
+                for fx, fy, fw, fh in self.detect_faces(frame, scale)
+            ]
+            classified, primary_bbox = self._select_faces(
+                frame, faces, scale, primary_only, primary_bbox, face_rois
+            )
+            frame_faces.append((faces, classified))
+
+        return self._predict_detections(frame_faces, face_rois)
+
+    def classify_streams(
+        self,
+        frames: List[np.ndarray],
+        scale: int = 1,
+        primary_only: bool = False,
+        primary_bboxes: Optional[List[Optional[Tuple[int, int, int, int]]]] = None,
+        mosaic: bool = False,
+        tile_size: Tuple[int, int] = MOSAIC_TILE_SIZE,
+    ) -> List[List[Tuple[Tuple[int, int, int, int], Optional[np.ndarray]]]]:
+        """
+        detect_and_classify for simultaneous frames of different streams
 
-            results["faces"].append(face_result)
+        Faces of all streams are classified in one prediction, each cropped from
+        its own full frame. In mosaic mode the frames are also packed into one
+        image so faces are detected in a single detectMultiScale call.
 
-            # Add to history
-            self.emotion_history.append(
-                {
-                    "timestamp": results["timestamp"],
-                    "emotion": dominant_emotion,
-                    "score": emotion_score,
+        Args:
+            frames: One frame per stream
+            scale: Factor the frames were downscaled by at decode
+            primary_only: Classify only each stream's primary subject
+            primary_bboxes: Each stream's locked primary face, if any
+            mosaic: Detect faces of all streams in one mosaic image
+            tile_size: Largest (width, height) a frame is shrunk to in the mosaic
+
+        Returns:
+            detect_and_classify output per stream
+        """
+        if not frames:
+            return []
+        if primary_bboxes is None:
+            primary_bboxes = [None] * len(frames)
+
+        if mosaic:
+            stream_faces = self._detect_mosaic(frames, scale, tile_size)
+        else:
+            stream_faces = [
+                [
+                    (int(fx) * scale, int(fy) * scale, int(fw) * scale, int(fh) * scale)
+                    for fx, fy, fw, fh in self.detect_faces(frame, scale)
+                ]
+                for frame in frames
+            ]
+
+        frame_faces = []
+        face_rois = []
+        for frame, faces, primary_bbox in zip(frames, stream_faces, primary_bboxes):
+            classified, _ = self._select_faces(
+                frame, faces, scale, primary_only, primary_bbox, face_rois
+            )
+            frame_faces.append((faces, classified))
+
+        return self._predict_detections(frame_faces, face_rois)
+
+    def _detect_mosaic(
+        self, frames: List[np.ndarray], scale: int, tile_size: Tuple[int, int]
+    ) -> List[List[Tuple[int, int, int, int]]]:
+        """
+        Detect the faces of several frames in one pass over a mosaic of them
+
+        Args:
+            frames: One frame per stream
+            scale: Factor the frames were downscaled by at decode
+            tile_size: Largest (width, height) a frame is shrunk to in the mosaic
+
+        Returns:
+            Face boxes per stream in original-resolution pixels
+        """
+        mosaic = Mosaic.pack(frames, tile_size)
+        # Detect with the loosest minimum size any tile needs, then apply the
+        # minimum face size per stream in original-resolution pixels
+        largest_factor = max(tile.factor for tile in mosaic.tiles)
+        stream_faces = [[] for _ in frames]
+        for bbox in self.detect_faces(
+            mosaic.image, scale * largest_factor, mosaic.largest_face()
+        ):
+            located = mosaic.locate(tuple(int(value) for value in bbox))
+            if located is None:
+                continue
+            index, (fx, fy, fw, fh) = located
+            if min(fw, fh) * scale < self.MIN_FACE_SIZE:
+                continue
+            stream_faces[index].append((fx * scale, fy * scale, fw * scale, fh * scale))
+        return stream_faces
+
+    def _select_faces(
+        self,
+        frame: np.ndarray,
+        faces: List[Tuple[int, int, int, int]],
+        scale: int,
+        primary_only: bool,
+        primary_bbox: Optional[Tuple[int, int, int, int]],
+        face_rois: List[np.ndarray],
+    ) -> Tuple[List[bool], Optional[Tuple[int, int, int, int]]]:
+        """
+        Choose which faces of a frame to classify and append their ROIs
+
+        Args:
+            frame: Frame the faces were found in
+            faces: Face boxes in original-resolution pixels
+            scale: Factor the frame was downscaled by at decode
+            primary_only: Classify only the primary subject's face
+            primary_bbox: The locked primary face before this frame
+            face_rois: List the ROIs of the chosen faces are appended to
+
+        Returns:
+            Whether each face is classified, and the primary face after this frame
+        """
+        primary = None
+        if primary_only:
+            frame_size = (frame.shape[1] * scale, frame.shape[0] * scale)
+            primary = select_primary(faces, frame_size, primary_bbox)
+            if primary is not None:
+                primary_bbox = faces[primary]
+
+        classified = []
+        for index, bbox in enumerate(faces):
+            if primary_only and index != primary:
+                classified.append(False)
+                continue
+
+            # Extract face ROI
+            fx, fy, fw, fh = (value // scale for value in bbox)
+            face_rois.append(frame[fy : fy + fh, fx : fx + fw])
+            classified.append(True)
+
+        return classified, primary_bbox
+
+    def _predict_detections(
+        self,
+        frame_faces: List[Tuple[List[Tuple[int, int, int, int]], List[bool]]],
+        face_rois: List[np.ndarray],
+    ) -> List[List[Tuple[Tuple[int, int, int, int], Optional[np.ndarray]]]]:
+        """Predict emotions for every collected face at once and pair them with their boxes"""
+        probabilities = iter(self.predict_emotions(face_rois))
+
+        return [
+            [
+                (bbox, next(probabilities) if is_classified else None)
+                for bbox, is_classified in zip(faces, classified)
+            ]
+            for faces, classified in frame_faces
+        ]
+
+    def build_results(
+        self,
+        detections: List[Tuple[Tuple[int, int, int, int], Optional[np.ndarray]]],
+        session_id: str = None,
+        primary_only: bool = False,
+    ) -> Dict:
+        """
+        Stateful part of analyze_frame: track, smooth, score and record detections
+
+        Scores and dominant emotions are computed on probability arrays for all
+        faces at once; dictionaries are only built for the returned results.
+
+        Args:
+            detections: Output of detect_and_classify
+            session_id: Session whose smoothing state the faces are tracked in
+            primary_only: Whether detections were classified in primary-subject mode
+
+        Returns:
+            Analysis results including detected faces and emotions
+        """
+        # Session smoothers, history and trend are shared by request threads
+        with self.state_lock:
+            self.frame_count += 1
+            self.version += 1
+
+            classified = [
+                (bbox, probs) for bbox, probs in detections if probs is not None
+            ]
+            ignored = [bbox for bbox, probs in detections if probs is None]
+
+            results = {
+                "timestamp": datetime.now().isoformat(),
+                "frame_number": self.frame_count,
+                "faces_detected": len(detections),
+                "faces": [],
+            }
+            if primary_only:
+                results["ignored_faces"] = [
+                    {"x": x, "y": y, "w": w, "h": h} for x, y, w, h in ignored
+                ]
+
+            smoother = self.get_session_smoother(session_id)
+            track_ids = smoother.assign_tracks([bbox for bbox, _ in classified])
+            if primary_only:
+                smoother.update_primary(classified[0][0] if classified else None)
+
+            if classified:
+                probabilities = np.array(
+                    [probs for _, probs in classified], dtype=float
+                )
+                emotion_scores = self.emotion_scores(probabilities)
+                dominant = probabilities.argmax(axis=1)
+                confidences = probabilities[np.arange(len(classified)), dominant]
+
+                # Fold into each track's smoothed state
+                tracks = [
+                    smoother.update(track_id, probs, score, bbox)
+                    for (bbox, probs), track_id, score in zip(
+                        classified, track_ids, emotion_scores
+                    )
+                ]
+                smoothed = np.array([track.probabilities for track in tracks])
+                smoothed_scores = self.emotion_scores(smoothed)
+                smoothed_dominant = smoothed.argmax(axis=1)
+
+            # Serialize each face
+            for index, (bbox, _) in enumerate(classified):
+                x, y, w, h = bbox
+                dominant_emotion = self.EMOTIONS[dominant[index]]
+                confidence = float(confidences[index])
+                emotion_score = float(emotion_scores[index])
+                smoothed_emotion = self.EMOTIONS[smoothed_dominant[index]]
+
+                face_result = {
+                    "bbox": {"x": int(x), "y": int(y), "w": int(w), "h": int(h)},
+                    "emotions": dict(zip(self.EMOTIONS, probabilities[index].tolist())),
+                    "dominant_emotion": dominant_emotion,
                     "confidence": confidence,
+                    "emotion_score": emotion_score,
+                    "is_positive": dominant_emotion in self.POSITIVE_EMOTIONS,
+                    "track_id": int(track_ids[index]),
+                    "smoothed": {
+                        "emotions": dict(zip(self.EMOTIONS, smoothed[index].tolist())),
+                        "dominant_emotion": smoothed_emotion,
+                        "confidence": float(smoothed[index, smoothed_dominant[index]]),
+                        "emotion_score": float(smoothed_scores[index]),
+                        "trend": tracks[index].trend.trend,
+                    },
                 }
-            )
+
+                results["faces"].append(face_result)
+
+                # Add to history
+                self.emotion_history.append(
+                    {
+                        "timestamp": results["timestamp"],
+                        "emotion": dominant_emotion,
+                        "score": emotion_score,
+                        "confidence": confidence,
+                    }
+                )
+                self.trend_estimator.update(emotion_score)
+
+        metrics.record_frame(len(results["faces"]))
 
         return results
 
+    def get_session_smoother(self, session_id: str = None) -> SessionSmoother:
+        """
+        Get or create the smoothing state for a session
+
+        Args:
+            session_id: Session identifier (None for anonymous frames)
+
+        Returns:
+            SessionSmoother for the session
+        """
+        now = time.monotonic()
+        with self.state_lock:
+            smoother = self.session_smoothers.get(session_id)
+            if smoother is None:
+                self._expire_smoothers(now)
+                smoother = SessionSmoother(
+                    alpha=self.smoothing_alpha, trend_window=self.TREND_WINDOW
+                )
+                self.session_smoothers[session_id] = smoother
+            smoother.last_seen = now
+            return smoother
+
+    def reset_session(self, session_id: str = None):
+        """Drop the tracks and primary-subject lock of a single session"""
+        with self.state_lock:
+            self.session_smoothers.pop(session_id, None)
+
+    def _expire_smoothers(self, now: float):
+        """Drop smoothers of sessions idle for session_ttl seconds (caller holds the lock)"""
+        expired = [
+            session_id
+            for session_id, smoother in self.session_smoothers.items()
+            if now - smoother.last_seen > self.session_ttl
+        ]
+        for session_id in expired:
+            del self.session_smoothers[session_id]
+
     def _calculate_emotion_score(self, emotion_probs: Dict[str, float]) -> float:
         """
         Calculate overall emotion score for interview assessment
@@ -271,15 +759,23 @@ class EmotionDetector:
         Returns:
             Emotion score (0-100)
         """
-        weighted_score = sum(
-            emotion_probs.get(emotion, 0) * self.EMOTION_WEIGHTS.get(emotion, 0)
-            for emotion in self.EMOTIONS
+        probabilities = np.array(
+            [emotion_probs.get(emotion, 0) for emotion in self.EMOTIONS]
         )
+        return float(self.emotion_scores(probabilities))
 
-        # Convert to 0-100 scale
-        score = weighted_score * 100
+    def emotion_scores(self, probabilities: np.ndarray) -> np.ndarray:
+        """
+        Emotion scores (0-100) for probability arrays in EMOTIONS order
 
-        return score
+        Args:
+            probabilities: Array of shape (..., 7)
+
+        Returns:
+            Scores with the leading shape of probabilities
+        """
+        # Weighted sum converted to 0-100 scale
+        return probabilities @ self.EMOTION_WEIGHT_VECTOR * 100
 
     def get_emotion_statistics(self, last_n_frames: int = None) -> Dict:
         """
@@ -332,8 +828,10 @@ class EmotionDetector:
             "dominant_emotion": (
                 max(emotion_counts, key=emotion_counts.get) if emotion_counts else None
             ),
-            "recent_trend": self._calculate_trend(
-                scores[-10:] if len(scores) >= 10 else scores
+            "recent_trend": (
+                self.trend_estimator.trend
+                if last_n_frames is None or last_n_frames >= self.TREND_WINDOW
+                else self._calculate_trend(scores)
             ),
         }
 
@@ -354,12 +852,7 @@ class EmotionDetector:
         x = np.arange(len(scores))
         slope = np.polyfit(x, scores, 1)[0]
 
-        if slope > 2:
-            return "improving"
-        elif slope < -2:
-            return "declining"
-        else:
-            return "stable"
+        return trend_label(slope)
 
     def draw_annotations(self, frame: np.ndarray, analysis_result: Dict) -> np.ndarray:
         """
@@ -372,6 +865,11 @@ class EmotionDetector:
         Returns:
             Annotated frame
         """
+        with stage("draw_annotations"):
+            return self._draw_annotations(frame, analysis_result)
+
+    def _draw_annotations(self, frame: np.ndarray, analysis_result: Dict) -> np.ndarray:
+        """Draw bounding boxes, labels and scores onto a copy of the frame"""
         annotated_frame = frame.copy()
 
         for face in analysis_result["faces"]:
@@ -422,34 +920,134 @@ class EmotionDetector:
 
         return annotated_frame
 
+    def load_history(self, history: List[Dict]):
+        """
+        Replace the emotion history and rebuild state derived from it
+
+        Args:
+            history: Entries in emotion_history format, oldest first
+        """
+        with self.state_lock:
+            self.emotion_history = list(history)
+            self.version += 1
+            self.trend_estimator.reset()
+            for entry in self.emotion_history[-self.TREND_WINDOW :]:
+                self.trend_estimator.update(entry["score"])
+
     def reset_statistics(self):
-        """Reset emotion history and statistics"""
-        self.emotion_history = []
-        self.frame_count = 0
+        """
+        Reset emotion history and statistics
+
+        Session tracking state is kept; use reset_session to drop a session's tracks
+        and primary-subject lock.
+        """
+        with self.state_lock:
+            self.emotion_history = []
+            self.frame_count = 0
+            self.version += 1
+            self.trend_estimator.reset()
+
+
+# imdecode flags for reduced-resolution grayscale decoding. For JPEG the
+# downscale happens in the DCT domain, so fewer pixels are ever produced.
+REDUCED_DECODE_FLAGS = {
+    2: cv2.IMREAD_REDUCED_GRAYSCALE_2,
+    4: cv2.IMREAD_REDUCED_GRAYSCALE_4,
+    8: cv2.IMREAD_REDUCED_GRAYSCALE_8,
+}
+
+
+class ImageTooLargeError(ValueError):
+    """Raised when an encoded image declares more pixels than allowed"""
+
+
+def image_dimensions(data: bytes) -> Optional[Tuple[int, int]]:
+    """
+    Read the width and height from a JPEG or PNG header without decoding pixels
 
+    Args:
+        data: Encoded image bytes
 
-def decode_base64_image(base64_string: str) -> np.ndarray:
+    Returns:
+        (width, height), or None if the format is not recognized
+    """
+    if data[:8] == b"\x89PNG\r\n\x1a\n" and len(data) >= 24:
+        return int.from_bytes(data[16:20], "big"), int.from_bytes(data[20:24], "big")
+
+    if data[:2] != b"\xff\xd8":
+        return None
+    # Walk the JPEG segments up to the first start-of-frame marker
+    offset = 2
+    while offset + 9 <= len(data):
+        if data[offset] != 0xFF:
+            return None
+        marker = data[offset + 1]
+        if marker == 0xFF:
+            offset += 1
+            continue
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+            offset += 2
+            continue
+        length = int.from_bytes(data[offset + 2 : offset + 4], "big")
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            height = int.from_bytes(data[offset + 5 : offset + 7], "big")
+            width = int.from_bytes(data[offset + 7 : offset + 9], "big")
+            return width, height
+        offset += 2 + length
+    return None
+
+
+def decode_base64_image(
+    base64_string: str, reduction: int = 1, max_pixels: Optional[int] = None
+) -> np.ndarray:
     """
     Decode base64 image string to numpy array
 
     Args:
         base64_string: Base64 encoded image
+        reduction: 1 for a full-size BGR image, or 2/4/8 for a grayscale image
+            downscaled by that factor (use when no annotated image is needed)
+        max_pixels: Refuse images whose header declares more pixels than this
 
     Returns:
         Decoded image as numpy array
+
+    Raises:
+        ImageTooLargeError: If the image exceeds max_pixels
     """
+    if reduction != 1 and reduction not in REDUCED_DECODE_FLAGS:
+        raise ValueError(f"Unsupported decode reduction: {reduction}")
+
     # Remove data URL prefix if present
     if "," in base64_string:
         base64_string = base64_string.split(",")[1]
 
     # Decode base64
-    img_data = base64.b64decode(base64_string)
+    with stage("base64_decode"):
+        img_data = base64.b64decode(base64_string)
+
+    # Check the declared size before any pixels are allocated
+    if max_pixels:
+        dimensions = image_dimensions(img_data)
+        if dimensions and dimensions[0] * dimensions[1] > max_pixels:
+            raise ImageTooLargeError(
+                f"Image of {dimensions[0]}x{dimensions[1]} exceeds {max_pixels} pixels"
+            )
 
     # Convert to numpy array
     nparr = np.frombuffer(img_data, np.uint8)
 
     # Decode image
-    img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+    with stage("imdecode"):
+        img = cv2.imdecode(nparr, REDUCED_DECODE_FLAGS.get(reduction, cv2.IMREAD_COLOR))
+
+    # Formats without a parsed header are checked after decoding
+    if max_pixels and img is not None and dimensions is None:
+        height, width = img.shape[:2]
+        if width * height * reduction * reduction > max_pixels:
+            raise ImageTooLargeError(
+                f"Image of {width * reduction}x{height * reduction} exceeds {max_pixels} pixels"
+            )
 
     return img
 
@@ -465,10 +1063,12 @@ def encode_image_to_base64(image: np.ndarray) -> str:
         Base64 encoded image string
     """
     # Encode image to jpg
-    _, buffer = cv2.imencode(".jpg", image)
+    with stage("jpeg_encode"):
+        _, buffer = cv2.imencode(".jpg", image)
 
     # Convert to base64
-    img_base64 = base64.b64encode(buffer).decode("utf-8")
+    with stage("base64_encode"):
+        img_base64 = base64.b64encode(buffer).decode("utf-8")
 
     return f"data:image/jpeg;base64,{img_base64}"
 
@@ -493,51 +1093,7 @@ def get_detector_instance() -> EmotionDetector:
 
 
 if __name__ == "__main__":
-    # Test the emotion detector
-    print("Testing Emotion Detector...")
-
-    detector = EmotionDetector()
-    print("Emotion Detector initialized successfully")
-
-    # Test with webcam
-    cap = cv2.VideoCapture(0)
-
-    if not cap.isOpened():
-        print("Error: Could not open webcam")
-        exit()
-
-    print("Press 'q' to quit, 's' to see statistics")
-
-    while True:
-        ret, frame = cap.read()
-
-        if not ret:
-            print("Error: Could not read frame")
-            break
-
-        # Analyze frame
-        results = detector.analyze_frame(frame)
-
-        # Draw annotations
-        annotated_frame = detector.draw_annotations(frame, results)
-
-        # Display
-        cv2.imshow("Emotion Detection", annotated_frame)
-
-        key = cv2.waitKey(1) & 0xFF
-
-        if key == ord("q"):
-            break
-        elif key == ord("s"):
-            stats = detector.get_emotion_statistics()
-            print("\n=== Emotion Statistics ===")
-            print(json.dumps(stats, indent=2))
-            print("========================\n")
-
-    cap.release()
-    cv2.destroyAllWindows()
+    # Test the emotion detector on the webcam with the pipelined runner
+    from emotion_webcam import main
 
-    # Final statistics
-    final_stats = detector.get_emotion_statistics()
-    print("\n=== Final Statistics ===")
-    print(json.dumps(final_stats, indent=2))
+    raise SystemExit(main())
@@ -0,0 +1,379 @@
+"""
+Inference process pool for emotion detection
+Face detection and classification run in separate processes that load the models once.
+Frames are handed over through a shared-memory ring of fixed-size slots, so workers read
+them as zero-copy NumPy views instead of unpickling arrays.
+"""
+
+import atexit
+import itertools
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from emotion_metrics import metrics, record_timings, stage
+
+
+# Default slot size fits a 1080p BGR frame
+DEFAULT_SLOT_BYTES = 1920 * 1080 * 3
+
+# Seconds between checks that the inference processes are alive
+LIVENESS_INTERVAL = 1.0
+
+
+def _worker_main(
+    index: int,
+    shm_name: str,
+    slot_bytes: int,
+    tasks,
+    results,
+    model_path: Optional[str],
+    opencv_threads: int,
+):
+    """
+    Inference process: attach to the frame ring, load models once, serve tasks until None
+
+    Tasks are (task_id, slot, shape, dtype, scale, primary_only, primary_bbox).
+    Results are ("start", task_id, index) when a task is taken, so the pool knows
+    which tasks die with a process, then ("done", task_id, detections, timings, error).
+    """
+    import cv2
+
+    from emotion_detection import EmotionDetector
+    from emotion_metrics import collect_timings
+
+    cv2.setNumThreads(opencv_threads)
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    detector = EmotionDetector(emotion_model_path=model_path)
+    detector.load_emotion_model()
+
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+
+            task_id, slot, shape, dtype, scale, primary_only, primary_bbox = task
+            results.put(("start", task_id, index))
+            try:
+                # Zero-copy view of the frame in shared memory
+                frame = np.ndarray(
+                    shape, dtype=dtype, buffer=shm.buf, offset=slot * slot_bytes
+                )
+                with collect_timings() as timings:
+                    detections = detector.detect_and_classify(
+                        frame, scale, primary_only, primary_bbox
+                    )
+                del frame
+                results.put(("done", task_id, detections, timings, None))
+            except Exception as e:
+                results.put(("done", task_id, None, {}, f"{type(e).__name__}: {e}"))
+    finally:
+        shm.close()
+
+
+class InferencePool:
+    """
+    Pool of inference processes fed through a shared-memory frame ring
+
+    The number of processes is independent of the HTTP server's worker threads:
+    request threads only copy the frame into a free slot and wait for the result.
+    Processes that die are respawned, and the task they were running fails.
+    """
+
+    def __init__(
+        self,
+        processes: int,
+        slots: Optional[int] = None,
+        slot_bytes: int = DEFAULT_SLOT_BYTES,
+        model_path: Optional[str] = None,
+        opencv_threads: int = 1,
+        timeout: float = 30.0,
+    ):
+        """
+        Args:
+            processes: Number of inference processes
+            slots: Frames that can be in flight at once (default 4 per process)
+            slot_bytes: Maximum frame size in bytes
+            model_path: Emotion model loaded by every process
+            opencv_threads: cv2.setNumThreads value inside each process
+            timeout: Seconds to wait for a free slot or a result
+        """
+        self.processes = processes
+        self.slots = slots or processes * 4
+        self.slot_bytes = slot_bytes
+        self.timeout = timeout
+
+        self.shm = shared_memory.SharedMemory(
+            create=True, size=self.slots * self.slot_bytes
+        )
+        self.free_slots: queue.Queue = queue.Queue()
+        for slot in range(self.slots):
+            self.free_slots.put(slot)
+
+        # Spawn avoids forking a multi-threaded web server
+        self.context = mp.get_context("spawn")
+        self.tasks = self.context.Queue()
+        self.results = self.context.Queue()
+        self.model_path = model_path
+        self.opencv_threads = opencv_threads
+        self.workers = [self._spawn(index) for index in range(processes)]
+        # Task each process is running, by process index
+        self.running: Dict[int, int] = {}
+        self.next_liveness_check = time.monotonic() + LIVENESS_INTERVAL
+
+        # Future and slot of each queued or running task; the future is None once
+        # the caller has timed out
+        self.pending: Dict[int, Tuple[Optional[Future], int]] = {}
+        self.pending_lock = threading.Lock()
+        self.task_ids = itertools.count()
+        self.closed = False
+
+        self.listener = threading.Thread(
+            target=self._collect_results, name="emotion-inference-results", daemon=True
+        )
+        self.listener.start()
+
+        metrics.register_gauge(
+            "emotion_inference_pending",
+            "Frames queued or running in the inference pool",
+            lambda: len(self.pending),
+        )
+        metrics.register_gauge(
+            "emotion_inference_processes",
+            "Live inference processes",
+            lambda: sum(worker.is_alive() for worker in self.workers),
+        )
+
+        atexit.register(self.close)
+
+    def _spawn(self, index: int):
+        worker = self.context.Process(
+            target=_worker_main,
+            args=(
+                index,
+                self.shm.name,
+                self.slot_bytes,
+                self.tasks,
+                self.results,
+                self.model_path,
+                self.opencv_threads,
+            ),
+            name=f"emotion-inference-{index}",
+            daemon=True,
+        )
+        worker.start()
+        return worker
+
+    @classmethod
+    def from_env(cls) -> Optional["InferencePool"]:
+        """
+        Build a pool from EMOTION_INFERENCE_* environment variables
+
+        Returns:
+            InferencePool, or None when EMOTION_INFERENCE_PROCESSES is unset or 0
+        """
+        processes = int(os.environ.get("EMOTION_INFERENCE_PROCESSES", 0))
+        if processes <= 0:
+            return None
+
+        slots = os.environ.get("EMOTION_INFERENCE_SLOTS")
+        return cls(
+            processes,
+            slots=int(slots) if slots else None,
+            slot_bytes=int(
+                os.environ.get("EMOTION_INFERENCE_SLOT_BYTES", DEFAULT_SLOT_BYTES)
+            ),
+            model_path=os.environ.get("EMOTION_MODEL_PATH"),
+            opencv_threads=int(os.environ.get("EMOTION_INFERENCE_CV_THREADS", 1)),
+        )
+
+    def fits(self, frame: np.ndarray) -> bool:
+        """Whether a frame fits in one slot"""
+        return frame.nbytes <= self.slot_bytes
+
+    def available(self) -> bool:
+        """Whether the pool is open and at least one inference process is alive"""
+        return not self.closed and any(worker.is_alive() for worker in self.workers)
+
+    def detect_and_classify(
+        self,
+        frame: np.ndarray,
+        scale: int = 1,
+        primary_only: bool = False,
+        primary_bbox: Optional[Tuple[int, int, int, int]] = None,
+    ) -> List[Tuple[Tuple[int, int, int, int], Optional[Dict[str, float]]]]:
+        """
+        Run EmotionDetector.detect_and_classify on a frame in an inference process
+
+        Args:
+            frame: Input frame (must fit in a slot)
+            scale: Factor the frame was downscaled by at decode
+            primary_only: Classify only the primary subject's face
+            primary_bbox: The session's locked primary face, if any
+
+        Returns:
+            List of (bbox, emotion probabilities)
+        """
+        if self.closed:
+            raise RuntimeError("Inference pool is closed")
+        if not self.fits(frame):
+            raise ValueError(
+                f"Frame of {frame.nbytes} bytes exceeds slot size {self.slot_bytes}"
+            )
+
+        with stage("inference_slot_wait"):
+            try:
+                slot = self.free_slots.get(timeout=self.timeout)
+            except queue.Empty:
+                raise TimeoutError("No free inference slot")
+
+        task_id = next(self.task_ids)
+        try:
+            with stage("shm_copy"):
+                view = np.ndarray(
+                    frame.shape,
+                    dtype=frame.dtype,
+                    buffer=self.shm.buf,
+                    offset=slot * self.slot_bytes,
+                )
+                np.copyto(view, frame)
+                del view
+
+            future: Future = Future()
+            with self.pending_lock:
+                self.pending[task_id] = (future, slot)
+            self.tasks.put(
+                (
+                    task_id,
+                    slot,
+                    frame.shape,
+                    frame.dtype.str,
+                    scale,
+                    primary_only,
+                    primary_bbox,
+                )
+            )
+        except Exception:
+            with self.pending_lock:
+                self.pending.pop(task_id, None)
+            self.free_slots.put(slot)
+            raise
+
+        with stage("inference_wait"):
+            try:
+                detections, timings = future.result(timeout=self.timeout)
+            except FutureTimeoutError:
+                # Give up on the result only: a worker may still read the frame, so
+                # the slot stays reserved until the task is done or its process dies
+                with self.pending_lock:
+                    abandoned = task_id in self.pending
+                    if abandoned:
+                        self.pending[task_id] = (None, slot)
+                if abandoned:
+                    raise TimeoutError(
+                        f"No inference result within {self.timeout:g}s"
+                    ) from None
+                detections, timings = future.result()
+
+        record_timings(timings)
+        return detections
+
+    def _finish(self, task_id: int, error: str):
+        """
+        Remove a pending task whose process died and return its slot to the ring
+
+        Args:
+            task_id: Task to remove
+            error: Failure message set on the task's future
+        """
+        with self.pending_lock:
+            future, slot = self.pending.pop(task_id, (None, None))
+        if slot is not None:
+            self.free_slots.put(slot)
+        if future is not None:
+            future.set_exception(RuntimeError(error))
+
+    def _collect_results(self):
+        """Resolve futures as results arrive, return slots and replace dead processes"""
+        while True:
+            try:
+                item = self.results.get(timeout=LIVENESS_INTERVAL)
+            except queue.Empty:
+                item = ()
+            if item is None:
+                break
+
+            if item and item[0] == "start":
+                _, task_id, index = item
+                self.running[index] = task_id
+            elif item:
+                _, task_id, detections, timings, error = item
+                for index, running in list(self.running.items()):
+                    if running == task_id:
+                        del self.running[index]
+                with self.pending_lock:
+                    future, slot = self.pending.pop(task_id, (None, None))
+                if slot is not None:
+                    self.free_slots.put(slot)
+                if future is not None:
+                    if error is None:
+                        future.set_result((detections, timings))
+                    else:
+                        future.set_exception(RuntimeError(error))
+
+            if time.monotonic() >= self.next_liveness_check:
+                self.next_liveness_check = time.monotonic() + LIVENESS_INTERVAL
+                self._replace_dead_workers()
+
+    def _replace_dead_workers(self):
+        """Fail the task of each dead inference process and start a new process"""
+        if self.closed:
+            return
+        for index, worker in enumerate(self.workers):
+            if worker.is_alive():
+                continue
+            print(
+                f"Inference process {worker.name} exited with code {worker.exitcode}; "
+                "restarting"
+            )
+            task_id = self.running.pop(index, None)
+            if task_id is not None:
+                self._finish(
+                    task_id, f"Inference process exited with code {worker.exitcode}"
+                )
+            self.workers[index] = self._spawn(index)
+
+    def close(self):
+        """Stop the inference processes and release the shared memory"""
+        if self.closed:
+            return
+        self.closed = True
+
+        for _ in self.workers:
+            self.tasks.put(None)
+        for worker in self.workers:
+            worker.join(timeout=5)
+            if worker.is_alive():
+                worker.terminate()
+
+        self.results.put(None)
+        self.listener.join(timeout=5)
+
+        with self.pending_lock:
+            for future, _ in self.pending.values():
+                if future is not None:
+                    future.set_exception(RuntimeError("Inference pool closed"))
+            self.pending.clear()
+
+        self.shm.close()
+        self.shm.unlink()
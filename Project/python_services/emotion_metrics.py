@@ -0,0 +1,403 @@
+"""
+Latency instrumentation for the emotion detection pipeline
+Per-stage timers aggregated into fixed-bucket histograms and rendered in Prometheus text format
+"""
+
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+# Histogram bucket upper bounds in seconds (50us .. 10s, roughly x2 apart)
+DEFAULT_BUCKETS = (
+    0.00005,
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+# Quantiles reported in summaries and on /metrics
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class LatencyHistogram:
+    """
+    Fixed-bucket latency histogram
+    Observation is a bisect plus two additions, so it is cheap enough to run per stage per frame
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        """
+        Args:
+            buckets: Sorted bucket upper bounds in seconds
+        """
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.total = 0.0
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        """Record a single duration"""
+        index = bisect_left(self.buckets, seconds)
+        with self.lock:
+            self.counts[index] += 1
+            self.total += seconds
+            self.count += 1
+
+    def percentile(self, q: float) -> float:
+        """
+        Estimate a quantile by linear interpolation inside the matching bucket
+
+        Args:
+            q: Quantile in [0, 1]
+
+        Returns:
+            Estimated duration in seconds (0 if nothing was observed)
+        """
+        with self.lock:
+            counts = list(self.counts)
+            count = self.count
+
+        if count == 0:
+            return 0.0
+
+        rank = q * count
+        cumulative = 0
+        for index, bucket_count in enumerate(counts):
+            if cumulative + bucket_count >= rank and bucket_count > 0:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                if index >= len(self.buckets):
+                    # +Inf bucket: best estimate is the largest finite bound
+                    return self.buckets[-1]
+                upper = self.buckets[index]
+                fraction = (rank - cumulative) / bucket_count
+                return lower + (upper - lower) * fraction
+            cumulative += bucket_count
+
+        return self.buckets[-1]
+
+    def summary(self) -> Dict[str, float]:
+        """Count, mean and quantiles in milliseconds"""
+        with self.lock:
+            count = self.count
+            total = self.total
+
+        result = {
+            "count": count,
+            "mean_ms": round(total / count * 1000, 3) if count else 0.0,
+        }
+        for q in QUANTILES:
+            result[f"p{int(q * 100)}_ms"] = round(self.percentile(q) * 1000, 3)
+        return result
+
+    def snapshot(self) -> Tuple[List[int], float, int]:
+        """Consistent copy of bucket counts, sum and count"""
+        with self.lock:
+            return list(self.counts), self.total, self.count
+
+
+class MetricsRegistry:
+    """
+    Process-wide metrics: stage latencies, request counts/latencies, face throughput and gauges
+    """
+
+    def __init__(self, rate_window: float = 60.0):
+        """
+        Args:
+            rate_window: Seconds over which faces/sec is averaged
+        """
+        self.rate_window = rate_window
+        self.started_at = time.time()
+
+        self.stage_latency: Dict[str, LatencyHistogram] = {}
+        self.request_latency: Dict[str, LatencyHistogram] = {}
+        self.request_counts: Dict[Tuple[str, int], int] = {}
+        self.rejection_counts: Dict[Tuple[str, str], int] = {}
+        self.faces_total = 0
+        self.frames_total = 0
+        self.recent_faces = deque()  # (monotonic time, faces)
+        self.gauges: Dict[str, Tuple[str, Callable[[], float]]] = {}
+
+        self.lock = threading.Lock()
+
+    def _histogram(self, table: Dict[str, LatencyHistogram], name: str):
+        histogram = table.get(name)
+        if histogram is None:
+            with self.lock:
+                histogram = table.setdefault(name, LatencyHistogram())
+        return histogram
+
+    def observe_stage(self, name: str, seconds: float):
+        """Record the duration of one pipeline stage"""
+        self._histogram(self.stage_latency, name).observe(seconds)
+
+    def record_request(self, route: str, status: int, seconds: float):
+        """Record a finished HTTP request"""
+        self._histogram(self.request_latency, route).observe(seconds)
+        with self.lock:
+            key = (route, status)
+            self.request_counts[key] = self.request_counts.get(key, 0) + 1
+
+    def record_rejection(self, route: str, reason: str):
+        """Record a request refused by admission control"""
+        with self.lock:
+            key = (route, reason)
+            self.rejection_counts[key] = self.rejection_counts.get(key, 0) + 1
+
+    def record_frame(self, faces: int):
+        """Record an analyzed frame and the number of faces it contained"""
+        now = time.monotonic()
+        with self.lock:
+            self.frames_total += 1
+            self.faces_total += faces
+            self.recent_faces.append((now, faces))
+            self._trim_recent(now)
+
+    def faces_per_second(self) -> float:
+        """Faces analyzed per second over the rate window"""
+        now = time.monotonic()
+        with self.lock:
+            self._trim_recent(now)
+            faces = sum(n for _, n in self.recent_faces)
+        window = min(self.rate_window, max(time.time() - self.started_at, 1e-9))
+        return faces / window
+
+    def _trim_recent(self, now: float):
+        cutoff = now - self.rate_window
+        while self.recent_faces and self.recent_faces[0][0] < cutoff:
+            self.recent_faces.popleft()
+
+    def register_gauge(self, name: str, help_text: str, callback: Callable[[], float]):
+        """
+        Register a gauge whose value is read when metrics are rendered
+
+        Args:
+            name: Metric name
+            help_text: Prometheus HELP text
+            callback: Zero-argument function returning the current value
+        """
+        with self.lock:
+            self.gauges[name] = (help_text, callback)
+
+    def _items(self, table: Dict) -> List[Tuple]:
+        """Sorted copy of a table's items, taken under the lock writers hold"""
+        with self.lock:
+            return sorted(table.items())
+
+    def summary(self) -> Dict:
+        """JSON-friendly view of all stage and request latencies"""
+        return {
+            "stages": {
+                name: histogram.summary()
+                for name, histogram in self._items(self.stage_latency)
+            },
+            "requests": {
+                name: histogram.summary()
+                for name, histogram in self._items(self.request_latency)
+            },
+            "rejections": {
+                f"{route}:{reason}": count
+                for (route, reason), count in self._items(self.rejection_counts)
+            },
+            "frames_total": self.frames_total,
+            "faces_total": self.faces_total,
+            "faces_per_second": round(self.faces_per_second(), 3),
+            "resident_memory_bytes": resident_memory_bytes(),
+        }
+
+    def render_prometheus(self) -> str:
+        """
+        Render all metrics in the Prometheus text exposition format
+
+        Returns:
+            Metrics text (version 0.0.4)
+        """
+        lines = []
+        stage_latency = self._items(self.stage_latency)
+
+        self._render_histograms(
+            lines,
+            "emotion_stage_duration_seconds",
+            "Duration of each emotion pipeline stage",
+            "stage",
+            stage_latency,
+        )
+        self._render_histograms(
+            lines,
+            "emotion_request_duration_seconds",
+            "HTTP request duration by route",
+            "route",
+            self._items(self.request_latency),
+        )
+
+        lines.append(
+            "# HELP emotion_stage_duration_quantile_seconds Estimated stage latency quantiles"
+        )
+        lines.append("# TYPE emotion_stage_duration_quantile_seconds gauge")
+        for name, histogram in stage_latency:
+            for q in QUANTILES:
+                lines.append(
+                    f'emotion_stage_duration_quantile_seconds{{stage="{name}",quantile="{q}"}} '
+                    f"{histogram.percentile(q):.6f}"
+                )
+
+        lines.append("# HELP emotion_requests_total HTTP requests by route and status")
+        lines.append("# TYPE emotion_requests_total counter")
+        for (route, status), count in self._items(self.request_counts):
+            lines.append(
+                f'emotion_requests_total{{route="{route}",status="{status}"}} {count}'
+            )
+
+        lines.append(
+            "# HELP emotion_admission_rejections_total Requests refused by admission control"
+        )
+        lines.append("# TYPE emotion_admission_rejections_total counter")
+        for (route, reason), count in self._items(self.rejection_counts):
+            lines.append(
+                f'emotion_admission_rejections_total{{route="{route}",reason="{reason}"}} {count}'
+            )
+
+        lines.append("# HELP emotion_frames_total Frames analyzed")
+        lines.append("# TYPE emotion_frames_total counter")
+        lines.append(f"emotion_frames_total {self.frames_total}")
+        lines.append("# HELP emotion_faces_total Faces analyzed")
+        lines.append("# TYPE emotion_faces_total counter")
+        lines.append(f"emotion_faces_total {self.faces_total}")
+        lines.append("# HELP emotion_faces_per_second Faces analyzed per second")
+        lines.append("# TYPE emotion_faces_per_second gauge")
+        lines.append(f"emotion_faces_per_second {self.faces_per_second():.3f}")
+
+        lines.append("# HELP process_resident_memory_bytes Resident memory size in bytes")
+        lines.append("# TYPE process_resident_memory_bytes gauge")
+        lines.append(f"process_resident_memory_bytes {resident_memory_bytes()}")
+
+        for name, (help_text, callback) in self._items(self.gauges):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {callback()}")
+
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _render_histograms(lines, metric, help_text, label, histograms):
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} histogram")
+        for name, histogram in histograms:
+            counts, total, count = histogram.snapshot()
+            cumulative = 0
+            for bound, bucket_count in zip(histogram.buckets, counts):
+                cumulative += bucket_count
+                lines.append(
+                    f'{metric}_bucket{{{label}="{name}",le="{bound}"}} {cumulative}'
+                )
+            lines.append(f'{metric}_bucket{{{label}="{name}",le="+Inf"}} {count}')
+            lines.append(f'{metric}_sum{{{label}="{name}"}} {total:.6f}')
+            lines.append(f'{metric}_count{{{label}="{name}"}} {count}')
+
+
+def resident_memory_bytes() -> int:
+    """
+    Resident set size of the current process
+
+    Returns:
+        RSS in bytes (peak RSS where /proc is unavailable, 0 if unknown)
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+
+    try:
+        import resource
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports kilobytes, macOS bytes
+        return peak if sys.platform == "darwin" else peak * 1024
+    except ImportError:
+        return 0
+
+
+# Global registry shared by the detector and the API
+metrics = MetricsRegistry()
+
+# Per-thread collector of stage timings for the request currently being served
+_local = threading.local()
+
+
+@contextmanager
+def stage(name: str):
+    """
+    Time a pipeline stage
+
+    The duration is always added to the global stage histogram, and also accumulated
+    (in milliseconds) into the active per-request collector if one is open.
+
+    Args:
+        name: Stage name, e.g. 'imdecode' or 'detect_multiscale'
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        metrics.observe_stage(name, elapsed)
+        timings = getattr(_local, "timings", None)
+        if timings is not None:
+            timings[name] = timings.get(name, 0.0) + elapsed * 1000
+
+
+@contextmanager
+def collect_timings():
+    """
+    Open a per-request timing collector for the current thread
+
+    Yields:
+        Dictionary of stage name -> accumulated milliseconds
+    """
+    previous = getattr(_local, "timings", None)
+    timings: Dict[str, float] = {}
+    _local.timings = timings
+    try:
+        yield timings
+    finally:
+        _local.timings = previous
+
+
+def current_timings() -> Optional[Dict[str, float]]:
+    """Timing collector of the current thread, if one is open"""
+    return getattr(_local, "timings", None)
+
+
+def record_timings(timings: Dict[str, float]):
+    """
+    Merge stage timings measured elsewhere (e.g. in an inference process)
+
+    Args:
+        timings: Stage name -> milliseconds
+    """
+    collector = current_timings()
+    for name, ms in timings.items():
+        metrics.observe_stage(name, ms / 1000)
+        if collector is not None:
+            collector[name] = collector.get(name, 0.0) + ms
@@ -0,0 +1,145 @@
+"""
+Mosaic packing for multi-stream analysis
+Frames of several participants are downscaled into the tiles of one grid image so that
+face detection runs once per group instead of once per stream, and detections are
+mapped back to the stream and pixel coordinates they came from
+"""
+
+import math
+from typing import List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from emotion_metrics import stage
+
+
+# Largest tile (width, height) a stream frame is downscaled to fit
+MOSAIC_TILE_SIZE = (480, 360)
+
+# Blank pixels around tiles so that no detection window covers two streams
+MOSAIC_GUTTER = 16
+
+
+class MosaicTile:
+    """Placement of one stream frame inside the mosaic"""
+
+    def __init__(self, x: int, y: int, width: int, height: int, factor: float):
+        """
+        Args:
+            x: Left edge in mosaic pixels
+            y: Top edge in mosaic pixels
+            width: Tile width in mosaic pixels
+            height: Tile height in mosaic pixels
+            factor: Stream frame pixels per mosaic pixel (>= 1)
+        """
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.factor = factor
+
+    def contains(self, px: float, py: float) -> bool:
+        return (
+            self.x <= px < self.x + self.width and self.y <= py < self.y + self.height
+        )
+
+
+class Mosaic:
+    """Grayscale grid image of stream frames with the tile of each stream"""
+
+    def __init__(self, image: np.ndarray, tiles: List[MosaicTile]):
+        self.image = image
+        self.tiles = tiles
+
+    def largest_face(self) -> int:
+        """Side of the largest square face that fits in any tile"""
+        return max(min(tile.width, tile.height) for tile in self.tiles)
+
+    @classmethod
+    def pack(
+        cls,
+        frames: List[np.ndarray],
+        tile_size: Tuple[int, int] = MOSAIC_TILE_SIZE,
+        gutter: int = MOSAIC_GUTTER,
+    ) -> "Mosaic":
+        """
+        Pack frames into a near-square grid, downscaling each to fit its tile
+
+        Frames are never upscaled, so frames smaller than a tile keep every pixel.
+
+        Args:
+            frames: Stream frames (BGR, or grayscale as produced by a reduced decode)
+            tile_size: Largest (width, height) of a tile
+            gutter: Blank pixels between and around tiles
+
+        Returns:
+            The packed mosaic
+        """
+        # Tiles are no larger than the largest frame, so small frames pack tightly
+        tile_width = min(tile_size[0], max(frame.shape[1] for frame in frames))
+        tile_height = min(tile_size[1], max(frame.shape[0] for frame in frames))
+        columns = max(1, math.ceil(math.sqrt(len(frames))))
+        rows = max(1, math.ceil(len(frames) / columns))
+
+        with stage("mosaic_pack"):
+            image = np.zeros(
+                (
+                    rows * tile_height + (rows + 1) * gutter,
+                    columns * tile_width + (columns + 1) * gutter,
+                ),
+                dtype=np.uint8,
+            )
+            tiles = []
+            for index, frame in enumerate(frames):
+                if frame.ndim == 3:
+                    frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+                height, width = frame.shape[:2]
+                factor = max(1.0, width / tile_width, height / tile_height)
+                if factor > 1.0:
+                    size = (
+                        min(tile_width, int(round(width / factor))),
+                        min(tile_height, int(round(height / factor))),
+                    )
+                    frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+                    height, width = frame.shape[:2]
+
+                row, column = divmod(index, columns)
+                x = gutter + column * (tile_width + gutter)
+                y = gutter + row * (tile_height + gutter)
+                image[y : y + height, x : x + width] = frame
+                tiles.append(MosaicTile(x, y, width, height, factor))
+
+        return cls(image, tiles)
+
+    def locate(
+        self, bbox: Tuple[int, int, int, int]
+    ) -> Optional[Tuple[int, Tuple[int, int, int, int]]]:
+        """
+        Map a detection in the mosaic back to its stream
+
+        Args:
+            bbox: (x, y, w, h) in mosaic pixels
+
+        Returns:
+            (stream index, (x, y, w, h) in that stream's frame pixels), or None if
+            the detection's center lies outside every tile
+        """
+        x, y, w, h = bbox
+        center_x, center_y = x + w / 2, y + h / 2
+        for index, tile in enumerate(self.tiles):
+            if not tile.contains(center_x, center_y):
+                continue
+            # Clip to the tile so a box never reaches into a neighbouring stream
+            left = max(x, tile.x) - tile.x
+            top = max(y, tile.y) - tile.y
+            right = min(x + w, tile.x + tile.width) - tile.x
+            bottom = min(y + h, tile.y + tile.height) - tile.y
+            factor = tile.factor
+            return index, (
+                int(left * factor),
+                int(top * factor),
+                int((right - left) * factor),
+                int((bottom - top) * factor),
+            )
+        return None
@@ -0,0 +1,232 @@
+"""
+Opt-in sampling profiler for live API requests
+Profiles a random fraction of requests with a statistical stack sampler and keeps
+flamegraph-ready collapsed stacks per route, with bounded overhead and retention
+"""
+
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional
+
+
+# Deepest stack recorded per sample
+MAX_STACK_DEPTH = 128
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def collapse_stack(frame) -> str:
+    """
+    Render a frame and its callers as a collapsed stack line (root first)
+
+    Args:
+        frame: Innermost frame
+
+    Returns:
+        Semicolon-separated stack, e.g. 'wrapper (...);analyze_frame (...);detect_faces (...)'
+    """
+    labels = []
+    while frame is not None and len(labels) < MAX_STACK_DEPTH:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.reverse()
+    return ";".join(labels)
+
+
+def format_collapsed(stacks: Counter) -> str:
+    """Format stack counts in the collapsed format used by flamegraph.pl and speedscope"""
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+class StackSampler:
+    """
+    Single background thread that periodically samples the stacks of registered threads
+    The thread only runs while at least one thread is registered
+    """
+
+    def __init__(self, interval: float = 0.005):
+        """
+        Args:
+            interval: Seconds between samples
+        """
+        self.interval = interval
+        self.targets: Dict[int, Counter] = {}
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    def register(self, thread_id: int) -> Counter:
+        """Start sampling a thread; returns the counter its stacks accumulate into"""
+        counter = Counter()
+        with self.lock:
+            self.targets[thread_id] = counter
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(
+                    target=self._run, name="emotion-profiler", daemon=True
+                )
+                self.thread.start()
+        self.wakeup.set()
+        return counter
+
+    def unregister(self, thread_id: int) -> Counter:
+        """Stop sampling a thread and return its stack counts"""
+        with self.lock:
+            return self.targets.pop(thread_id, Counter())
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while True:
+            with self.lock:
+                targets = dict(self.targets)
+            if not targets:
+                self.wakeup.clear()
+                self.wakeup.wait(timeout=1.0)
+                continue
+
+            frames = sys._current_frames()
+            for thread_id, counter in targets.items():
+                if thread_id == own_id:
+                    continue
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    counter[collapse_stack(frame)] += 1
+            del frames
+
+            time.sleep(self.interval)
+
+
+class RequestProfiler:
+    """
+    Decides which requests to profile and retains the results
+
+    Configuration (environment):
+        EMOTION_PROFILE_SAMPLE_RATE: Fraction of requests profiled (default 0, disabled)
+        EMOTION_PROFILE_MAX_PROFILES: Individual profiles retained (default 50)
+        EMOTION_PROFILE_MAX_CONCURRENT: Requests profiled at the same time (default 2)
+        EMOTION_PROFILE_INTERVAL_MS: Sampling interval (default 5)
+    """
+
+    def __init__(
+        self,
+        sample_rate: float = 0.0,
+        max_profiles: int = 50,
+        max_concurrent: int = 2,
+        interval: float = 0.005,
+    ):
+        self.sample_rate = sample_rate
+        self.max_concurrent = max_concurrent
+        self.sampler = StackSampler(interval)
+
+        self.profiles = deque(maxlen=max_profiles)
+        self.route_stacks: Dict[str, Counter] = {}
+        self.next_id = 1
+        self.active = 0
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "RequestProfiler":
+        """Build a profiler from EMOTION_PROFILE_* environment variables"""
+        return cls(
+            sample_rate=float(os.environ.get("EMOTION_PROFILE_SAMPLE_RATE", 0)),
+            max_profiles=int(os.environ.get("EMOTION_PROFILE_MAX_PROFILES", 50)),
+            max_concurrent=int(os.environ.get("EMOTION_PROFILE_MAX_CONCURRENT", 2)),
+            interval=float(os.environ.get("EMOTION_PROFILE_INTERVAL_MS", 5)) / 1000,
+        )
+
+    def _acquire_slot(self, force: bool) -> bool:
+        if not force and (self.sample_rate <= 0 or random.random() >= self.sample_rate):
+            return False
+        with self.lock:
+            if self.active >= self.max_concurrent:
+                return False
+            self.active += 1
+            return True
+
+    @contextmanager
+    def maybe_profile(self, route: str, force: bool = False):
+        """
+        Profile the enclosed request if it is sampled
+
+        Args:
+            route: Route label the profile is filed under
+            force: Profile regardless of the sample rate (still subject to the concurrency cap)
+        """
+        if not self._acquire_slot(force):
+            yield
+            return
+
+        thread_id = threading.get_ident()
+        start = time.perf_counter()
+        self.sampler.register(thread_id)
+        try:
+            yield
+        finally:
+            stacks = self.sampler.unregister(thread_id)
+            duration = time.perf_counter() - start
+            self._store(route, stacks, duration)
+
+    def _store(self, route: str, stacks: Counter, duration: float):
+        with self.lock:
+            self.active -= 1
+            profile = {
+                "id": self.next_id,
+                "route": route,
+                "timestamp": datetime.now().isoformat(),
+                "duration_ms": round(duration * 1000, 3),
+                "samples": sum(stacks.values()),
+                "stacks": stacks,
+            }
+            self.next_id += 1
+            self.profiles.append(profile)
+            self.route_stacks.setdefault(route, Counter()).update(stacks)
+
+    def configure(self, sample_rate: Optional[float] = None):
+        """Change the sample rate at runtime"""
+        if sample_rate is not None:
+            self.sample_rate = min(max(float(sample_rate), 0.0), 1.0)
+
+    def clear(self):
+        """Drop all retained profiles"""
+        with self.lock:
+            self.profiles.clear()
+            self.route_stacks = {}
+
+    def list_profiles(self) -> List[Dict]:
+        """Metadata of retained profiles (without stacks)"""
+        with self.lock:
+            return [
+                {key: value for key, value in profile.items() if key != "stacks"}
+                for profile in self.profiles
+            ]
+
+    def get_profile(self, profile_id: int) -> Optional[Dict]:
+        with self.lock:
+            for profile in self.profiles:
+                if profile["id"] == profile_id:
+                    return profile
+        return None
+
+    def collapsed_for_route(self, route: str) -> Optional[str]:
+        """Collapsed stacks aggregated over every profiled request of a route"""
+        with self.lock:
+            stacks = self.route_stacks.get(route)
+            return format_collapsed(stacks) if stacks is not None else None
+
+    def status(self) -> Dict:
+        return {
+            "sample_rate": self.sample_rate,
+            "max_profiles": self.profiles.maxlen,
+            "max_concurrent": self.max_concurrent,
+            "interval_ms": self.sampler.interval * 1000,
+            "retained_profiles": len(self.profiles),
+            "routes": sorted(self.route_stacks),
+        }
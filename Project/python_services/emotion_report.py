@@ -0,0 +1,261 @@
+"""
+Interview emotion report helpers
+Turns emotion statistics into recommendations and an overall performance score,
+and caches built reports per session
+"""
+
+import itertools
+import os
+import threading
+import time
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+
+def generate_recommendations(stats: dict) -> list:
+    """Generate recommendations based on emotion statistics"""
+    recommendations = []
+
+    avg_score = stats.get("average_score", 0)
+    positive_ratio = stats.get("positive_ratio", 0)
+    trend = stats.get("recent_trend", "stable")
+
+    # Score-based recommendations
+    if avg_score < 50:
+        recommendations.append(
+            {
+                "type": "warning",
+                "category": "Overall Performance",
+                "message": "Your emotional expression could be more positive. Try to maintain a friendly and engaged demeanor.",
+                "priority": "high",
+            }
+        )
+    elif avg_score < 70:
+        recommendations.append(
+            {
+                "type": "info",
+                "category": "Overall Performance",
+                "message": "Good emotional expression overall. Consider being slightly more expressive to show enthusiasm.",
+                "priority": "medium",
+            }
+        )
+    else:
+        recommendations.append(
+            {
+                "type": "success",
+                "category": "Overall Performance",
+                "message": "Excellent emotional expression! You maintained a positive and professional demeanor.",
+                "priority": "low",
+            }
+        )
+
+    # Positive ratio recommendations
+    if positive_ratio < 0.5:
+        recommendations.append(
+            {
+                "type": "warning",
+                "category": "Emotional Balance",
+                "message": "Try to maintain more positive emotions during the interview. Practice relaxation techniques before interviews.",
+                "priority": "high",
+            }
+        )
+    elif positive_ratio < 0.7:
+        recommendations.append(
+            {
+                "type": "info",
+                "category": "Emotional Balance",
+                "message": "Your emotional balance is decent. Focus on staying calm and confident.",
+                "priority": "medium",
+            }
+        )
+
+    # Trend-based recommendations
+    if trend == "declining":
+        recommendations.append(
+            {
+                "type": "warning",
+                "category": "Energy Level",
+                "message": "Your energy seems to be declining. Take short breaks during long interviews and stay hydrated.",
+                "priority": "medium",
+            }
+        )
+    elif trend == "improving":
+        recommendations.append(
+            {
+                "type": "success",
+                "category": "Energy Level",
+                "message": "Great! Your confidence is growing throughout the interview.",
+                "priority": "low",
+            }
+        )
+
+    # Check for specific emotions
+    emotion_dist = stats.get("emotion_distribution", {})
+
+    if emotion_dist.get("Fear", 0) > 0.3:
+        recommendations.append(
+            {
+                "type": "warning",
+                "category": "Confidence",
+                "message": "You show signs of nervousness. Practice mock interviews to build confidence.",
+                "priority": "high",
+            }
+        )
+
+    if emotion_dist.get("Angry", 0) > 0.2:
+        recommendations.append(
+            {
+                "type": "warning",
+                "category": "Composure",
+                "message": "Try to maintain composure even during challenging questions. Take a breath before answering.",
+                "priority": "high",
+            }
+        )
+
+    if emotion_dist.get("Sad", 0) > 0.2:
+        recommendations.append(
+            {
+                "type": "info",
+                "category": "Engagement",
+                "message": "Show more enthusiasm and energy. Sit up straight and make eye contact.",
+                "priority": "medium",
+            }
+        )
+
+    return recommendations
+
+
+def calculate_performance_score(stats: dict) -> dict:
+    """Calculate overall performance score"""
+    avg_score = stats.get("average_score", 0)
+    positive_ratio = stats.get("positive_ratio", 0)
+
+    # Weighted score
+    overall = avg_score * 0.6 + positive_ratio * 100 * 0.4
+
+    if overall >= 80:
+        rating = "Excellent"
+        color = "green"
+    elif overall >= 70:
+        rating = "Good"
+        color = "lime"
+    elif overall >= 60:
+        rating = "Fair"
+        color = "yellow"
+    else:
+        rating = "Needs Improvement"
+        color = "red"
+
+    return {"score": round(overall, 1), "rating": rating, "color": color}
+
+
+class ReportCache:
+    """
+    Per-session cache of built reports keyed by a version
+
+    A cached report is reused while its version is current, and also while it is
+    younger than min_interval even if newer frames have arrived, so polling
+    dashboards cost at most one rebuild per interval per session. Reports of
+    sessions nobody has asked about for session_ttl seconds are dropped.
+    """
+
+    def __init__(self, min_interval: float = 1.0, session_ttl: float = 3600.0):
+        """
+        Args:
+            min_interval: Seconds a stale report may still be served
+            session_ttl: Seconds after which an unused session's report is dropped
+        """
+        self.min_interval = min_interval
+        self.session_ttl = session_ttl
+        self.entries: Dict[str, Dict] = {}
+        self.lock = threading.Lock()
+        self.session_locks: Dict[str, threading.Lock] = {}
+        self.next_expiry = 0.0
+
+        # ETags are a per-process nonce plus a build counter, so they never repeat
+        self.nonce = f"{os.getpid():x}{int(time.time()):x}"
+        self.builds = itertools.count(1)
+
+    def _session_lock(self, session_id: str) -> threading.Lock:
+        with self.lock:
+            return self.session_locks.setdefault(session_id, threading.Lock())
+
+    def _fresh(self, entry: Optional[Dict], version: Hashable) -> bool:
+        return entry is not None and (
+            entry["version"] == version
+            or time.monotonic() - entry["built_at"] < self.min_interval
+        )
+
+    def current_etag(self, session_id: str, version: Hashable) -> Optional[str]:
+        """ETag of the report that get() would return, or None if it needs a rebuild"""
+        entry = self.entries.get(session_id)
+        if not self._fresh(entry, version):
+            return None
+        entry["last_used"] = time.monotonic()
+        return entry["etag"]
+
+    def get(
+        self, session_id: str, version: Hashable, build: Callable[[], Dict]
+    ) -> Tuple[Dict, str]:
+        """
+        Return the cached report, rebuilding it only when stale
+
+        Args:
+            session_id: Session identifier
+            version: Current state version; any change marks the cached report stale
+            build: Zero-argument function building the report
+
+        Returns:
+            (report, etag)
+        """
+        entry = self.entries.get(session_id)
+        if self._fresh(entry, version):
+            entry["last_used"] = time.monotonic()
+            return entry["report"], entry["etag"]
+
+        self._expire(time.monotonic())
+
+        # One rebuild per session at a time; concurrent pollers wait for it
+        with self._session_lock(session_id):
+            entry = self.entries.get(session_id)
+            if self._fresh(entry, version):
+                return entry["report"], entry["etag"]
+
+            report = build()
+            now = time.monotonic()
+            entry = {
+                "version": version,
+                "built_at": now,
+                "last_used": now,
+                "report": report,
+                "etag": f"{self.nonce}-{next(self.builds)}",
+            }
+            with self.lock:
+                self.entries[session_id] = entry
+            return report, entry["etag"]
+
+    def invalidate(self, session_id: str):
+        """Forget a session's cached report"""
+        with self.lock:
+            self.entries.pop(session_id, None)
+            self.session_locks.pop(session_id, None)
+
+    def _expire(self, now: float):
+        """Drop reports and locks of sessions unused for session_ttl seconds"""
+        if now < self.next_expiry:
+            return
+        self.next_expiry = now + min(60.0, self.session_ttl)
+        with self.lock:
+            for session_id in [
+                session_id
+                for session_id, entry in self.entries.items()
+                if now - entry["last_used"] > self.session_ttl
+            ]:
+                del self.entries[session_id]
+            # Locks of expired sessions, and of builds that raised, unless in use
+            for session_id in [
+                session_id
+                for session_id, lock in self.session_locks.items()
+                if session_id not in self.entries and not lock.locked()
+            ]:
+                del self.session_locks[session_id]
+
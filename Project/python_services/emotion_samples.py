@@ -0,0 +1,182 @@
+"""
+Deterministic sample frames for benchmarks and load tests
+Generates synthetic faces that the default Haar cascade detects, and loads real face images from disk
+"""
+
+import base64
+import os
+from typing import List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+def synthetic_face(size: int) -> np.ndarray:
+    """
+    Draw a frontal cartoon face that the default Haar cascade detects
+
+    Args:
+        size: Side length of the square face image in pixels
+
+    Returns:
+        BGR face image of shape (size, size, 3)
+    """
+    face = np.full((size, size, 3), 200, np.uint8)
+    center = size // 2
+
+    # Skin
+    cv2.ellipse(
+        face,
+        (center, center),
+        (int(size * 0.38), int(size * 0.48)),
+        0,
+        0,
+        360,
+        (150, 170, 210),
+        -1,
+    )
+
+    # Eyes and brows
+    for side in (-1, 1):
+        eye_x = center + side * int(size * 0.16)
+        eye_y = center - int(size * 0.1)
+        cv2.ellipse(
+            face,
+            (eye_x, eye_y),
+            (int(size * 0.09), int(size * 0.045)),
+            0,
+            0,
+            360,
+            (40, 40, 40),
+            -1,
+        )
+        cv2.line(
+            face,
+            (eye_x - int(size * 0.1), eye_y - int(size * 0.1)),
+            (eye_x + int(size * 0.1), eye_y - int(size * 0.11)),
+            (30, 30, 30),
+            max(2, size // 40),
+        )
+
+    # Nose and mouth
+    cv2.line(
+        face,
+        (center, center - int(size * 0.02)),
+        (center, center + int(size * 0.12)),
+        (110, 120, 160),
+        max(2, size // 50),
+    )
+    cv2.ellipse(
+        face,
+        (center, center + int(size * 0.24)),
+        (int(size * 0.14), int(size * 0.04)),
+        0,
+        0,
+        360,
+        (60, 60, 120),
+        -1,
+    )
+
+    return cv2.GaussianBlur(face, (5, 5), 0)
+
+
+def load_face_images(directory: Optional[str]) -> List[np.ndarray]:
+    """
+    Load real face images from a local directory (sorted by name for reproducibility)
+
+    Args:
+        directory: Directory of face crops, or None
+
+    Returns:
+        List of BGR images (empty if the directory is missing)
+    """
+    if not directory or not os.path.isdir(directory):
+        return []
+
+    images = []
+    for name in sorted(os.listdir(directory)):
+        if not name.lower().endswith(IMAGE_EXTENSIONS):
+            continue
+        image = cv2.imread(os.path.join(directory, name), cv2.IMREAD_COLOR)
+        if image is not None:
+            images.append(image)
+    return images
+
+
+def make_frame(
+    width: int,
+    height: int,
+    num_faces: int,
+    seed: int = 0,
+    face_images: Optional[List[np.ndarray]] = None,
+) -> np.ndarray:
+    """
+    Compose a frame with a fixed number of faces on a textured background
+
+    Faces are laid out on a non-overlapping grid, sized to fill their cell.
+    Real face images are used round-robin when provided, synthetic faces otherwise.
+
+    Args:
+        width: Frame width
+        height: Frame height
+        num_faces: Number of faces to place
+        seed: Seed for the background texture
+        face_images: Optional real face crops
+
+    Returns:
+        BGR frame of shape (height, width, 3)
+    """
+    rng = np.random.default_rng(seed)
+    frame = cv2.GaussianBlur(
+        rng.integers(60, 120, (height, width, 3), dtype=np.uint8), (9, 9), 0
+    )
+
+    if num_faces <= 0:
+        return frame
+
+    columns = int(np.ceil(np.sqrt(num_faces * width / height)))
+    rows = int(np.ceil(num_faces / columns))
+    cell_w = width // columns
+    cell_h = height // rows
+    size = int(min(cell_w, cell_h) * 0.8)
+
+    if size < 48:
+        raise ValueError(
+            f"{num_faces} faces do not fit a {width}x{height} frame at >= 48px"
+        )
+
+    for index in range(num_faces):
+        row, column = divmod(index, columns)
+        if face_images:
+            face = cv2.resize(face_images[index % len(face_images)], (size, size))
+        else:
+            face = synthetic_face(size)
+        x = column * cell_w + (cell_w - size) // 2
+        y = row * cell_h + (cell_h - size) // 2
+        frame[y : y + size, x : x + size] = face
+
+    return frame
+
+
+def encode_frame(frame: np.ndarray, quality: int = 80) -> str:
+    """
+    JPEG + base64 encode a frame the way the web client does
+
+    Args:
+        frame: BGR frame
+        quality: JPEG quality
+
+    Returns:
+        Data URL string
+    """
+    _, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return "data:image/jpeg;base64," + base64.b64encode(buffer).decode("utf-8")
+
+
+def parse_resolution(value: str) -> Tuple[int, int]:
+    """Parse 'WIDTHxHEIGHT' into (width, height)"""
+    width, height = value.lower().split("x")
+    return int(width), int(height)
@@ -0,0 +1,345 @@
+"""
+Incremental temporal smoothing for emotion probabilities
+Keeps per-session, per-track state so smoothed output and trend are updated in O(1) per frame
+"""
+
+from collections import deque
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+# Slope thresholds (score points per frame) used to label a trend
+TREND_THRESHOLD = 2.0
+
+# Minimum IoU for a face to continue a session's primary-subject lock
+PRIMARY_IOU_THRESHOLD = 0.2
+
+
+def trend_label(slope: float) -> str:
+    """
+    Convert a score slope into a trend description
+
+    Args:
+        slope: Score change per frame
+
+    Returns:
+        Trend description ('improving', 'declining', 'stable')
+    """
+    if slope > TREND_THRESHOLD:
+        return "improving"
+    elif slope < -TREND_THRESHOLD:
+        return "declining"
+    else:
+        return "stable"
+
+
+def bbox_iou(a: Tuple[int, int, int, int], b: Tuple[int, int, int, int]) -> float:
+    """
+    Intersection over union of two (x, y, w, h) boxes
+
+    Args:
+        a: First bounding box
+        b: Second bounding box
+
+    Returns:
+        IoU in [0, 1]
+    """
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+
+    ix = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    iy = max(0, min(ay + ah, by + bh) - max(ay, by))
+    intersection = ix * iy
+
+    union = aw * ah + bw * bh - intersection
+    return intersection / union if union > 0 else 0.0
+
+
+def select_primary(
+    bboxes: List[Tuple[int, int, int, int]],
+    frame_size: Tuple[int, int],
+    locked: Optional[Tuple[int, int, int, int]] = None,
+) -> Optional[int]:
+    """
+    Pick the candidate's face among the faces of a frame
+
+    With a lock, the face overlapping the locked box most is kept, and no face is
+    picked if none overlaps it. Without one, the largest face wins, discounted by
+    up to half for distance from the frame center.
+
+    Args:
+        bboxes: Face bounding boxes (x, y, w, h)
+        frame_size: Frame (width, height) in the same pixel units as the boxes
+        locked: Bounding box of the currently locked primary face, if any
+
+    Returns:
+        Index into bboxes, or None
+    """
+    if not bboxes:
+        return None
+
+    if locked is not None:
+        overlaps = [bbox_iou(bbox, locked) for bbox in bboxes]
+        best = max(range(len(bboxes)), key=overlaps.__getitem__)
+        return best if overlaps[best] >= PRIMARY_IOU_THRESHOLD else None
+
+    width, height = frame_size
+    half_diagonal = max(np.hypot(width, height) / 2, 1.0)
+
+    def prominence(bbox):
+        x, y, w, h = bbox
+        distance = np.hypot(x + w / 2 - width / 2, y + h / 2 - height / 2)
+        return w * h * (1 - 0.5 * min(distance / half_diagonal, 1.0))
+
+    return max(range(len(bboxes)), key=lambda index: prominence(bboxes[index]))
+
+
+class OnlineTrendEstimator:
+    """
+    Least-squares slope over a sliding window of scores, updated in O(1)
+    Produces the same slope as np.polyfit(range(n), window, 1)[0]
+    """
+
+    def __init__(self, window: int = 10):
+        """
+        Args:
+            window: Number of most recent scores the slope is fitted over
+        """
+        self.window = window
+        self.values = deque()
+        self.sum_y = 0.0
+        self.sum_xy = 0.0
+
+    def update(self, value: float) -> float:
+        """
+        Add a score and return the updated slope
+
+        Args:
+            value: New score
+
+        Returns:
+            Current slope
+        """
+        value = float(value)
+        n = len(self.values)
+
+        if n < self.window:
+            # Window still growing: new value sits at x = n
+            self.sum_xy += n * value
+            self.sum_y += value
+            self.values.append(value)
+        else:
+            # Slide window: every remaining x shifts down by one
+            oldest = self.values.popleft()
+            self.sum_xy = (
+                self.sum_xy - (self.sum_y - oldest) + (self.window - 1) * value
+            )
+            self.sum_y = self.sum_y - oldest + value
+            self.values.append(value)
+
+        return self.slope
+
+    @property
+    def slope(self) -> float:
+        """Current least-squares slope (0 with fewer than two points)"""
+        n = len(self.values)
+        if n < 2:
+            return 0.0
+
+        sum_x = n * (n - 1) / 2
+        sum_xx = (n - 1) * n * (2 * n - 1) / 6
+        denominator = n * sum_xx - sum_x * sum_x
+
+        return (n * self.sum_xy - sum_x * self.sum_y) / denominator
+
+    @property
+    def trend(self) -> str:
+        """Trend description for the current slope"""
+        return trend_label(self.slope)
+
+    def reset(self):
+        """Clear the window"""
+        self.values.clear()
+        self.sum_y = 0.0
+        self.sum_xy = 0.0
+
+
+class TrackSmoother:
+    """
+    Exponential moving average over the emotion probability vector of one tracked face
+    """
+
+    def __init__(self, track_id: int, alpha: float, trend_window: int = 10):
+        """
+        Args:
+            track_id: Identifier of the face track within its session
+            alpha: EMA weight given to the newest frame (0 < alpha <= 1)
+            trend_window: Window size for the online trend estimator
+        """
+        self.track_id = track_id
+        self.alpha = alpha
+        self.probabilities: Optional[np.ndarray] = None
+        self.trend = OnlineTrendEstimator(trend_window)
+        self.bbox: Optional[Tuple[int, int, int, int]] = None
+        self.last_seen = 0
+        self.frames = 0
+
+    def update(
+        self, probabilities: np.ndarray, score: float, bbox: Tuple, frame_number: int
+    ) -> np.ndarray:
+        """
+        Fold a new frame into the smoothed state
+
+        Args:
+            probabilities: Raw 7-way emotion probabilities
+            score: Raw emotion score for the frame
+            bbox: Face bounding box (x, y, w, h)
+            frame_number: Frame counter of the owning session
+
+        Returns:
+            Smoothed probability vector
+        """
+        probabilities = np.asarray(probabilities, dtype=np.float64)
+
+        if self.probabilities is None:
+            self.probabilities = probabilities.copy()
+        else:
+            self.probabilities += self.alpha * (probabilities - self.probabilities)
+
+        self.trend.update(score)
+        self.bbox = tuple(int(v) for v in bbox)
+        self.last_seen = frame_number
+        self.frames += 1
+
+        return self.probabilities
+
+
+class SessionSmoother:
+    """
+    Per-session collection of face tracks
+    Faces are associated with existing tracks by bounding box IoU, and the
+    candidate's face can be locked as the session's primary subject
+    """
+
+    def __init__(
+        self,
+        alpha: float = 0.3,
+        trend_window: int = 10,
+        iou_threshold: float = 0.3,
+        max_missed_frames: int = 15,
+    ):
+        """
+        Args:
+            alpha: EMA weight given to the newest frame
+            trend_window: Window size for each track's trend estimator
+            iou_threshold: Minimum IoU to continue an existing track
+            max_missed_frames: Frames a track may go unseen before it is dropped
+        """
+        self.alpha = alpha
+        self.trend_window = trend_window
+        self.iou_threshold = iou_threshold
+        self.max_missed_frames = max_missed_frames
+
+        self.tracks: Dict[int, TrackSmoother] = {}
+        self.next_track_id = 0
+        self.frame_count = 0
+
+        self.primary_bbox: Optional[Tuple[int, int, int, int]] = None
+        self.primary_missed = 0
+
+        # Monotonic time the session was last used, for idle expiry
+        self.last_seen = time.monotonic()
+
+    def assign_tracks(self, bboxes: List[Tuple[int, int, int, int]]) -> List[int]:
+        """
+        Match this frame's faces to tracks, creating tracks for unmatched faces
+
+        Args:
+            bboxes: Face bounding boxes (x, y, w, h) of the current frame
+
+        Returns:
+            Track id for each bounding box, in the same order
+        """
+        self.frame_count += 1
+
+        # Greedy matching on highest IoU first
+        candidates = []
+        for face_index, bbox in enumerate(bboxes):
+            for track_id, track in self.tracks.items():
+                iou = bbox_iou(bbox, track.bbox)
+                if iou >= self.iou_threshold:
+                    candidates.append((iou, face_index, track_id))
+        candidates.sort(reverse=True)
+
+        assignment: Dict[int, int] = {}
+        used_tracks = set()
+        for _, face_index, track_id in candidates:
+            if face_index in assignment or track_id in used_tracks:
+                continue
+            assignment[face_index] = track_id
+            used_tracks.add(track_id)
+
+        track_ids = []
+        for face_index, bbox in enumerate(bboxes):
+            track_id = assignment.get(face_index)
+            if track_id is None:
+                track_id = self.next_track_id
+                self.next_track_id += 1
+                track = TrackSmoother(track_id, self.alpha, self.trend_window)
+                track.bbox = tuple(int(v) for v in bbox)
+                self.tracks[track_id] = track
+            track_ids.append(track_id)
+
+        self._expire_tracks(set(track_ids))
+
+        return track_ids
+
+    def update(
+        self, track_id: int, probabilities: np.ndarray, score: float, bbox: Tuple
+    ) -> TrackSmoother:
+        """
+        Update a track with a new observation
+
+        Args:
+            track_id: Track returned by assign_tracks
+            probabilities: Raw 7-way emotion probabilities
+            score: Raw emotion score
+            bbox: Face bounding box (x, y, w, h)
+
+        Returns:
+            The updated track
+        """
+        track = self.tracks[track_id]
+        track.update(probabilities, score, bbox, self.frame_count)
+        return track
+
+    def update_primary(self, bbox: Optional[Tuple[int, int, int, int]]):
+        """
+        Move the primary-subject lock to this frame's primary face
+
+        Args:
+            bbox: Primary face of the frame, or None when it was not found; the lock
+                is released after max_missed_frames frames without it
+        """
+        if bbox is not None:
+            self.primary_bbox = tuple(int(v) for v in bbox)
+            self.primary_missed = 0
+        elif self.primary_bbox is not None:
+            self.primary_missed += 1
+            if self.primary_missed > self.max_missed_frames:
+                self.primary_bbox = None
+                self.primary_missed = 0
+
+    def _expire_tracks(self, current: set):
+        """Drop tracks that have not been seen recently, except this frame's tracks"""
+        expired = [
+            track_id
+            for track_id, track in self.tracks.items()
+            if track.frames
+            and track_id not in current
+            and self.frame_count - track.last_seen > self.max_missed_frames
+        ]
+        for track_id in expired:
+            del self.tracks[track_id]
@@ -0,0 +1,480 @@
+"""
+Session state snapshots in memory-mapped, append-only record files
+Per-session aggregates and face timelines are appended incrementally as fixed-size
+records and mapped back at startup without any parsing, so restarts keep live interviews
+"""
+
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from emotion_detection import EmotionDetector
+
+
+SNAPSHOT_MAGIC = b"EMOSNAP1"
+SNAPSHOT_VERSION = 2
+
+HEADER_DTYPE = np.dtype(
+    [("magic", "S8"), ("version", "<u4"), ("record_size", "<u4"), ("count", "<u8")]
+)
+HEADER_BYTES = 64
+
+# Longest session id that can be persisted
+MAX_SESSION_ID_BYTES = 64
+
+SESSION_RECORD = np.dtype(
+    [
+        ("session", f"S{MAX_SESSION_ID_BYTES}"),
+        ("generation", "<u4"),
+        ("created_at", "<f8"),
+        ("frames_analyzed", "<u8"),
+        ("deleted", "u1"),
+    ]
+)
+
+FACE_RECORD = np.dtype(
+    [
+        ("session", f"S{MAX_SESSION_ID_BYTES}"),
+        ("generation", "<u4"),
+        ("time", "<f8"),
+        ("frame", "<u8"),
+        ("track", "<i4"),
+        ("bbox", "<i4", (4,)),
+        ("probs", "<f4", (len(EmotionDetector.EMOTIONS),)),
+        ("score", "<f4"),
+    ]
+)
+
+
+def _header_bytes(dtype: np.dtype, count: int = 0) -> bytes:
+    header = np.zeros(1, HEADER_DTYPE)
+    header["magic"] = SNAPSHOT_MAGIC
+    header["version"] = SNAPSHOT_VERSION
+    header["record_size"] = dtype.itemsize
+    header["count"] = count
+    return header.tobytes().ljust(HEADER_BYTES, b"\0")
+
+
+class RecordLog:
+    """
+    Append-only file of fixed-size records behind a small header, accessed through np.memmap
+
+    Records are written before the header count is bumped, so a crash mid-append
+    leaves the previous count valid.
+    """
+
+    def __init__(self, path: str, dtype: np.dtype, chunk_records: int = 4096):
+        """
+        Args:
+            path: File path
+            dtype: Structured record dtype
+            chunk_records: Records the file grows by when full
+        """
+        self.path = path
+        self.dtype = dtype
+        self.chunk_records = chunk_records
+
+        if not os.path.exists(path) or os.path.getsize(path) < HEADER_BYTES:
+            with open(path, "wb") as f:
+                f.write(_header_bytes(dtype))
+
+        self.records = None
+        self._open()
+
+    def _open(self):
+        self.header = np.memmap(self.path, HEADER_DTYPE, mode="r+", shape=(1,))
+        if (
+            self.header["magic"][0] != SNAPSHOT_MAGIC
+            or self.header["version"][0] != SNAPSHOT_VERSION
+            or self.header["record_size"][0] != self.dtype.itemsize
+        ):
+            raise ValueError(f"Incompatible snapshot file: {self.path}")
+
+        self._map(max(self.count, 1))
+
+    @property
+    def count(self) -> int:
+        return int(self.header["count"][0])
+
+    @property
+    def capacity(self) -> int:
+        return len(self.records) if self.records is not None else 0
+
+    def _map(self, minimum: int):
+        size = os.path.getsize(self.path)
+        capacity = (size - HEADER_BYTES) // self.dtype.itemsize
+        if capacity < minimum:
+            capacity = -(-minimum // self.chunk_records) * self.chunk_records
+            if self.records is not None:
+                self.records.flush()
+                self.records = None
+            with open(self.path, "r+b") as f:
+                f.truncate(HEADER_BYTES + capacity * self.dtype.itemsize)
+        self.records = np.memmap(
+            self.path, self.dtype, mode="r+", offset=HEADER_BYTES, shape=(capacity,)
+        )
+
+    def append(self, records: np.ndarray):
+        """Append records and commit the new count"""
+        if len(records) == 0:
+            return
+        count = self.count
+        if count + len(records) > self.capacity:
+            self._map(count + len(records))
+        self.records[count : count + len(records)] = records
+        self.records.flush()
+        self.header["count"] = count + len(records)
+        self.header.flush()
+
+    def view(self) -> np.ndarray:
+        """Memory-mapped view of the committed records"""
+        return self.records[: self.count]
+
+    def rewrite(self, records: np.ndarray):
+        """
+        Replace the whole log (used for compaction)
+
+        The new log is written to a temporary file and renamed over the old one,
+        so a crash at any point leaves either the old or the new log intact.
+        """
+        records = np.ascontiguousarray(records, dtype=self.dtype)
+        temporary = self.path + ".tmp"
+        with open(temporary, "wb") as f:
+            f.write(_header_bytes(self.dtype, len(records)))
+            f.write(records.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+
+        self.close()
+        os.replace(temporary, self.path)
+        self._open()
+
+    def close(self):
+        if self.records is not None:
+            self.records.flush()
+        self.header.flush()
+        self.records = None
+        self.header = None
+
+
+def _encode_session(session_id: str) -> Optional[bytes]:
+    encoded = session_id.encode("utf-8")
+    return encoded if 0 < len(encoded) <= MAX_SESSION_ID_BYTES else None
+
+
+def _to_epoch(timestamp: str) -> float:
+    try:
+        return datetime.fromisoformat(timestamp).timestamp()
+    except (TypeError, ValueError):
+        return time.time()
+
+
+class SessionSnapshotter:
+    """
+    Periodically appends new session state to the record logs and restores it at startup
+
+    Configuration (environment):
+        EMOTION_SNAPSHOT_DIR: Directory for snapshot files (snapshots disabled when unset)
+        EMOTION_SNAPSHOT_INTERVAL: Seconds between snapshots (default 5)
+    """
+
+    def __init__(self, directory: str, interval: float = 5.0):
+        """
+        Args:
+            directory: Directory holding sessions.bin, faces.bin and the writer lock
+            interval: Seconds between background snapshots
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.interval = interval
+
+        self.sessions = RecordLog(os.path.join(directory, "sessions.bin"), SESSION_RECORD)
+        self.faces = RecordLog(os.path.join(directory, "faces.bin"), FACE_RECORD)
+
+        # Frames of each session already persisted, next frame sequence number
+        # to write, and last persisted aggregate
+        self.persisted_frames: Dict[str, int] = {}
+        # Bumped when a session is deleted, so a new session reusing the id never
+        # picks up the deleted session's face records
+        self.generations: Dict[str, int] = {}
+        self.frame_sequence: Dict[str, int] = {}
+        self.persisted_counts: Dict[str, int] = {}
+        self.skipped_sessions = set()
+
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    def acquire_writer_lock(self) -> bool:
+        """
+        Take an exclusive lock so only one process writes the snapshot files
+
+        Returns:
+            True if this process is the writer
+        """
+        try:
+            import fcntl
+        except ImportError:
+            return True
+
+        self.lock_file = open(os.path.join(self.directory, "writer.lock"), "w")
+        try:
+            fcntl.flock(self.lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError:
+            self.lock_file.close()
+            return False
+
+    @classmethod
+    def from_env(cls) -> Optional["SessionSnapshotter"]:
+        directory = os.environ.get("EMOTION_SNAPSHOT_DIR")
+        if not directory:
+            return None
+        return cls(directory, float(os.environ.get("EMOTION_SNAPSHOT_INTERVAL", 5)))
+
+    def snapshot(self, session_data: Dict) -> int:
+        """
+        Append everything that changed since the previous snapshot
+
+        Args:
+            session_data: The API's session store
+
+        Returns:
+            Number of face records written
+        """
+        with self.lock:
+            session_rows = []
+            face_rows = []
+
+            for session_id, session in list(session_data.items()):
+                encoded = _encode_session(session_id)
+                if encoded is None:
+                    if session_id not in self.skipped_sessions:
+                        self.skipped_sessions.add(session_id)
+                        print(f"Snapshot skipped for session id too long: {session_id!r}")
+                    continue
+
+                generation = self.generations.get(session_id, 0)
+                history = session["emotion_history"]
+                start = self.persisted_frames.get(session_id, 0)
+                end = len(history)
+                sequence = self.frame_sequence.get(session_id, 0)
+
+                for sequence, frame in enumerate(history[start:end], sequence):
+                    frame_time = _to_epoch(frame["timestamp"])
+                    for face in frame["faces"]:
+                        bbox = face["bbox"]
+                        face_rows.append(
+                            (
+                                encoded,
+                                generation,
+                                frame_time,
+                                sequence,
+                                face.get("track_id", -1),
+                                (bbox["x"], bbox["y"], bbox["w"], bbox["h"]),
+                                [
+                                    face["emotions"].get(emotion, 0.0)
+                                    for emotion in EmotionDetector.EMOTIONS
+                                ],
+                                face["emotion_score"],
+                            )
+                        )
+                if end > start:
+                    self.frame_sequence[session_id] = sequence + 1
+                self.persisted_frames[session_id] = end
+
+                frames_analyzed = session["frames_analyzed"]
+                if self.persisted_counts.get(session_id) != frames_analyzed:
+                    session_rows.append(
+                        (
+                            encoded,
+                            generation,
+                            _to_epoch(session["created_at"]),
+                            frames_analyzed,
+                            0,
+                        )
+                    )
+                    self.persisted_counts[session_id] = frames_analyzed
+
+            # Faces first: a session record never points at missing timeline data
+            self.faces.append(np.array(face_rows, dtype=FACE_RECORD))
+            self.sessions.append(np.array(session_rows, dtype=SESSION_RECORD))
+
+            return len(face_rows)
+
+    def mark_deleted(self, session_id: str):
+        """Append a tombstone so the session is not restored"""
+        encoded = _encode_session(session_id)
+        if encoded is None:
+            return
+        with self.lock:
+            generation = self.generations.get(session_id, 0)
+            self.sessions.append(
+                np.array([(encoded, generation, 0.0, 0, 1)], dtype=SESSION_RECORD)
+            )
+            self.generations[session_id] = generation + 1
+            self.persisted_frames.pop(session_id, None)
+            self.frame_sequence.pop(session_id, None)
+            self.persisted_counts.pop(session_id, None)
+
+    def restore(self, detector: EmotionDetector) -> Dict:
+        """
+        Rebuild the session store and detector history from the mapped files
+
+        Args:
+            detector: Detector whose emotion history is replaced
+
+        Returns:
+            Session store in the API's session_data format
+        """
+        with self.lock:
+            sessions = self.sessions.view()
+            faces = self.faces.view()
+
+            # Last record per session wins (np.unique on the reversed log)
+            if len(sessions):
+                reversed_ids = sessions["session"][::-1]
+                _, first = np.unique(reversed_ids, return_index=True)
+                latest = sessions[::-1][first]
+                live = latest[latest["deleted"] == 0]
+            else:
+                latest = live = sessions
+
+            # A deleted id starts a new generation if it is reused
+            for record in latest:
+                self.generations[record["session"].decode("utf-8")] = int(
+                    record["generation"]
+                ) + int(record["deleted"])
+
+            # Only faces of each live session's current generation are restored
+            if len(live) and len(faces):
+                index = np.searchsorted(live["session"], faces["session"])
+                index = np.minimum(index, len(live) - 1)
+                current = (live["session"][index] == faces["session"]) & (
+                    live["generation"][index] == faces["generation"]
+                )
+                live_faces = faces[current]
+            else:
+                live_faces = faces[:0]
+
+            # Compact when most of the log belongs to deleted sessions
+            if len(faces) > 2 * max(len(live_faces), 1) or len(sessions) > 2 * max(
+                len(live), 1
+            ):
+                live_faces = np.array(live_faces)
+                live = np.array(live)
+                self.faces.rewrite(live_faces)
+                self.sessions.rewrite(live)
+
+            session_data = self._rebuild_sessions(live, live_faces)
+            detector.load_history(self._rebuild_history(live_faces))
+
+            for session_id, session in session_data.items():
+                self.persisted_frames[session_id] = len(session["emotion_history"])
+                self.persisted_counts[session_id] = session["frames_analyzed"]
+
+            # Continue frame numbering after the highest restored frame
+            if len(live_faces):
+                ids, inverse = np.unique(live_faces["session"], return_inverse=True)
+                last_frame = np.zeros(len(ids), np.uint64)
+                np.maximum.at(last_frame, inverse, live_faces["frame"])
+                for encoded, frame in zip(ids, last_frame):
+                    self.frame_sequence[encoded.decode("utf-8")] = int(frame) + 1
+
+            return session_data
+
+    @staticmethod
+    def _rebuild_sessions(live: np.ndarray, faces: np.ndarray) -> Dict:
+        emotions = EmotionDetector.EMOTIONS
+        session_data = {}
+        for record in live:
+            session_id = record["session"].decode("utf-8")
+            session_data[session_id] = {
+                "created_at": datetime.fromtimestamp(record["created_at"]).isoformat(),
+                "frames_analyzed": int(record["frames_analyzed"]),
+                "emotion_history": [],
+            }
+
+        if not len(faces):
+            return session_data
+
+        dominant = faces["probs"].argmax(axis=1)
+        order = np.lexsort((faces["frame"], faces["session"]))
+        current_key = None
+        for index in order:
+            record = faces[index]
+            session_id = record["session"].decode("utf-8")
+            key = (session_id, int(record["frame"]))
+            if key != current_key:
+                current_key = key
+                frame_entry = {
+                    "timestamp": datetime.fromtimestamp(record["time"]).isoformat(),
+                    "faces": [],
+                }
+                session_data[session_id]["emotion_history"].append(frame_entry)
+
+            probs = record["probs"].tolist()
+            emotion = emotions[dominant[index]]
+            x, y, w, h = record["bbox"].tolist()
+            frame_entry["faces"].append(
+                {
+                    "bbox": {"x": x, "y": y, "w": w, "h": h},
+                    "emotions": dict(zip(emotions, probs)),
+                    "dominant_emotion": emotion,
+                    "confidence": probs[dominant[index]],
+                    "emotion_score": float(record["score"]),
+                    "is_positive": emotion in EmotionDetector.POSITIVE_EMOTIONS,
+                    "track_id": int(record["track"]),
+                }
+            )
+        return session_data
+
+    @staticmethod
+    def _rebuild_history(faces: np.ndarray) -> List[Dict]:
+        if not len(faces):
+            return []
+
+        order = np.argsort(faces["time"], kind="stable")
+        ordered = faces[order]
+        dominant = ordered["probs"].argmax(axis=1)
+        confidence = ordered["probs"].max(axis=1)
+        emotions = np.array(EmotionDetector.EMOTIONS)[dominant]
+
+        return [
+            {
+                "timestamp": datetime.fromtimestamp(t).isoformat(),
+                "emotion": str(emotion),
+                "score": float(score),
+                "confidence": float(conf),
+            }
+            for t, emotion, score, conf in zip(
+                ordered["time"], emotions, ordered["score"], confidence
+            )
+        ]
+
+    def start(self, session_data: Dict):
+        """Snapshot session_data in a background thread every interval"""
+
+        def run():
+            while not self.stop_event.wait(self.interval):
+                try:
+                    self.snapshot(session_data)
+                except Exception as e:
+                    print(f"Error writing session snapshot: {e}")
+
+        self.thread = threading.Thread(target=run, name="emotion-snapshot", daemon=True)
+        self.thread.start()
+
+    def stop(self, session_data: Optional[Dict] = None):
+        """Stop the background thread, taking a final snapshot if session_data is given"""
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout=self.interval + 1)
+        if session_data is not None:
+            self.snapshot(session_data)
+        self.sessions.close()
+        self.faces.close()
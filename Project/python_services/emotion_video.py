@@ -0,0 +1,398 @@
+"""
+Offline emotion analysis of recorded interview videos
+Streams a local video file through EmotionDetector with frame-stride sampling, timestamp seeking,
+a pipelined reader thread and optional parallel chunk processing across processes
+
+Usage:
+    python emotion_video.py interview.mp4 --sample-fps 2 --workers 4 --output report.json
+    python emotion_video.py interview.mp4 --start 00:10:00 --end 00:20:00
+    python emotion_video.py interview.mp4 --analytics-db analytics.db --job-id backend-42
+"""
+
+import argparse
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import cv2
+
+from emotion_detection import EmotionDetector
+from emotion_report import calculate_performance_score, generate_recommendations
+
+
+# Chunks shorter than this are not worth a separate process
+MIN_CHUNK_SECONDS = 30.0
+
+# Frames buffered between the reader thread and the analysis loop
+READ_QUEUE_SIZE = 16
+
+
+def parse_timestamp(value: Optional[str]) -> Optional[float]:
+    """
+    Parse 'HH:MM:SS(.ms)', 'MM:SS' or plain seconds into seconds
+
+    Args:
+        value: Timestamp string or None
+
+    Returns:
+        Seconds, or None if value is None
+    """
+    if value is None:
+        return None
+
+    seconds = 0.0
+    for part in str(value).split(":"):
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+
+def probe_video(path: str) -> Dict:
+    """
+    Read basic properties of a video file
+
+    Args:
+        path: Video file path
+
+    Returns:
+        fps, frame_count, duration_s, width and height
+    """
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise IOError(f"Could not open video: {path}")
+
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        return {
+            "path": os.path.abspath(path),
+            "fps": fps,
+            "frame_count": frame_count,
+            "duration_s": frame_count / fps if fps else 0.0,
+            "width": int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            "height": int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+        }
+    finally:
+        cap.release()
+
+
+def _put(frames: queue.Queue, item, stop) -> bool:
+    """Put an item on the queue unless the consumer stops; returns False if it did"""
+    while not stop.is_set():
+        try:
+            frames.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def _read_frames(
+    cap, start_frame: int, end_frame: int, stride: int, frames: queue.Queue, stop
+):
+    """
+    Reader thread: decode every stride-th frame, only grab the ones in between
+
+    Puts (frame_index, frame) tuples on the queue, then None when done. Gives up as
+    soon as stop is set, so a consumer that fails never leaves it blocked on a full
+    queue.
+    """
+    index = start_frame
+    try:
+        while index < end_frame and not stop.is_set():
+            if (index - start_frame) % stride == 0:
+                ok, frame = cap.read()
+                if not ok:
+                    break
+                if not _put(frames, (index, frame), stop):
+                    break
+            elif not cap.grab():
+                break
+            index += 1
+    finally:
+        _put(frames, None, stop)
+
+
+def process_range(
+    path: str,
+    start_s: float,
+    end_s: float,
+    sample_fps: float,
+    opencv_threads: Optional[int] = None,
+    primary_only: bool = True,
+) -> Dict:
+    """
+    Analyze one time range of a video
+
+    Runs in a worker process for chunked processing, or directly for a single pass.
+
+    Args:
+        path: Video file path
+        start_s: Range start in seconds
+        end_s: Range end in seconds
+        sample_fps: Frames analyzed per second of video
+        opencv_threads: cv2.setNumThreads value for this process
+        primary_only: Only classify the candidate's face
+
+    Returns:
+        timeline (one entry per analyzed frame), history entries and frame counts
+    """
+    if opencv_threads is not None:
+        cv2.setNumThreads(opencv_threads)
+
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise IOError(f"Could not open video: {path}")
+
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    stride = max(1, int(round(fps / sample_fps))) if sample_fps else 1
+    start_frame = int(round(start_s * fps))
+    end_frame = int(round(end_s * fps))
+
+    if start_frame > 0:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+
+    detector = EmotionDetector()
+    frames: queue.Queue = queue.Queue(maxsize=READ_QUEUE_SIZE)
+    stop = threading.Event()
+    reader = threading.Thread(
+        target=_read_frames,
+        args=(cap, start_frame, end_frame, stride, frames, stop),
+        daemon=True,
+    )
+    reader.start()
+
+    timeline = []
+    try:
+        while True:
+            item = frames.get()
+            if item is None:
+                break
+            index, frame = item
+            results = detector.analyze_frame(frame, "video", primary_only=primary_only)
+            timeline.append(
+                {
+                    "frame_index": index,
+                    "time_s": round(index / fps, 3),
+                    "faces_detected": results["faces_detected"],
+                    "faces": results["faces"],
+                }
+            )
+    finally:
+        stop.set()
+        reader.join()
+        cap.release()
+
+    # Video time is more useful than wall-clock time in the history
+    history = []
+    face_entries = iter(detector.emotion_history)
+    for entry in timeline:
+        for _ in entry["faces"]:
+            record = dict(next(face_entries))
+            record["timestamp"] = entry["time_s"]
+            history.append(record)
+
+    return {"timeline": timeline, "history": history, "frames_analyzed": len(timeline)}
+
+
+def _split_range(start_s: float, end_s: float, workers: int) -> List[tuple]:
+    duration = end_s - start_s
+    chunks = max(1, min(workers, int(duration // MIN_CHUNK_SECONDS)))
+    bounds = [start_s + duration * i / chunks for i in range(chunks + 1)]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def build_report(history: List[Dict], frames_analyzed: int, duration_s: float) -> Dict:
+    """
+    Build the final interview report from the merged emotion history
+
+    Args:
+        history: Emotion history entries ordered by video time
+        frames_analyzed: Number of frames analyzed
+        duration_s: Length of the analyzed range in seconds
+
+    Returns:
+        Report with summary, statistics and recommendations
+    """
+    detector = EmotionDetector()
+    detector.load_history(history)
+    stats = detector.get_emotion_statistics()
+    stats["average_score"] = float(stats["average_score"])
+
+    return {
+        "session_summary": {
+            "frames_analyzed": frames_analyzed,
+            "duration": f"{int(duration_s // 60)}m {int(duration_s % 60)}s",
+            "performance_score": calculate_performance_score(stats),
+        },
+        "emotion_analysis": stats,
+        "recommendations": generate_recommendations(stats),
+        "timestamp": datetime.now().isoformat(),
+    }
+
+
+def process_video(
+    path: str,
+    sample_fps: float = 2.0,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    workers: int = 1,
+    primary_only: bool = True,
+) -> Dict:
+    """
+    Analyze a recorded interview and build its timeline and report
+
+    Args:
+        path: Video file path
+        sample_fps: Frames analyzed per second of video
+        start: Optional start timestamp ('HH:MM:SS' or seconds)
+        end: Optional end timestamp ('HH:MM:SS' or seconds)
+        workers: Number of processes; long ranges are split into that many chunks
+        primary_only: Only classify the candidate's face, not other people in view
+
+    Returns:
+        Dictionary with video info, timeline, report and processing statistics
+    """
+    video = probe_video(path)
+    start_s = max(0.0, parse_timestamp(start) or 0.0)
+    end_s = parse_timestamp(end)
+    if end_s is None or end_s > video["duration_s"]:
+        end_s = video["duration_s"]
+    if end_s <= start_s:
+        raise ValueError("End timestamp must be after start timestamp")
+
+    started = time.perf_counter()
+    chunks = _split_range(start_s, end_s, workers)
+
+    if len(chunks) == 1:
+        parts = [
+            process_range(path, start_s, end_s, sample_fps, None, primary_only)
+        ]
+    else:
+        # One OpenCV thread per process avoids oversubscribing the CPU
+        with ProcessPoolExecutor(max_workers=len(chunks)) as pool:
+            futures = [
+                pool.submit(
+                    process_range,
+                    path,
+                    chunk_start,
+                    chunk_end,
+                    sample_fps,
+                    1,
+                    primary_only,
+                )
+                for chunk_start, chunk_end in chunks
+            ]
+            parts = [future.result() for future in futures]
+
+    timeline = [entry for part in parts for entry in part["timeline"]]
+    history = [entry for part in parts for entry in part["history"]]
+    frames_analyzed = sum(part["frames_analyzed"] for part in parts)
+    elapsed = time.perf_counter() - started
+
+    return {
+        "video": video,
+        "config": {
+            "sample_fps": sample_fps,
+            "start_s": start_s,
+            "end_s": end_s,
+            "workers": len(chunks),
+            "primary_only": primary_only,
+        },
+        "timeline": timeline,
+        "report": build_report(history, frames_analyzed, end_s - start_s),
+        "processing": {
+            "elapsed_s": round(elapsed, 3),
+            "frames_analyzed": frames_analyzed,
+            "realtime_factor": round(elapsed / (end_s - start_s), 4),
+        },
+    }
+
+
+def parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("video", help="Path to a local video file")
+    parser.add_argument(
+        "--sample-fps", type=float, default=2.0, help="Frames analyzed per video second"
+    )
+    parser.add_argument("--start", help="Start timestamp (HH:MM:SS or seconds)")
+    parser.add_argument("--end", help="End timestamp (HH:MM:SS or seconds)")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Processes for parallel chunk processing",
+    )
+    parser.add_argument(
+        "--all-faces",
+        action="store_true",
+        help="Classify every face instead of only the candidate's",
+    )
+    parser.add_argument("--output", help="Write timeline and report JSON here")
+    parser.add_argument(
+        "--timeline", help="Also write the timeline as JSON lines to this file"
+    )
+    parser.add_argument(
+        "--analytics-db", help="Ingest the analyzed interview into this analytics store"
+    )
+    parser.add_argument("--job-id", help="Job the interview was for (analytics)")
+    parser.add_argument(
+        "--session-id", help="Analytics session id (default: video file name)"
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    result = process_video(
+        args.video,
+        args.sample_fps,
+        args.start,
+        args.end,
+        args.workers,
+        not args.all_faces,
+    )
+
+    processing = result["processing"]
+    print(
+        f"Analyzed {processing['frames_analyzed']} frames in {processing['elapsed_s']}s "
+        f"({processing['realtime_factor']}x real time, {result['config']['workers']} workers)"
+    )
+    print(json.dumps(result["report"]["session_summary"], indent=2))
+
+    if args.timeline:
+        with open(args.timeline, "w") as f:
+            for entry in result["timeline"]:
+                f.write(json.dumps(entry) + "\n")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2, default=float)
+        print(f"Results written to {args.output}")
+
+    if args.analytics_db:
+        from emotion_analytics import AnalyticsStore
+
+        # The recording's modification time stands in for the interview date
+        start_s = result["config"]["start_s"]
+        AnalyticsStore(args.analytics_db).ingest_session(
+            args.session_id or os.path.basename(args.video),
+            [
+                (entry["time_s"] - start_s, entry["faces"])
+                for entry in result["timeline"]
+            ],
+            os.path.getmtime(args.video),
+            args.job_id,
+        )
+        print(f"Ingested into {args.analytics_db}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,382 @@
+"""
+Pipelined local runner for the emotion detector
+A capture thread feeds a latest-frame queue, an analysis thread runs detection and
+draws annotations, and the main thread displays frames with an fps / per-stage latency
+overlay. Runs headless against a video file as a local throughput benchmark or kiosk runner.
+
+Usage:
+    python emotion_webcam.py                        # webcam 0 in a window
+    python emotion_webcam.py --source interview.mp4 --headless --output annotated.mp4
+    python emotion_webcam.py --source interview.mp4 --headless --realtime --duration 60
+"""
+
+import argparse
+import json
+import queue
+import sys
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+import cv2
+
+from emotion_detection import EmotionDetector
+from emotion_metrics import LatencyHistogram
+
+
+# Stages shown in the overlay and the final summary
+STAGES = ("capture", "analyze", "draw", "display", "end_to_end")
+
+# Seconds the fps counters average over
+FPS_WINDOW = 2.0
+
+
+def _put_latest(frames: queue.Queue, item) -> bool:
+    """
+    Put an item on a size-1 queue, replacing an item the consumer has not taken yet
+
+    Returns:
+        True if an older item was dropped
+    """
+    dropped = False
+    while True:
+        try:
+            frames.put_nowait(item)
+            return dropped
+        except queue.Full:
+            try:
+                frames.get_nowait()
+                dropped = True
+            except queue.Empty:
+                pass
+
+
+class RateCounter:
+    """Events per second over a sliding time window"""
+
+    def __init__(self, window: float = FPS_WINDOW):
+        self.window = window
+        self.events = deque()
+
+    def tick(self, now: Optional[float] = None):
+        now = time.perf_counter() if now is None else now
+        self.events.append(now)
+        while self.events and now - self.events[0] > self.window:
+            self.events.popleft()
+
+    def rate(self) -> float:
+        if len(self.events) < 2:
+            return 0.0
+        span = self.events[-1] - self.events[0]
+        return (len(self.events) - 1) / span if span > 0 else 0.0
+
+
+class PipelinedRunner:
+    """
+    Capture -> analyze -> display pipeline
+
+    Capture never waits for analysis on live sources: the analysis stage always
+    takes the newest frame, so latency stays at one frame's processing time instead
+    of piling up. Video files are read without dropping frames unless realtime
+    pacing is requested, so the run measures end-to-end throughput.
+    """
+
+    def __init__(
+        self,
+        source,
+        detector: Optional[EmotionDetector] = None,
+        headless: bool = False,
+        realtime: bool = False,
+        primary_only: bool = False,
+        output: Optional[str] = None,
+        duration: Optional[float] = None,
+    ):
+        """
+        Args:
+            source: Camera index or video file path
+            detector: Detector to use (a new one by default)
+            headless: Do not open a window
+            realtime: Pace video files at their native fps and drop frames like a camera
+            primary_only: Only classify the most prominent face
+            output: Write annotated frames to this video file
+            duration: Stop after this many seconds
+        """
+        self.source = source
+        self.detector = detector or EmotionDetector()
+        self.headless = headless
+        self.primary_only = primary_only
+        self.output = output
+        self.duration = duration
+
+        self.cap = cv2.VideoCapture(source)
+        if not self.cap.isOpened():
+            raise IOError(f"Could not open video source: {source}")
+        self.is_live = isinstance(source, int)
+        self.source_fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self.realtime = realtime or self.is_live
+        self.drop_frames = self.realtime
+
+        self.captured: queue.Queue = queue.Queue(maxsize=1)
+        self.annotated: queue.Queue = queue.Queue(maxsize=1)
+        self.stop = threading.Event()
+
+        self.latency: Dict[str, LatencyHistogram] = {
+            name: LatencyHistogram() for name in STAGES
+        }
+        self.recent: Dict[str, float] = {name: 0.0 for name in STAGES}
+        self.counts = {"captured": 0, "analyzed": 0, "displayed": 0, "dropped": 0}
+        self.capture_rate = RateCounter()
+        self.analyze_rate = RateCounter()
+        self.display_rate = RateCounter()
+        self.lock = threading.Lock()
+
+    def _observe(self, name: str, seconds: float):
+        self.latency[name].observe(seconds)
+        with self.lock:
+            # EMA for the overlay; histograms hold the full distribution
+            self.recent[name] += 0.2 * (seconds - self.recent[name])
+
+    def _hand_over(self, frames: queue.Queue, item):
+        """Pass an item to the next stage, dropping stale items on live sources"""
+        if self.drop_frames:
+            if _put_latest(frames, item):
+                with self.lock:
+                    self.counts["dropped"] += 1
+            return
+
+        while not self.stop.is_set():
+            try:
+                frames.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _capture_loop(self):
+        """Capture stage: read frames as fast as the source delivers them"""
+        interval = 1.0 / self.source_fps
+        next_frame = time.perf_counter()
+        try:
+            while not self.stop.is_set():
+                if self.realtime and not self.is_live:
+                    delay = next_frame - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                    next_frame += interval
+
+                start = time.perf_counter()
+                ok, frame = self.cap.read()
+                if not ok:
+                    break
+                captured_at = time.perf_counter()
+                self._observe("capture", captured_at - start)
+                self.capture_rate.tick(captured_at)
+                with self.lock:
+                    self.counts["captured"] += 1
+
+                self._hand_over(self.captured, (captured_at, frame))
+        finally:
+            self._hand_over(self.captured, None)
+
+    def _analyze_loop(self):
+        """Analysis stage: detect, classify and annotate the newest captured frame"""
+        try:
+            while not self.stop.is_set():
+                try:
+                    item = self.captured.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                if item is None:
+                    break
+                captured_at, frame = item
+
+                start = time.perf_counter()
+                results = self.detector.analyze_frame(
+                    frame, "local", primary_only=self.primary_only
+                )
+                analyzed = time.perf_counter()
+                annotated = self.detector.draw_annotations(frame, results)
+                drawn = time.perf_counter()
+
+                self._observe("analyze", analyzed - start)
+                self._observe("draw", drawn - analyzed)
+                self.analyze_rate.tick(drawn)
+                with self.lock:
+                    self.counts["analyzed"] += 1
+
+                self._hand_over(self.annotated, (captured_at, annotated, results))
+        finally:
+            self._hand_over(self.annotated, None)
+
+    def _draw_overlay(self, frame):
+        """fps of each stage and recent per-stage latency in the top-left corner"""
+        with self.lock:
+            recent = dict(self.recent)
+            dropped = self.counts["dropped"]
+        lines = [
+            f"fps  capture {self.capture_rate.rate():5.1f}  "
+            f"analyze {self.analyze_rate.rate():5.1f}  "
+            f"display {self.display_rate.rate():5.1f}",
+            "ms   "
+            + "  ".join(f"{name} {recent[name] * 1000:6.1f}" for name in STAGES),
+            f"dropped {dropped}",
+        ]
+        for index, line in enumerate(lines):
+            position = (10, 20 + index * 20)
+            cv2.putText(
+                frame, line, position, cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 3
+            )
+            cv2.putText(
+                frame, line, position, cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1
+            )
+
+    def run(self) -> Dict:
+        """
+        Run the pipeline until the source ends, 'q' is pressed or the duration elapses
+
+        Returns:
+            Summary with frame counts, rates and per-stage latency percentiles
+        """
+        threads = [
+            threading.Thread(target=self._capture_loop, name="capture", daemon=True),
+            threading.Thread(target=self._analyze_loop, name="analyze", daemon=True),
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+
+        writer = None
+        try:
+            while True:
+                if self.duration and time.perf_counter() - started > self.duration:
+                    break
+                try:
+                    item = self.annotated.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                if item is None:
+                    break
+                captured_at, frame, results = item
+
+                start = time.perf_counter()
+                self._draw_overlay(frame)
+                if self.output:
+                    if writer is None:
+                        height, width = frame.shape[:2]
+                        writer = cv2.VideoWriter(
+                            self.output,
+                            cv2.VideoWriter_fourcc(*"mp4v"),
+                            self.source_fps,
+                            (width, height),
+                        )
+                    writer.write(frame)
+                if not self.headless:
+                    cv2.imshow("Emotion Detection", frame)
+                    key = cv2.waitKey(1) & 0xFF
+                    if key == ord("q"):
+                        break
+                    elif key == ord("s"):
+                        stats = self.detector.get_emotion_statistics()
+                        print("\n=== Emotion Statistics ===")
+                        print(json.dumps(stats, indent=2, default=float))
+                        print("========================\n")
+
+                displayed = time.perf_counter()
+                self._observe("display", displayed - start)
+                self._observe("end_to_end", displayed - captured_at)
+                self.display_rate.tick(displayed)
+                with self.lock:
+                    self.counts["displayed"] += 1
+        finally:
+            self.stop.set()
+            # Unblock the stages so they can see the stop flag
+            for frames in (self.captured, self.annotated):
+                try:
+                    frames.get_nowait()
+                except queue.Empty:
+                    pass
+            for thread in threads:
+                thread.join(timeout=5)
+            self.cap.release()
+            if writer is not None:
+                writer.release()
+            if not self.headless:
+                cv2.destroyAllWindows()
+
+        return self.summary(time.perf_counter() - started)
+
+    def summary(self, elapsed: float) -> Dict:
+        with self.lock:
+            counts = dict(self.counts)
+        return {
+            "source": str(self.source),
+            "elapsed_s": round(elapsed, 3),
+            "frames": counts,
+            "fps": {
+                key: round(counts[key] / elapsed, 2) if elapsed else 0.0
+                for key in ("captured", "analyzed", "displayed")
+            },
+            "latency": {
+                name: histogram.summary() for name, histogram in self.latency.items()
+            },
+        }
+
+
+def parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--source", default="0", help="Camera index or video file (default: webcam 0)"
+    )
+    parser.add_argument("--headless", action="store_true", help="Do not open a window")
+    parser.add_argument(
+        "--realtime",
+        action="store_true",
+        help="Pace video files at their fps and drop frames analysis cannot keep up with",
+    )
+    parser.add_argument(
+        "--primary-only", action="store_true", help="Only classify the main face"
+    )
+    parser.add_argument("--output", help="Write the annotated video here")
+    parser.add_argument("--duration", type=float, help="Stop after N seconds")
+    parser.add_argument("--summary", help="Write the run summary JSON here")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    source = int(args.source) if args.source.isdigit() else args.source
+
+    print("Testing Emotion Detector...")
+    try:
+        runner = PipelinedRunner(
+            source,
+            headless=args.headless,
+            realtime=args.realtime,
+            primary_only=args.primary_only,
+            output=args.output,
+            duration=args.duration,
+        )
+    except IOError as e:
+        print(f"Error: {e}")
+        return 1
+    print("Emotion Detector initialized successfully")
+    if not args.headless:
+        print("Press 'q' to quit, 's' to see statistics")
+
+    summary = runner.run()
+
+    # Final statistics
+    print("\n=== Final Statistics ===")
+    print(json.dumps(runner.detector.get_emotion_statistics(), indent=2, default=float))
+    print("\n=== Pipeline ===")
+    print(json.dumps(summary, indent=2))
+
+    if args.summary:
+        with open(args.summary, "w") as f:
+            json.dump(summary, f, indent=2)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
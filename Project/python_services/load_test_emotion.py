@@ -0,0 +1,395 @@
+"""
+Load generator simulating many concurrent interview sessions against the emotion API
+Each virtual session posts frames at a fixed fps and periodically polls statistics and report,
+while a sampler records throughput, latency percentiles, errors and server memory over time
+
+Usage:
+    python load_test_emotion.py --sessions 20 --fps 2 --duration 60 --output load.json
+    python load_test_emotion.py --url http://127.0.0.1:5000 --sessions 50
+"""
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from emotion_samples import encode_frame, load_face_images, make_frame, parse_resolution
+
+
+SERVICE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Routes hit by each virtual session
+ANALYZE_ROUTE = "/api/emotion/analyze"
+STATISTICS_ROUTE = "/api/emotion/statistics/{session_id}"
+REPORT_ROUTE = "/api/emotion/report/{session_id}"
+METRICS_ROUTE = "/api/emotion/metrics"
+
+
+class LoadRecorder:
+    """
+    Thread-safe collection of request outcomes, bucketed per sampling interval
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.interval = defaultdict(list)  # route -> latencies (ms) since last sample
+        self.interval_errors = defaultdict(int)
+        self.total = defaultdict(list)
+        self.total_errors = defaultdict(int)
+        self.error_kinds = defaultdict(int)
+        self.late_frames = 0
+
+    def record(self, route: str, latency_ms: float, error: Optional[str] = None):
+        with self.lock:
+            if error is None:
+                self.interval[route].append(latency_ms)
+                self.total[route].append(latency_ms)
+            else:
+                self.interval_errors[route] += 1
+                self.total_errors[route] += 1
+                self.error_kinds[error] += 1
+
+    def record_late_frame(self):
+        with self.lock:
+            self.late_frames += 1
+
+    def drain_interval(self):
+        """Return and reset the per-interval samples"""
+        with self.lock:
+            interval, errors = self.interval, self.interval_errors
+            self.interval = defaultdict(list)
+            self.interval_errors = defaultdict(int)
+        return interval, errors
+
+
+def _latency_summary(latencies: List[float], errors: int, seconds: float) -> Dict:
+    count = len(latencies)
+    summary = {
+        "requests": count + errors,
+        "errors": errors,
+        "error_rate": round(errors / (count + errors), 4) if count + errors else 0.0,
+        "throughput_rps": round(count / seconds, 2) if seconds > 0 else 0.0,
+    }
+    if count:
+        values = np.array(latencies)
+        summary.update(
+            {
+                "mean_ms": round(float(values.mean()), 2),
+                "p50_ms": round(float(np.percentile(values, 50)), 2),
+                "p95_ms": round(float(np.percentile(values, 95)), 2),
+                "p99_ms": round(float(np.percentile(values, 99)), 2),
+                "max_ms": round(float(values.max()), 2),
+            }
+        )
+    return summary
+
+
+def _request(method: str, url: str, body: Optional[Dict], timeout: float):
+    data = json.dumps(body).encode("utf-8") if body is not None else None
+    request = urllib.request.Request(
+        url,
+        data=data,
+        headers={"Content-Type": "application/json"} if data else {},
+        method=method,
+    )
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return response.status, response.read()
+
+
+def _timed_request(recorder, route_label, method, url, body, timeout):
+    start = time.perf_counter()
+    try:
+        _request(method, url, body, timeout)
+        recorder.record(route_label, (time.perf_counter() - start) * 1000)
+    except urllib.error.HTTPError as e:
+        recorder.record(route_label, 0, f"http_{e.code}")
+    except Exception as e:
+        recorder.record(route_label, 0, type(e).__name__)
+
+
+def run_session(
+    index: int,
+    args,
+    payloads: List[str],
+    recorder: LoadRecorder,
+    stop: threading.Event,
+    start_at: float,
+):
+    """
+    Drive one virtual interview session until stopped
+
+    Args:
+        index: Session number
+        args: Parsed command line arguments
+        payloads: Encoded frames to cycle through
+        recorder: Shared outcome recorder
+        stop: Event set when the test ends
+        start_at: Monotonic time at which this session starts (ramp-up)
+    """
+    session_id = f"{args.session_prefix}-{index}"
+    frame_interval = 1.0 / args.fps
+    next_frame = start_at
+    next_poll = start_at + args.poll_interval
+    frame_index = index
+
+    while not stop.is_set():
+        now = time.monotonic()
+        if now < next_frame:
+            stop.wait(next_frame - now)
+            continue
+
+        body = {"image": payloads[frame_index % len(payloads)], "session_id": session_id}
+        frame_index += 1
+        _timed_request(
+            recorder, "analyze", "POST", args.url + ANALYZE_ROUTE, body, args.timeout
+        )
+
+        next_frame += frame_interval
+        if time.monotonic() > next_frame:
+            # Server could not keep up with the requested fps: skip ahead
+            recorder.record_late_frame()
+            next_frame = time.monotonic()
+
+        if args.poll_interval > 0 and time.monotonic() >= next_poll:
+            next_poll += args.poll_interval
+            for label, route in (
+                ("statistics", STATISTICS_ROUTE),
+                ("report", REPORT_ROUTE),
+            ):
+                _timed_request(
+                    recorder,
+                    label,
+                    "GET",
+                    args.url + route.format(session_id=session_id),
+                    None,
+                    args.timeout,
+                )
+
+
+def _server_metrics(url: str) -> Optional[Dict]:
+    try:
+        _, body = _request("GET", url + METRICS_ROUTE, None, 5)
+        return json.loads(body)["data"]
+    except Exception:
+        return None
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_local_server(port: int) -> subprocess.Popen:
+    """
+    Start the API in a separate process (threaded werkzeug server, no reloader)
+
+    Args:
+        port: Port to listen on
+
+    Returns:
+        Server process
+    """
+    code = (
+        "from werkzeug.serving import run_simple\n"
+        "import emotion_api\n"
+        f"run_simple('127.0.0.1', {port}, emotion_api.app, threaded=True)\n"
+    )
+    process = subprocess.Popen(
+        [sys.executable, "-c", code],
+        cwd=SERVICE_DIR,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("Local emotion API exited during startup")
+        try:
+            _request("GET", f"http://127.0.0.1:{port}/health", None, 1)
+            return process
+        except Exception:
+            time.sleep(0.2)
+
+    process.terminate()
+    raise RuntimeError("Local emotion API did not become healthy")
+
+
+def run(args) -> Dict:
+    """Run the load test and return the report"""
+    face_images = load_face_images(args.faces_dir)
+    width, height = parse_resolution(args.resolution)
+    payloads = [
+        encode_frame(
+            make_frame(width, height, args.faces, seed=seed, face_images=face_images),
+            args.jpeg_quality,
+        )
+        for seed in range(args.distinct_frames)
+    ]
+
+    server = None
+    if not args.url:
+        port = _free_port()
+        print(f"Starting local emotion API on port {port}...")
+        server = start_local_server(port)
+        args.url = f"http://127.0.0.1:{port}"
+
+    recorder = LoadRecorder()
+    stop = threading.Event()
+    timeline = []
+
+    try:
+        baseline = _server_metrics(args.url)
+        start = time.monotonic()
+
+        threads = []
+        for index in range(args.sessions):
+            offset = args.ramp_up * index / max(args.sessions, 1)
+            thread = threading.Thread(
+                target=run_session,
+                args=(index, args, payloads, recorder, stop, start + offset),
+                daemon=True,
+            )
+            thread.start()
+            threads.append(thread)
+
+        last_sample = start
+        while time.monotonic() - start < args.duration:
+            time.sleep(min(args.sample_interval, args.duration))
+            now = time.monotonic()
+            interval, errors = recorder.drain_interval()
+            server_metrics = _server_metrics(args.url)
+            sample = {
+                "elapsed_s": round(now - start, 1),
+                "analyze": _latency_summary(
+                    interval.get("analyze", []),
+                    errors.get("analyze", 0),
+                    now - last_sample,
+                ),
+                "server_memory_mb": (
+                    round(server_metrics["resident_memory_bytes"] / 2**20, 1)
+                    if server_metrics
+                    else None
+                ),
+                "active_sessions": (
+                    server_metrics.get("active_sessions") if server_metrics else None
+                ),
+            }
+            timeline.append(sample)
+            last_sample = now
+
+            analyze = sample["analyze"]
+            print(
+                f"[{sample['elapsed_s']:>6}s] {analyze['throughput_rps']:>7} req/s  "
+                f"p50 {analyze.get('p50_ms', 0):>8} ms  p95 {analyze.get('p95_ms', 0):>8} ms  "
+                f"errors {analyze['errors']:>4}  rss {sample['server_memory_mb']} MB"
+            )
+
+        stop.set()
+        for thread in threads:
+            thread.join(timeout=args.timeout + 1)
+        elapsed = time.monotonic() - start
+        final_metrics = _server_metrics(args.url)
+    finally:
+        stop.set()
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=10)
+
+    memory = [s["server_memory_mb"] for s in timeline if s["server_memory_mb"]]
+    offered = args.sessions * args.fps
+
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "config": {
+            "url": args.url if server is None else "local",
+            "sessions": args.sessions,
+            "fps": args.fps,
+            "offered_rps": offered,
+            "duration_s": args.duration,
+            "ramp_up_s": args.ramp_up,
+            "resolution": args.resolution,
+            "faces": args.faces,
+            "jpeg_quality": args.jpeg_quality,
+            "payload_bytes": int(np.mean([len(p) for p in payloads])),
+        },
+        "summary": {
+            route: _latency_summary(
+                recorder.total[route], recorder.total_errors[route], elapsed
+            )
+            for route in sorted(set(recorder.total) | set(recorder.total_errors))
+        },
+        "late_frames": recorder.late_frames,
+        "error_kinds": dict(recorder.error_kinds),
+        "server_memory_mb": {
+            "start": (
+                round(baseline["resident_memory_bytes"] / 2**20, 1)
+                if baseline
+                else None
+            ),
+            "end": memory[-1] if memory else None,
+            "peak": max(memory) if memory else None,
+        },
+        "server_stage_latency": final_metrics.get("stages") if final_metrics else None,
+        "timeline": timeline,
+    }
+
+
+def parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--url", help="Base URL of a running API (default: start a local instance)"
+    )
+    parser.add_argument("--sessions", type=int, default=10)
+    parser.add_argument("--fps", type=float, default=0.5, help="Frames/sec per session")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds")
+    parser.add_argument("--ramp-up", type=float, default=5, help="Seconds to start all sessions")
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=10,
+        help="Seconds between statistics/report polls per session (0 to disable)",
+    )
+    parser.add_argument("--sample-interval", type=float, default=5)
+    parser.add_argument("--resolution", default="640x480")
+    parser.add_argument("--faces", type=int, default=1)
+    parser.add_argument("--jpeg-quality", type=int, default=80)
+    parser.add_argument("--distinct-frames", type=int, default=8)
+    parser.add_argument("--faces-dir", help="Directory of real face crops")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--session-prefix", default="load")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    report = run(args)
+
+    print("\n=== Load Test Summary ===")
+    print(json.dumps(report["summary"], indent=2))
+    print(f"Late frames: {report['late_frames']}")
+    print(f"Server memory (MB): {report['server_memory_mb']}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,65 @@
+"""
+Regression tests for the vectorized per-group aggregations of the analytics store
+
+Run from this directory with: python -m pytest -q
+"""
+
+import numpy as np
+
+from emotion_analytics import grouped_percentiles, grouped_sums
+
+
+PERCENTILES = [0, 10, 25, 50, 75, 90, 99, 100]
+
+
+def test_grouped_percentiles_match_numpy_per_group():
+    rng = np.random.default_rng(7)
+    groups = 6
+    # Group 4 is empty, group 5 has a single value
+    codes = rng.choice([0, 1, 2, 3], size=500)
+    codes = np.concatenate([codes, [5]])
+    values = rng.normal(60, 15, size=len(codes))
+
+    result = grouped_percentiles(codes, values, groups, PERCENTILES)
+
+    assert result.shape == (groups, len(PERCENTILES))
+    for group in range(groups):
+        members = values[codes == group]
+        if not len(members):
+            assert np.isnan(result[group]).all()
+        else:
+            np.testing.assert_allclose(
+                result[group], np.percentile(members, PERCENTILES)
+            )
+
+
+def test_grouped_percentiles_with_ties_and_unsorted_input():
+    codes = np.array([1, 0, 1, 0, 1, 1, 0])
+    values = np.array([5.0, 3.0, 5.0, 1.0, 2.0, 9.0, 3.0])
+
+    result = grouped_percentiles(codes, values, 2, PERCENTILES)
+
+    for group in range(2):
+        np.testing.assert_allclose(
+            result[group], np.percentile(values[codes == group], PERCENTILES)
+        )
+
+
+def test_grouped_percentiles_without_values():
+    result = grouped_percentiles(
+        np.array([], dtype=np.int64), np.array([]), 3, PERCENTILES
+    )
+    assert result.shape == (3, len(PERCENTILES))
+    assert np.isnan(result).all()
+
+
+def test_grouped_sums_match_per_group_sums():
+    rng = np.random.default_rng(3)
+    codes = rng.choice([0, 2], size=200)
+    rows = rng.random((200, 7))
+
+    result = grouped_sums(codes, rows, 3)
+
+    assert result.shape == (3, 7)
+    for group in range(3):
+        np.testing.assert_allclose(result[group], rows[codes == group].sum(axis=0))
@@ -0,0 +1,145 @@
+"""
+Regression tests for session snapshots: restore after compaction and session ids
+reused after a delete
+
+Run from this directory with: python -m pytest -q
+"""
+
+import numpy as np
+
+from emotion_detection import EmotionDetector
+from emotion_snapshot import FACE_RECORD, RecordLog, SessionSnapshotter
+
+
+def _frame(score: float, timestamp: str = "2025-01-01T00:00:00") -> dict:
+    return {
+        "timestamp": timestamp,
+        "faces": [
+            {
+                "bbox": {"x": 1, "y": 2, "w": 30, "h": 30},
+                "emotions": {"Happy": 1.0},
+                "emotion_score": score,
+                "track_id": 0,
+            }
+        ],
+    }
+
+
+def _session(*scores: float) -> dict:
+    return {
+        "created_at": "2025-01-01T00:00:00",
+        "frames_analyzed": len(scores),
+        "emotion_history": [_frame(score) for score in scores],
+    }
+
+
+def _scores(session_data: dict) -> dict:
+    """Face scores per session, frame by frame"""
+    return {
+        session_id: [
+            face["emotion_score"]
+            for frame in session["emotion_history"]
+            for face in frame["faces"]
+        ]
+        for session_id, session in session_data.items()
+    }
+
+
+def _restore(directory) -> tuple:
+    snapshotter = SessionSnapshotter(str(directory))
+    return snapshotter, snapshotter.restore(EmotionDetector())
+
+
+def test_restore_round_trip(tmp_path):
+    snapshotter = SessionSnapshotter(str(tmp_path))
+    snapshotter.snapshot({"a": _session(10, 20), "b": _session(5)})
+    snapshotter.stop()
+
+    snapshotter, restored = _restore(tmp_path)
+    snapshotter.stop()
+
+    assert _scores(restored) == {"a": [10, 20], "b": [5]}
+    assert restored["a"]["frames_analyzed"] == 2
+
+
+def test_record_log_rewrite_survives_reopen(tmp_path):
+    path = str(tmp_path / "faces.bin")
+    log = RecordLog(path, FACE_RECORD)
+    records = np.zeros(10, FACE_RECORD)
+    records["frame"] = np.arange(10)
+    log.append(records)
+
+    log.rewrite(records[7:])
+    log.append(records[:1])
+    log.close()
+
+    reopened = RecordLog(path, FACE_RECORD)
+    assert reopened.count == 4
+    assert reopened.view()["frame"].tolist() == [7, 8, 9, 0]
+    assert not (tmp_path / "faces.bin.tmp").exists()
+    reopened.close()
+
+
+def test_restore_after_compaction(tmp_path):
+    snapshotter = SessionSnapshotter(str(tmp_path))
+    data = {"gone": _session(*range(20)), "kept": _session(1, 2)}
+    snapshotter.snapshot(data)
+    del data["gone"]
+    snapshotter.mark_deleted("gone")
+    snapshotter.stop()
+
+    # Most records are dead, so the first restore compacts both logs
+    snapshotter, restored = _restore(tmp_path)
+    assert snapshotter.faces.count == 2
+    assert snapshotter.sessions.count == 1
+    assert _scores(restored) == {"kept": [1, 2]}
+
+    # Appends after the compaction land behind the rewritten records
+    restored["kept"]["emotion_history"].append(_frame(3))
+    restored["kept"]["frames_analyzed"] += 1
+    snapshotter.snapshot(restored)
+    snapshotter.stop()
+
+    snapshotter, restored = _restore(tmp_path)
+    snapshotter.stop()
+    assert _scores(restored) == {"kept": [1, 2, 3]}
+    assert restored["kept"]["frames_analyzed"] == 3
+
+
+def test_deleted_and_recreated_session(tmp_path):
+    snapshotter = SessionSnapshotter(str(tmp_path))
+    data = {"a": _session(10, 20, 30), "b": _session(5)}
+    snapshotter.snapshot(data)
+
+    del data["a"]
+    snapshotter.mark_deleted("a")
+    data["a"] = _session(99)
+    snapshotter.snapshot(data)
+    snapshotter.stop()
+
+    snapshotter, restored = _restore(tmp_path)
+    assert _scores(restored) == {"a": [99], "b": [5]}
+
+    # Delete and recreate once more after a restart
+    del restored["a"]
+    snapshotter.mark_deleted("a")
+    restored["a"] = _session(7)
+    snapshotter.snapshot(restored)
+    snapshotter.stop()
+
+    snapshotter, restored = _restore(tmp_path)
+    snapshotter.stop()
+    assert _scores(restored) == {"a": [7], "b": [5]}
+
+
+def test_deleted_session_stays_deleted(tmp_path):
+    snapshotter = SessionSnapshotter(str(tmp_path))
+    data = {"a": _session(10), "b": _session(5)}
+    snapshotter.snapshot(data)
+    del data["a"]
+    snapshotter.mark_deleted("a")
+    snapshotter.stop()
+
+    snapshotter, restored = _restore(tmp_path)
+    snapshotter.stop()
+    assert _scores(restored) == {"b": [5]}